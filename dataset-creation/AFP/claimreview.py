@@ -0,0 +1,242 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+LD_JSON = "application/ld+json"
+
+# Comments and the elements whose content is not markup. Skipping each as a
+# whole keeps an "<!--" in a script or a "<script" in a comment from being
+# read as markup, as an HTML parser would. Every pattern starts with a
+# literal "<", which keeps the scan fast on large pages.
+_OPEN_RE = re.compile(r"<(?:!--|(script|style|textarea|title)\b([^>]*)>)", re.IGNORECASE)
+_CLOSE_RE = {
+    tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE)
+    for tag in ("script", "style", "textarea", "title")
+}
+_TYPE_RE = re.compile(r"""(?:^|\s)type\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE)
+_LD_JSON_RE = re.compile(r"/ld\+json", re.IGNORECASE)
+
+
+def sha1(s: str) -> str:
+    return hashlib.sha1((s or "").encode("utf-8")).hexdigest()
+
+
+# -----------------------
+# ld+json extraction
+# -----------------------
+
+def _scan_ld_json(html: str) -> Optional[List[str]]:
+    # Bodies of <script type="application/ld+json"> without building a DOM.
+    # None when the page has ld+json markup the scan cannot account for
+    # (different case, entity-encoded attributes, unclosed scripts...).
+    blocks = []
+    pos = 0
+    while True:
+        m = _OPEN_RE.search(html, pos)
+        if m is None:
+            break
+        tag = m.group(1)
+        if tag is None:
+            end = html.find("-->", m.end())
+            if end < 0:
+                return None
+            pos = end + 3
+            continue
+        close = _CLOSE_RE[tag.lower()].search(html, m.end())
+        if close is None:
+            return None
+        if tag.lower() == "script":
+            t = _TYPE_RE.search(m.group(2))
+            if t and next(v for v in t.groups() if v is not None) == LD_JSON:
+                blocks.append(html[m.end():close.start()])
+        pos = close.end()
+    if len(blocks) != len(_LD_JSON_RE.findall(html)):
+        return None
+    return blocks
+
+
+def _soup_ld_json(html: str) -> List[Optional[str]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
+    return [s.string for s in soup.find_all("script", type=LD_JSON)]
+
+
+def ld_json_blocks(html: str) -> List[Any]:
+    raw = _scan_ld_json(html)
+    if raw is None:
+        raw = _soup_ld_json(html)
+    return _loads(raw)
+
+
+def _loads(raw: List[Optional[str]]) -> List[Any]:
+    out = []
+    for text in raw:
+        try:
+            out.append(json.loads(text))
+        except Exception:
+            pass
+    return out
+
+
+def find_claimreview(obj: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(obj, dict):
+        if obj.get("@type") == "ClaimReview":
+            return obj
+        if "claimReviewed" in obj and "reviewRating" in obj:
+            return obj
+        if "@graph" in obj:
+            for n in obj["@graph"]:
+                hit = find_claimreview(n)
+                if hit:
+                    return hit
+        for v in obj.values():
+            hit = find_claimreview(v)
+            if hit:
+                return hit
+    elif isinstance(obj, list):
+        for it in obj:
+            hit = find_claimreview(it)
+            if hit:
+                return hit
+    return None
+
+
+def parse_article(html: str, url: str) -> Dict[str, Any]:
+    return _record(ld_json_blocks(html), url)
+
+
+def _record(blocks: List[Any], url: str) -> Dict[str, Any]:
+    cr = None
+    for block in blocks:
+        cr = find_claimreview(block)
+        if cr:
+            break
+
+    rec = {
+        "id": sha1(url),
+        "url": url,
+        "type": "afp_factcheck",
+        "language": "ro",
+        "claim": None,
+        "label": None,
+        "date_verified": None,
+        "speaker": None,
+        "source_url": None,
+        "title": None,
+    }
+
+    if cr:
+        rr = cr.get("reviewRating", {})
+        item = cr.get("itemReviewed", {})
+        author = item.get("author", {})
+
+        rec.update({
+            "claim": cr.get("claimReviewed"),
+            "label": rr.get("alternateName"),
+            "date_verified": cr.get("datePublished"),
+            "title": cr.get("name"),
+            "source_url": item.get("url"),
+            "speaker": author.get("name") if isinstance(author, dict) else None,
+        })
+
+    return rec
+
+
+# -----------------------
+# Batch re-parsing
+# -----------------------
+
+def known_urls(paths: Iterable[Path]) -> Dict[str, str]:
+    # Cache files are named sha1(url); take the URLs from earlier output.
+    urls = {}
+    for path in paths:
+        with Path(path).open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    url = json.loads(line).get("url")
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                if url:
+                    urls[sha1(url)] = url
+    return urls
+
+
+def _parse_files(jobs: List[Tuple[str, str]], verify: bool) -> List[Tuple[Dict[str, Any], bool]]:
+    out = []
+    for path, url in jobs:
+        html = Path(path).read_text(encoding="utf-8", errors="ignore")
+        rec = parse_article(html, url)
+        same = not verify or rec == _record(_loads(_soup_ld_json(html)), url)
+        out.append((rec, same))
+    return out
+
+
+def reparse(
+    cache_dir: Path,
+    urls: Dict[str, str],
+    out_path: Path,
+    workers: int = 0,
+    chunk_size: int = 64,
+    verify: bool = False,
+) -> Dict[str, Any]:
+    jobs, unknown = [], 0
+    for fp in sorted(Path(cache_dir).glob("*.html")):
+        url = urls.get(fp.stem)
+        if url is None:
+            unknown += 1
+            continue
+        jobs.append((str(fp), url))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+    t0 = time.perf_counter()
+    counts = {"parsed": 0, "claimreview": 0, "mismatch": 0}
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as out, ProcessPoolExecutor(max_workers=workers or None) as pool:
+        # map keeps the input order, so the output is deterministic.
+        for results in pool.map(_parse_files, chunks, [verify] * len(chunks)):
+            for rec, same in results:
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                counts["parsed"] += 1
+                counts["claimreview"] += rec["claim"] is not None
+                counts["mismatch"] += not same
+    os.replace(tmp, out_path)
+    counts.update({
+        "unknown_url": unknown,
+        "seconds": time.perf_counter() - t0,
+        "out": str(out_path),
+    })
+    if not verify:
+        del counts["mismatch"]
+    return counts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Re-parse a <sha1(url)>.html cache into ClaimReview records.")
+    ap.add_argument("cache_dir")
+    ap.add_argument("--urls-from", nargs="+", required=True, help="JSONL files with a url field (e.g. afp_verificat_raw.jsonl)")
+    ap.add_argument("--out", required=True, help="records JSONL")
+    ap.add_argument("--workers", type=int, default=0, help="processes (0 = one per CPU)")
+    ap.add_argument("--chunk-size", type=int, default=64)
+    ap.add_argument("--verify", action="store_true", help="also parse with BeautifulSoup and count records that differ")
+    args = ap.parse_args()
+
+    report = reparse(
+        Path(args.cache_dir),
+        known_urls(Path(p) for p in args.urls_from),
+        Path(args.out),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        verify=args.verify,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,17 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright
+import argparse
+import asyncio
 import json
 import re
-import time
 import hashlib
 from pathlib import Path
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Optional, List, Set
 
 import pandas as pd
 from tqdm import tqdm
 
+from claimreview import parse_article, sha1
+
 # -----------------------
 # Config
 # -----------------------
@@ -23,6 +25,16 @@ OUT_DIR.mkdir(exist_ok=True)
 MAX_LISTING_CLICKS = 40
 REQUEST_DELAY = 1.0
 HEADLESS = False
+# Article pages scraped in parallel, one browser context each.
+WORKERS = 4
+# The ClaimReview JSON-LD is in the served HTML, so article pages load the
+# document alone: no scripts, images, fonts, styles or ads.
+ALLOWED_RESOURCE_TYPES = {"document"}
+
+RAW_JSONL = "afp_verificat_raw.jsonl"
+# Article HTML as <sha1(url)>.html, like the notebook's cache, so a parser
+# fix can be re-run offline with `python claimreview.py`.
+CACHE_DIR = "cache"
 
 DOC_URL_RE = re.compile(r"^https://verificat\.afp\.com/doc\.afp\.com\.\w+$")
 
@@ -30,9 +42,6 @@ DOC_URL_RE = re.compile(r"^https://verificat\.afp\.com/doc\.afp\.com\.\w+$")
 # Utilities
 # -----------------------
 
-def sha1(s: str) -> str:
-    return hashlib.sha1((s or "").encode("utf-8")).hexdigest()
-
 def normalize_label(label: Optional[str]) -> Optional[str]:
     if label is None:
         return None
@@ -58,131 +67,150 @@ def label_group(label: Optional[str]) -> Optional[str]:
         return "FALSE"
     return "OTHER" if nl else None
 
-# -----------------------
-# JSON-LD parsing
-# -----------------------
-
-def find_claimreview(obj: Any) -> Optional[Dict[str, Any]]:
-    if isinstance(obj, dict):
-        if obj.get("@type") == "ClaimReview":
-            return obj
-        if "claimReviewed" in obj and "reviewRating" in obj:
-            return obj
-        if "@graph" in obj:
-            for n in obj["@graph"]:
-                hit = find_claimreview(n)
-                if hit:
-                    return hit
-        for v in obj.values():
-            hit = find_claimreview(v)
-            if hit:
-                return hit
-    elif isinstance(obj, list):
-        for it in obj:
-            hit = find_claimreview(it)
-            if hit:
-                return hit
-    return None
-
-def parse_article(html: str, url: str) -> Dict[str, Any]:
-    soup = BeautifulSoup(html, "lxml")
-
-    jsonlds = []
-    for s in soup.find_all("script", type="application/ld+json"):
-        try:
-            jsonlds.append(json.loads(s.string))
-        except Exception:
-            pass
-
-    cr = None
-    for block in jsonlds:
-        cr = find_claimreview(block)
-        if cr:
-            break
-
-    rec = {
-        "id": sha1(url),
-        "url": url,
-        "type": "afp_factcheck",
-        "language": "ro",
-        "claim": None,
-        "label": None,
-        "date_verified": None,
-        "speaker": None,
-        "source_url": None,
-        "title": None,
-    }
-
-    if cr:
-        rr = cr.get("reviewRating", {})
-        item = cr.get("itemReviewed", {})
-        author = item.get("author", {})
-
-        rec.update({
-            "claim": cr.get("claimReviewed"),
-            "label": rr.get("alternateName"),
-            "date_verified": cr.get("datePublished"),
-            "title": cr.get("name"),
-            "source_url": item.get("url"),
-            "speaker": author.get("name") if isinstance(author, dict) else None,
-        })
-
-    return rec
-
 # -----------------------
 # Main scraping logic
 # -----------------------
 
-def main():
-    rows: List[Dict[str, Any]] = []
+async def block_resources(route):
+    if route.request.resource_type in ALLOWED_RESOURCE_TYPES:
+        await route.continue_()
+    else:
+        await route.abort()
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
-        context = browser.new_context(locale="ro-RO")
-        page = context.new_page()
+async def discover_urls(browser) -> List[str]:
+    # The listing needs its scripts for "Vezi mai mult", so it gets an
+    # unrestricted context of its own.
+    context = await browser.new_context(locale="ro-RO")
+    page = await context.new_page()
 
-        page.goto(LISTING_URL, wait_until="domcontentloaded")
-        time.sleep(2)
+    await page.goto(LISTING_URL, wait_until="domcontentloaded")
+    await asyncio.sleep(2)
 
-        urls = set()
+    urls = set()
 
-        for _ in range(MAX_LISTING_CLICKS):
-            links = page.query_selector_all("a[href]")
-            for a in links:
-                href = a.get_attribute("href")
-                if href and DOC_URL_RE.match(href):
-                    urls.add(href)
+    for _ in range(MAX_LISTING_CLICKS):
+        for a in await page.query_selector_all("a[href]"):
+            href = await a.get_attribute("href")
+            if href and DOC_URL_RE.match(href):
+                urls.add(href)
 
-            btn = page.query_selector("text=Vezi mai mult")
-            if not btn:
+        btn = await page.query_selector("text=Vezi mai mult")
+        if not btn:
+            break
+        await btn.click()
+        await asyncio.sleep(1.5)
+
+    await context.close()
+    return sorted(urls)
+
+def load_scraped(path: Path) -> Set[str]:
+    # URLs a previous run already parsed; failed ones are tried again.
+    done = set()
+    if not path.exists():
+        return done
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            if rec.get("error"):
+                done.discard(rec.get("url"))
+            else:
+                done.add(rec.get("url"))
+    return done
+
+def drop_torn_tail(path: Path) -> None:
+    # An interrupted run can leave a partial last line; appending after it
+    # would glue the next record onto it, so cut back to the last newline.
+    if not path.exists():
+        return
+    with path.open("rb+") as f:
+        size = f.seek(0, 2)
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl >= 0:
+                pos = pos - step + nl + 1
                 break
-            btn.click()
-            time.sleep(1.5)
-
-        urls = sorted(urls)
-        print(f"[INFO] Discovered {len(urls)} AFP articles")
-
-        for url in tqdm(urls, desc="Scraping AFP articles"):
+            pos -= step
+        if pos < size:
+            f.truncate(pos)
+
+def save_html(cache_dir: Path, url: str, html: str) -> None:
+    path = cache_dir / f"{sha1(url)}.html"
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(html, encoding="utf-8")
+    tmp.replace(path)
+
+async def scrape_urls(browser, urls: List[str], out_path: Path, workers: int, delay: float) -> None:
+    cache_dir = out_path.parent / CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    bar = tqdm(total=len(urls), desc="Scraping AFP articles")
+    drop_torn_tail(out_path)
+    with out_path.open("a", encoding="utf-8") as out:
+
+        async def worker():
+            context = await browser.new_context(locale="ro-RO")
+            await context.route("**/*", block_resources)
+            page = await context.new_page()
+            try:
+                while not queue.empty():
+                    url = queue.get_nowait()
+                    try:
+                        await page.goto(url, wait_until="domcontentloaded")
+                        html = await page.content()
+                        save_html(cache_dir, url, html)
+                        rec = await asyncio.to_thread(parse_article, html, url)
+                    except Exception as e:
+                        rec = {"id": sha1(url), "url": url, "error": str(e)}
+                        if page.is_closed():
+                            page = await context.new_page()
+                    # Written as it completes, so an interrupted run keeps
+                    # everything scraped so far.
+                    out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    out.flush()
+                    bar.update()
+                    await asyncio.sleep(delay)
+            finally:
+                await context.close()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(urls))))))
+    bar.close()
+
+def read_records(path: Path) -> List[Dict[str, Any]]:
+    rows = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
             try:
-                page.goto(url, wait_until="domcontentloaded")
-                time.sleep(REQUEST_DELAY)
-                html = page.content()
-                rec = parse_article(html, url)
-                rows.append(rec)
-            except Exception as e:
-                rows.append({
-                    "id": sha1(url),
-                    "url": url,
-                    "error": str(e),
-                })
-
-        browser.close()
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return rows
 
+def build_datasets(out_dir: Path) -> None:
     # -----------------------
     # Build DataFrame
     # -----------------------
 
-    df = pd.DataFrame(rows)
+    raw_path = out_dir / RAW_JSONL
+    if not raw_path.exists():
+        print("[WARN] nothing scraped yet:", raw_path)
+        return
+    df = pd.DataFrame(read_records(raw_path))
+    # Latest attempt per URL, so a retried failure replaces its error row.
+    df = df.drop_duplicates("url", keep="last").reset_index(drop=True)
+    for col in ("claim", "label"):
+        if col not in df.columns:
+            df[col] = None
     df["label_norm"] = df["label"].apply(normalize_label)
     df["label_group"] = df["label"].apply(label_group)
     df["claim_len"] = df["claim"].fillna("").apply(len)
@@ -201,20 +229,58 @@ def main():
     # Save outputs
     # -----------------------
 
-    df.to_csv(OUT_DIR / "afp_verificat_raw.csv", index=False, encoding="utf-8")
-    df_ok.to_csv(OUT_DIR / "afp_verificat_dataset.csv", index=False, encoding="utf-8")
+    df.to_csv(out_dir / "afp_verificat_raw.csv", index=False, encoding="utf-8")
+    df_ok.to_csv(out_dir / "afp_verificat_dataset.csv", index=False, encoding="utf-8")
 
     factual_like_cols = [
         "url", "type", "label", "label_group",
         "date_verified", "speaker", "claim", "source_url"
     ]
     df_ok[factual_like_cols].to_csv(
-        OUT_DIR / "afp_verificat_dataset_factual_like.csv",
+        out_dir / "afp_verificat_dataset_factual_like.csv",
         index=False,
         encoding="utf-8"
     )
 
-    print("[DONE] CSV datasets written to:", OUT_DIR.resolve())
+    print("[DONE] CSV datasets written to:", out_dir.resolve())
+
+async def run(args) -> None:
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    raw_path = out_dir / RAW_JSONL
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=args.headless)
+
+        if args.urls_file:
+            lines = Path(args.urls_file).read_text(encoding="utf-8").splitlines()
+            urls = list(dict.fromkeys(u.strip() for u in lines if u.strip()))
+        else:
+            urls = await discover_urls(browser)
+        print(f"[INFO] Discovered {len(urls)} AFP articles")
+
+        if args.resume:
+            done = load_scraped(raw_path)
+            urls = [u for u in urls if u not in done]
+            print(f"[INFO] {len(done)} already scraped, {len(urls)} to go")
+        elif raw_path.exists():
+            raw_path.unlink()
+
+        if urls:
+            await scrape_urls(browser, urls, raw_path, args.workers, args.delay)
+        await browser.close()
+
+    build_datasets(out_dir)
+
+def main():
+    ap = argparse.ArgumentParser(description="Scrape AFP Verificat fact-checks with a pool of Playwright pages.")
+    ap.add_argument("--out-dir", default=str(OUT_DIR))
+    ap.add_argument("--workers", type=int, default=WORKERS, help="browser contexts scraping articles in parallel")
+    ap.add_argument("--delay", type=float, default=REQUEST_DELAY, help="pause per worker between articles (s)")
+    ap.add_argument("--headless", action="store_true", default=HEADLESS)
+    ap.add_argument("--urls-file", default=None, help="scrape these URLs (one per line) instead of the listing")
+    ap.add_argument("--no-resume", dest="resume", action="store_false", help="start over instead of skipping scraped URLs")
+    asyncio.run(run(ap.parse_args()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,374 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def sha1(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class FetchResult:
+    url: str
+    html: Optional[str] = None
+    status: Optional[int] = None
+    # "cache" (no request made), "not_modified" (304 on a conditional GET),
+    # "fetched" (new body) or "error".
+    source: str = "error"
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.html is not None
+
+
+class HostSchedule:
+    # Earliest start time (time.monotonic) of the next request per host. Not
+    # tied to an event loop, so the spacing holds across fetch_many calls,
+    # each of which may run on a loop of its own.
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, host: str) -> float:
+        # Seconds to wait before this request may start.
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, 0.0))
+            self._next[host] = start + self.interval
+        return start - now
+
+    def back_off(self, host: str, seconds: float) -> None:
+        with self._lock:
+            self._next[host] = max(self._next.get(host, 0.0), time.monotonic() + seconds)
+
+
+class HostLimiter:
+    # At most `concurrency` requests in flight per host, started at least
+    # 1 / rate seconds apart (as kept by `schedule`).
+    def __init__(self, concurrency: int, schedule: HostSchedule):
+        self.concurrency = max(1, concurrency)
+        self.schedule = schedule
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._sems:
+            self._sems[host] = asyncio.Semaphore(self.concurrency)
+        return self._sems[host]
+
+    async def wait_turn(self, host: str) -> None:
+        delay = self.schedule.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def back_off(self, host: str, seconds: float) -> None:
+        # A 429/503 slows the whole host down, not just the one request.
+        self.schedule.back_off(host, seconds)
+
+
+class FetchState:
+    # Append-only journal of validators and crawl progress, one JSON line per
+    # fetch plus one per crawl run start/finish; the last line for a URL (or
+    # crawl name) wins.
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        self.runs: Dict[str, Dict] = {}
+        self.lines = 0
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from an interrupted run
+                    if "url" in rec:
+                        self.entries[rec["url"]] = rec
+                    elif "run" in rec:
+                        self.runs[rec["crawl"]] = rec
+                    self.lines += 1
+
+    def get(self, url: str) -> Dict:
+        return self.entries.get(url, {})
+
+    def done(self, url: str, run: Optional[str]) -> bool:
+        rec = self.entries.get(url)
+        return (
+            run is not None and bool(rec)
+            and rec.get("run") == run and rec.get("source") in ("fetched", "not_modified")
+        )
+
+    def begin(self, crawl: str) -> str:
+        # Resume the crawl's last run if it never finished, else start a new
+        # one, so only an interrupted refresh skips what it already did.
+        prev = self.runs.get(crawl)
+        if prev is not None and not prev.get("finished"):
+            return prev["run"]
+        now = time.time()
+        run = f"{crawl}:{now:.6f}"
+        self._append({"crawl": crawl, "run": run, "finished": False, "ts": now})
+        return run
+
+    def finish(self, crawl: str, run: str) -> None:
+        self._append({"crawl": crawl, "run": run, "finished": True, "ts": time.time()})
+
+    def record(self, rec: Dict) -> None:
+        self._append(rec)
+
+    def _append(self, rec: Dict) -> None:
+        with self._lock:
+            if "url" in rec:
+                self.entries[rec["url"]] = rec
+            else:
+                self.runs[rec["crawl"]] = rec
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.lines += 1
+
+    def compact(self) -> None:
+        with self._lock:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for rec in list(self.runs.values()) + list(self.entries.values()):
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            self.lines = len(self.runs) + len(self.entries)
+
+
+class Fetcher:
+    # Pages go to `store` (an html_store.HtmlStore) when one is given, else
+    # to <sha1(url)>.html files under cache_dir.
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        state_path: Optional[Path] = None,
+        store=None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30,
+        max_retries: int = 4,
+        per_host_concurrency: int = 4,
+        per_host_rate: float = 2.0,
+        max_connections: int = 32,
+    ):
+        if cache_dir is None and store is None:
+            raise ValueError("Fetcher needs a cache_dir or a store")
+        self.store = store
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        base = store.path if store is not None else self.cache_dir
+        self.state = FetchState(state_path or base.parent / "fetch_state.jsonl")
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.max_connections = max_connections
+        # Kept for the fetcher's lifetime, so one-URL calls such as
+        # fetch_html in a pagination loop are spaced out too.
+        self.schedule = HostSchedule(per_host_rate)
+
+    def cache_path(self, url: str) -> Path:
+        return self.cache_dir / f"{sha1(url)}.html"
+
+    def read_cache(self, url: str) -> Optional[str]:
+        if self.store is not None:
+            return self.store.get(url)
+        path = self.cache_path(url)
+        if not path.exists():
+            return None
+        return path.read_text(encoding="utf-8", errors="ignore")
+
+    def write_cache(self, url: str, html: str, meta: Dict) -> None:
+        if self.store is not None:
+            self.store.put(url, html, **meta)
+            return
+        path = self.cache_path(url)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(html, encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _cached_meta(self, url: str) -> Dict:
+        if self.store is not None:
+            return self.store.meta(url)
+        path = self.cache_path(url)
+        return {"fetched_at": path.stat().st_mtime} if path.exists() else {}
+
+    def _validators(self, url: str) -> Dict[str, str]:
+        rec = dict(self._cached_meta(url))
+        rec.update({k: v for k, v in self.state.get(url).items() if v})
+        headers = {}
+        if rec.get("etag"):
+            headers["If-None-Match"] = rec["etag"]
+        if rec.get("last_modified"):
+            headers["If-Modified-Since"] = rec["last_modified"]
+        elif rec.get("fetched_at"):
+            # Pages cached before validators were kept: fall back to the
+            # time they were written.
+            headers["If-Modified-Since"] = formatdate(rec["fetched_at"], usegmt=True)
+        return headers
+
+    def _client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        return httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits, follow_redirects=True)
+
+    async def _fetch_one(
+        self,
+        client: httpx.AsyncClient,
+        limiter: HostLimiter,
+        url: str,
+        refresh: bool,
+        run: Optional[str],
+    ) -> FetchResult:
+        cached = self.read_cache(url)
+        if cached is not None and not refresh:
+            return FetchResult(url, cached, None, "cache")
+        if cached is not None and self.state.done(url, run):
+            # Already revalidated by this run before it was interrupted.
+            return FetchResult(url, cached, self.state.get(url).get("status"), "cache")
+
+        host = urlsplit(url).netloc
+        headers = self._validators(url) if cached is not None else {}
+        last_err = None
+        async with limiter.semaphore(host):
+            for attempt in range(1, self.max_retries + 1):
+                await limiter.wait_turn(host)
+                try:
+                    resp = await client.get(url, headers=headers)
+                except httpx.HTTPError as e:
+                    last_err = f"{type(e).__name__}: {e}"
+                else:
+                    if resp.status_code == 304 and cached is not None:
+                        return self._done(url, resp, cached, "not_modified", run)
+                    if resp.status_code < 400:
+                        return self._done(url, resp, resp.text, "fetched", run)
+                    last_err = f"HTTP {resp.status_code}"
+                    if resp.status_code not in RETRY_STATUSES:
+                        break
+                    retry_after = _retry_after(resp)
+                    if retry_after is not None:
+                        limiter.back_off(host, retry_after)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(10, 2 ** (attempt - 1)) * (0.5 + random.random()))
+
+        # Keep the validators, or the next refresh would re-download the page.
+        prev = self.state.get(url)
+        self.state.record({
+            "url": url,
+            "run": run,
+            "source": "error",
+            "error": last_err,
+            "etag": prev.get("etag"),
+            "last_modified": prev.get("last_modified"),
+            "ts": time.time(),
+        })
+        return FetchResult(url, cached, None, "error", last_err)
+
+    def _done(self, url: str, resp: httpx.Response, html: str, source: str, run: Optional[str]) -> FetchResult:
+        prev = self.state.get(url)
+        meta = {
+            "status": resp.status_code,
+            # A 304 may omit the validators; keep the ones it was matched on.
+            "etag": resp.headers.get("etag") or prev.get("etag"),
+            "last_modified": resp.headers.get("last-modified") or prev.get("last_modified"),
+            "fetched_at": time.time(),
+        }
+        if source == "fetched":
+            self.write_cache(url, html, dict(meta, content_type=resp.headers.get("content-type")))
+        elif self.store is not None:
+            self.store.touch(url, **meta)
+        self.state.record({
+            "url": url,
+            "run": run,
+            "source": source,
+            "status": meta["status"],
+            "etag": meta["etag"],
+            "last_modified": meta["last_modified"],
+            "ts": meta["fetched_at"],
+        })
+        return FetchResult(url, html, resp.status_code, source)
+
+    async def fetch_many(
+        self,
+        urls: Iterable[str],
+        refresh: bool = False,
+        crawl: Optional[str] = "default",
+        on_result: Optional[Callable[[FetchResult], None]] = None,
+    ) -> Dict[str, FetchResult]:
+        # refresh=False serves cached pages without a request, as the
+        # notebooks always did; refresh=True revalidates them with
+        # conditional GETs. Re-running a crawl name whose last run was
+        # interrupted skips URLs that run already revalidated; once a run
+        # finishes, the next one under that name starts over. crawl=None
+        # never resumes.
+        urls = list(dict.fromkeys(urls))
+        limiter = HostLimiter(self.per_host_concurrency, self.schedule)
+        results: Dict[str, FetchResult] = {}
+        run_id = self.state.begin(crawl) if refresh and crawl is not None else None
+        async with self._client() as client:
+            async def run(url: str) -> None:
+                res = await self._fetch_one(client, limiter, url, refresh, run_id)
+                results[url] = res
+                if on_result is not None:
+                    on_result(res)
+
+            await asyncio.gather(*(run(u) for u in urls))
+        if run_id is not None:
+            self.state.finish(crawl, run_id)
+        if self.state.lines > 2 * len(self.state.entries) + 1000:
+            self.state.compact()
+        return {u: results[u] for u in urls}
+
+    def fetch_all(self, urls: Iterable[str], **kwargs) -> Dict[str, FetchResult]:
+        return _run(self.fetch_many(urls, **kwargs))
+
+    def fetch_html(self, url: str, force: bool = False) -> str:
+        res = self.fetch_all([url], refresh=force, crawl=None)[url]
+        if res.source == "error":
+            raise RuntimeError(f"Failed to fetch {url}. Last error: {res.error}")
+        return res.html
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _run(coro):
+    # Jupyter already runs an event loop in the main thread, so asyncio.run
+    # is not allowed there; run the crawl on a loop of its own instead.
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
@@ -0,0 +1,218 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from fetcher import sha1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    status INTEGER,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL
+)
+"""
+META_FIELDS = ("url", "size", "status", "content_type", "etag", "last_modified", "fetched_at")
+
+
+class HtmlStore:
+    # One SQLite file instead of a <sha1(url)>.html file per page. Bodies are
+    # zlib-compressed UTF-8 under the same sha1(url) key the directory
+    # caches use, next to the fetch-time metadata.
+    def __init__(self, path: Path, level: int = 6):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.level = level
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "HtmlStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def __contains__(self, url: str) -> bool:
+        return self.has_key(sha1(url))
+
+    def has_key(self, key: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM pages WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, url: str) -> Optional[str]:
+        return self.get_key(sha1(url))
+
+    def get_key(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT body FROM pages WHERE key = ?", (key,)).fetchone()
+        return _decode(row[0]) if row else None
+
+    def meta(self, url: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(META_FIELDS)} FROM pages WHERE key = ?", (sha1(url),)
+            ).fetchone()
+        return dict(zip(META_FIELDS, row)) if row else {}
+
+    def put(self, url: str, html: str, **meta: Any) -> None:
+        self.put_many([(sha1(url), html, dict(meta, url=url))])
+
+    def put_many(self, items: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+        rows = []
+        for key, html, meta in items:
+            raw = html.encode("utf-8")
+            rows.append((
+                key,
+                meta.get("url"),
+                zlib.compress(raw, self.level),
+                len(raw),
+                meta.get("status"),
+                meta.get("content_type"),
+                meta.get("etag"),
+                meta.get("last_modified"),
+                meta.get("fetched_at", time.time()),
+            ))
+        with self._lock:
+            # Keep a known URL when a later write (e.g. a migration) lacks it.
+            self._db.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET url = COALESCE(excluded.url, url), body = excluded.body, "
+                "size = excluded.size, status = excluded.status, content_type = excluded.content_type, "
+                "etag = excluded.etag, last_modified = excluded.last_modified, fetched_at = excluded.fetched_at",
+                rows,
+            )
+            self._db.commit()
+        return len(rows)
+
+    def touch(self, url: str, **meta: Any) -> None:
+        # A 304: the body and the status it was fetched with stay, the
+        # validators and fetch time move on. Pages migrated without their
+        # URL get it here.
+        meta.setdefault("fetched_at", time.time())
+        cols = [k for k in ("etag", "last_modified", "fetched_at") if meta.get(k) is not None]
+        with self._lock:
+            self._db.execute(
+                f"UPDATE pages SET {''.join(f'{c} = ?, ' for c in cols)}url = COALESCE(url, ?) WHERE key = ?",
+                [meta[c] for c in cols] + [url, sha1(url)],
+            )
+            self._db.commit()
+
+    def iter_pages(self, batch_size: int = 256) -> Iterator[Tuple[str, Optional[str], str]]:
+        # (key, url, html) for every page in storage order, for full re-parses.
+        # A separate connection, so writes can go on while this streams.
+        db = sqlite3.connect(str(self.path))
+        try:
+            cur = db.execute("SELECT key, url, body FROM pages ORDER BY rowid")
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    return
+                for key, url, body in rows:
+                    yield key, url, _decode(body)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n, raw, packed = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM pages"
+            ).fetchone()
+            with_url = self._db.execute("SELECT COUNT(*) FROM pages WHERE url IS NOT NULL").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "pages": n,
+            "pages_with_url": with_url,
+            "html_bytes": raw,
+            "stored_bytes": packed,
+            "file_bytes": self.path.stat().st_size,
+        }
+
+
+def _decode(body: bytes) -> str:
+    return zlib.decompress(body).decode("utf-8", errors="ignore")
+
+
+def known_urls(paths: Iterable[Path]) -> Dict[str, str]:
+    # The directory caches are keyed by sha1(url) alone; recover the URLs
+    # from any JSONL with a "url" field (raw scrapes, fetch_state.jsonl).
+    urls = {}
+    for path in paths:
+        with Path(path).open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    url = json.loads(line).get("url")
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                if url:
+                    urls[sha1(url)] = url
+    return urls
+
+
+def migrate(cache_dir: Path, store: HtmlStore, urls: Dict[str, str], delete: bool = False, batch_size: int = 500) -> Dict[str, int]:
+    files = sorted(Path(cache_dir).glob("*.html"))
+    counts = {"files": len(files), "migrated": 0, "with_url": 0, "deleted": 0}
+    for i in range(0, len(files), batch_size):
+        chunk = files[i:i + batch_size]
+        items = []
+        for fp in chunk:
+            key = fp.stem
+            meta = {"url": urls.get(key), "fetched_at": fp.stat().st_mtime}
+            items.append((key, fp.read_text(encoding="utf-8", errors="ignore"), meta))
+            counts["with_url"] += meta["url"] is not None
+        counts["migrated"] += store.put_many(items)
+        if delete:
+            # Only after the batch is committed to the store.
+            for fp in chunk:
+                fp.unlink()
+            counts["deleted"] += len(chunk)
+    return counts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Packed, compressed HTML cache.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    m = sub.add_parser("migrate", help="copy a <sha1>.html cache directory into a store")
+    m.add_argument("cache_dir")
+    m.add_argument("store")
+    m.add_argument("--urls-from", nargs="*", default=[], help="JSONL files with a url field (e.g. data/factual_ro_raw.jsonl)")
+    m.add_argument("--delete", action="store_true", help="remove each file once it is in the store")
+
+    s = sub.add_parser("stats", help="page count and sizes")
+    s.add_argument("store")
+    args = ap.parse_args()
+
+    if args.cmd == "migrate":
+        with HtmlStore(Path(args.store)) as store:
+            report = migrate(Path(args.cache_dir), store, known_urls(Path(p) for p in args.urls_from), delete=args.delete)
+            report.update(store.stats())
+    else:
+        with HtmlStore(Path(args.store)) as store:
+            report = store.stats()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
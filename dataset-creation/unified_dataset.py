@@ -0,0 +1,452 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent
+OUT_DIR = ROOT / "unified"
+
+SOURCES = {
+    "afp": ROOT / "AFP" / "out_afp_verificat" / "afp_verificat_dataset.csv",
+    "factual": ROOT / "Factual" / "data" / "factual_ro_dataset_postprocessed.csv",
+    "veridica": ROOT / "Veridica" / "data_veridica" / "veridica_dataset.csv",
+    "ocr": ROOT / "Pseudo-FakeRom" / "ocr_fake_news_dataset.csv",
+    "tnr": ROOT / "TNR" / "out_tnr" / "tnr_satire_dataset.csv",
+}
+
+# Bump when a loader, a derived column or dedupe changes, so everything is rebuilt.
+VERSION = 2
+FORMAT = "parquet" if importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet") else "pickle"
+
+COLUMNS = [
+    "dataset", "id", "url", "source_url", "source_domain", "title", "claim",
+    "label_fine", "y", "text_long", "text_short",
+]
+DERIVED = ["text_input", "text_input_clickbait", "text_len", "text_hash"]
+
+TRUE_SET_RO = {"ADEVĂRAT", "ADEVARAT", "PARȚIAL ADEVĂRAT", "PARTIAL ADEVARAT", "PARTIAL ADEVĂRAT", "REAL", "TRUE"}
+FALSE_SET_RO = {
+    "FALS", "TRUNCHIAT", "ÎNȘELĂTOR", "INȘELĂTOR", "INSELATOR", "CONTEXT LIPSĂ", "CONTEXT LIPSA",
+    "LIPSA CONTEXTULUI", "FOTOGRAFIE ALTERATĂ", "FOTOGRAFIE ALTERATA",
+    "VIDEOCLIP ALTERAT", "VIDEO ALTERAT", "DEEPFAKE", "SATIRĂ", "SATIRA", "SATIRE", "FARSĂ", "FARSA",
+    "FAKE", "FALSE", "FAKE NEWS", "DEZINFORMARE", "FABRICATED", "PROPAGANDA", "PROPAGANDĂ", "PROPAGANDĂ DE RĂZBOI"
+}
+UNVERIFIABLE_SET_RO = {"IMPOSIBIL DE VERIFICAT", "S-A RĂZGÂNDIT", "S-A RAZGANDIT", "PLAUSIBLE"}
+LABEL_BINARY = {**{k: 1 for k in TRUE_SET_RO}, **{k: 0 for k in FALSE_SET_RO}}
+LABEL_GROUP_BINARY = {"REAL": 1, "TRUE": 1, "FAKE": 0, "FALSE": 0}
+
+LONG_MIN_CHARS = 200
+CLICKBAIT_MAX_CHARS = 250
+BINARY_MIN_LEN = 30
+HASH_CHARS = 2000
+
+_SENT_SPLIT_RE = re.compile(r"(?<=[\.!?])\s+")
+# urlparse's netloc: whatever follows "//", after an optional scheme.
+_NETLOC_RE = re.compile(r"^(?:[A-Za-z][A-Za-z0-9+\-.]*:)?//([^/?#]*)")
+
+
+# -----------------------
+# Row-wise helpers, as the notebooks had them
+# -----------------------
+
+def normalize_ws(s: str) -> str:
+    return " ".join((s or "").split())
+
+
+def normalize_label(s: str) -> str:
+    return normalize_ws(s).upper()
+
+
+def md5(s: str) -> str:
+    return hashlib.md5((s or "").encode("utf-8")).hexdigest()
+
+
+def get_domain(u: str) -> str:
+    u = (u or "").strip()
+    if not u:
+        return ""
+    try:
+        return urlparse(u).netloc.lower().replace("www.", "")
+    except ValueError:
+        return ""
+
+
+def map_label_binary(label_fine: str) -> Optional[int]:
+    return LABEL_BINARY.get(normalize_label(label_fine))
+
+
+# -----------------------
+# Column-wise versions
+# -----------------------
+
+def _ws(s: pd.Series) -> pd.Series:
+    # One pass over the column; split/join beats a \s+ regex replace here.
+    return pd.Series([" ".join(x.split()) for x in s], index=s.index, dtype=str)
+
+
+def _hash_key(s: str) -> str:
+    # normalize_ws(s).lower()[:HASH_CHARS] without normalizing the whole
+    # article: a normalized prefix is a prefix of the normalized text.
+    cut = HASH_CHARS + 64
+    head = " ".join(s[:cut].split()).lower()
+    if len(head) < HASH_CHARS and len(s) > cut:
+        head = " ".join(s.split()).lower()
+    return head[:HASH_CHARS]
+
+
+def _domain(s: pd.Series) -> pd.Series:
+    s = s.str.strip()
+    d = s.str.extract(_NETLOC_RE, expand=False).fillna("").str.lower().str.replace("www.", "", regex=False)
+    # Bracketed hosts are where urlparse validates (and may reject) the netloc.
+    odd = d.str.contains("[", regex=False)
+    if odd.any():
+        d[odd] = s[odd].map(get_domain)
+    return d
+
+
+def _binary(labels: pd.Series, mapping: Dict[str, int]) -> pd.Series:
+    return labels.map(mapping).astype("Int8")
+
+
+def _col(df: pd.DataFrame, *names: str, default: str = "") -> pd.Series:
+    for name in names:
+        if name in df.columns:
+            return df[name]
+    return pd.Series(default, index=df.index, dtype=str)
+
+
+def _short(title: pd.Series, claim: pd.Series) -> pd.Series:
+    return (title.where(title != "", claim) + " [SEP] " + claim).str.strip()
+
+
+def _read(path: Path) -> pd.DataFrame:
+    # Everything as text with empty cells as "", so no per-cell NaN checks.
+    return pd.read_csv(path, encoding="utf-8", dtype=str, keep_default_na=False)
+
+
+def _frame(dataset: str, df: pd.DataFrame, **cols: Any) -> pd.DataFrame:
+    # Scalars are broadcast over the source's rows. (Assigning one to an empty
+    # DataFrame, as the notebooks did first thing, left "dataset" all NaN.)
+    out = pd.DataFrame(index=df.index)
+    out["dataset"] = dataset
+    out["id"] = _col(df, "id")
+    for name in COLUMNS[2:]:
+        out[name] = cols.get(name, "")
+    out["y"] = out["y"].astype("Int8")
+    return out.reset_index(drop=True)
+
+
+# -----------------------
+# Loaders
+# -----------------------
+
+def load_afp(path: Path) -> pd.DataFrame:
+    df = _read(path)
+    title, claim = _ws(_col(df, "title")), _ws(_col(df, "claim"))
+    label = _col(df, "label_norm", "label")
+    source_url = _col(df, "source_url")
+    return _frame(
+        "afp", df,
+        url=_col(df, "url"),
+        source_url=source_url,
+        source_domain=_domain(source_url),
+        title=title,
+        claim=claim,
+        label_fine=label,
+        y=_binary(_ws(label).str.upper(), LABEL_BINARY),
+        text_short=_short(title, claim),
+    )
+
+
+def load_factual(path: Path) -> pd.DataFrame:
+    df = _read(path)
+    title, claim = _ws(_col(df, "title")), _ws(_col(df, "claim"))
+    label = _col(df, "label")
+    source_url = _col(df, "source", "speaker_url")
+    return _frame(
+        "factual", df,
+        url=_col(df, "url"),
+        source_url=source_url,
+        source_domain=_domain(source_url),
+        title=title,
+        claim=claim,
+        label_fine=label,
+        y=_binary(_ws(label).str.upper(), LABEL_BINARY),
+        text_long=_ws(_col(df, "text")),
+        text_short=_short(title, claim),
+    )
+
+
+def load_veridica(path: Path) -> pd.DataFrame:
+    df = _read(path)
+    title, claim = _ws(_col(df, "title")), _ws(_col(df, "claim"))
+    url = _col(df, "url")
+    return _frame(
+        "veridica", df,
+        url=url,
+        source_domain=_domain(url),
+        title=title,
+        claim=claim,
+        label_fine=_col(df, "label"),
+        # Every Veridica article is a debunked narrative.
+        y=0,
+        text_long=_ws(_col(df, "text")),
+        text_short=_short(title, claim),
+    )
+
+
+def load_ocr(path: Path) -> pd.DataFrame:
+    df = _read(path)
+    label = _col(df, "label")
+    if "label_group" in df.columns:
+        y = _binary(df["label_group"].str.upper(), LABEL_GROUP_BINARY)
+    else:
+        y = _binary(_ws(label).str.upper(), LABEL_BINARY)
+    return _frame(
+        "ocr", df,
+        label_fine=label,
+        y=y,
+        text_long=_ws(_col(df, "text")),
+    )
+
+
+def load_tnr(path: Path) -> pd.DataFrame:
+    df = _read(path)
+    title = _ws(_col(df, "title"))
+    url = _col(df, "url")
+    label = _col(df, "label", default="SATIRE")
+    return _frame(
+        "tnr", df,
+        url=url,
+        source_url=url,
+        source_domain=_domain(url),
+        title=title,
+        label_fine=label,
+        y=_binary(_ws(label).str.upper(), LABEL_BINARY),
+        text_long=_ws(_col(df, "text")),
+        text_short=title,
+    )
+
+
+LOADERS: Dict[str, Callable[[Path], pd.DataFrame]] = {
+    "afp": load_afp,
+    "factual": load_factual,
+    "veridica": load_veridica,
+    "ocr": load_ocr,
+    "tnr": load_tnr,
+}
+
+
+def add_inputs(df: pd.DataFrame) -> pd.DataFrame:
+    # The model inputs the notebooks derived row by row.
+    long_, short = df["text_long"], df["text_short"].str.strip()
+    with_long = ("[SHORT] " + short + "\n[LONG] " + long_).where(short != "", long_).str.strip()
+    df["text_input"] = with_long.where(long_.str.len() >= LONG_MIN_CHARS, short)
+
+    first = long_.str.split(_SENT_SPLIT_RE, n=1, regex=True).str[0].fillna("").str.strip()
+    first = first.where(first != "", long_)
+    title, claim = df["title"].str.strip(), df["claim"].str.strip()
+    df["text_input_clickbait"] = (
+        title.where(title != "", claim.where(claim != "", first)).str[:CLICKBAIT_MAX_CHARS]
+    )
+
+    df["text_len"] = df["text_input"].str.len()
+    df["text_hash"] = [md5(_hash_key(s)) for s in df["text_input"]]
+    return df
+
+
+def _binary_ok(df: pd.DataFrame, min_len: int = BINARY_MIN_LEN) -> pd.Series:
+    return df["y"].isin([0, 1]) & (df["text_len"] >= min_len)
+
+
+def dedupe(df: pd.DataFrame) -> pd.DataFrame:
+    # Same md5 of the normalized, lower-cased first 2000 chars as the
+    # notebooks' text_hash. Among repeats, a row binary_rows keeps beats one
+    # it drops (unlabeled or too short), so an earlier unusable copy cannot
+    # cost a labeled one; then the first source in SOURCES order wins.
+    # Rows without text are left alone; the row order is kept.
+    empty = (df["text_len"] == 0).to_numpy()
+    pos = np.argsort(~_binary_ok(df).to_numpy(), kind="stable")
+    dup = np.empty(len(df), dtype=bool)
+    dup[pos] = df["text_hash"].iloc[pos].duplicated().to_numpy()
+    return df[empty | ~dup].reset_index(drop=True)
+
+
+def binary_rows(df: pd.DataFrame, min_len: int = BINARY_MIN_LEN) -> pd.DataFrame:
+    out = df[_binary_ok(df, min_len)].copy()
+    out["y"] = out["y"].astype(int)
+    return out
+
+
+# -----------------------
+# Incremental compile
+# -----------------------
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _suffix(fmt: str) -> str:
+    return ".parquet" if fmt == "parquet" else ".pkl"
+
+
+def _write(df: pd.DataFrame, path: Path, fmt: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def _read_part(path: Path, fmt: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if fmt == "parquet" else pd.read_pickle(path)
+
+
+def _manifest_path(out_dir: Path) -> Path:
+    return Path(out_dir) / "manifest.json"
+
+
+def read_manifest(out_dir: Path = OUT_DIR) -> Dict[str, Any]:
+    path = _manifest_path(out_dir)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compile_sources(
+    sources: Optional[Dict[str, Path]] = None,
+    out_dir: Path = OUT_DIR,
+    force: bool = False,
+) -> Dict[str, Any]:
+    # Each source CSV becomes a part with the derived columns, rebuilt only
+    # when its sha256 (or VERSION / FORMAT) differs from the manifest. The
+    # parts are then concatenated in SOURCES order and deduplicated.
+    sources = dict(SOURCES if sources is None else sources)
+    out_dir = Path(out_dir)
+    prev = read_manifest(out_dir)
+    same_build = prev.get("version") == VERSION and prev.get("format") == FORMAT and not force
+    prev_sources = prev.get("sources", {}) if same_build else {}
+
+    t0 = time.perf_counter()
+    entries, status = {}, {}
+    for name, path in sources.items():
+        path = Path(path)
+        if not path.exists():
+            status[name] = "missing"
+            continue
+        digest = _sha256(path)
+        part = out_dir / "parts" / f"{name}{_suffix(FORMAT)}"
+        old = prev_sources.get(name)
+        if old and old["sha256"] == digest and part.exists():
+            entries[name] = old
+            status[name] = "cached"
+            continue
+        df = add_inputs(LOADERS[name](path))
+        _write(df, part, FORMAT)
+        entries[name] = {
+            "path": str(path),
+            "sha256": digest,
+            "bytes": path.stat().st_size,
+            "rows": len(df),
+            "part": str(part.relative_to(out_dir)),
+        }
+        status[name] = "compiled"
+
+    dataset_path = out_dir / f"dataset{_suffix(FORMAT)}"
+    unchanged = (
+        same_build
+        and dataset_path.exists()
+        and list(entries) == list(prev_sources)
+        and all(status[n] == "cached" for n in entries)
+    )
+    if unchanged:
+        summary = prev["dataset"]
+    else:
+        parts = [_read_part(out_dir / e["part"], FORMAT) for e in entries.values()]
+        data = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=COLUMNS + DERIVED)
+        deduped = dedupe(data)
+        _write(deduped, dataset_path, FORMAT)
+        summary = {
+            "path": str(dataset_path.relative_to(out_dir)),
+            "rows_in": len(data),
+            "rows": len(deduped),
+            "duplicates_dropped": len(data) - len(deduped),
+            "rows_by_dataset": deduped["dataset"].value_counts().to_dict(),
+        }
+        manifest = {
+            "version": VERSION,
+            "format": FORMAT,
+            "sources": entries,
+            "dataset": summary,
+            "compiled_at": time.time(),
+        }
+        # Written last: an interrupted run leaves the previous manifest,
+        # whose hashes then no longer match and are rebuilt next time.
+        tmp = _manifest_path(out_dir).with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, _manifest_path(out_dir))
+
+    return {
+        "sources": status,
+        "dataset": summary,
+        "format": FORMAT,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def load_dataset(
+    sources: Optional[Iterable[str]] = None,
+    out_dir: Path = OUT_DIR,
+    compile: bool = True,
+    dedupe: bool = True,
+) -> pd.DataFrame:
+    # The compiled, deduplicated dataset, brought up to date first.
+    # `sources` keeps only those datasets' rows. dedupe=False concatenates
+    # the per-source parts instead, so every source keeps all of its rows.
+    if compile:
+        compile_sources(out_dir=out_dir)
+    manifest = read_manifest(out_dir)
+    if not manifest:
+        raise FileNotFoundError(f"no compiled dataset in {out_dir}; run compile_sources() first")
+    if not dedupe:
+        wanted = manifest["sources"] if sources is None else set(sources)
+        parts = [
+            _read_part(Path(out_dir) / e["part"], manifest["format"])
+            for name, e in manifest["sources"].items() if name in wanted
+        ]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=COLUMNS + DERIVED)
+    data = _read_part(Path(out_dir) / manifest["dataset"]["path"], manifest["format"])
+    if sources is not None:
+        data = data[data["dataset"].isin(list(sources))].reset_index(drop=True)
+    return data
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compile the scraped datasets into one deduplicated training dataset.")
+    ap.add_argument("--out-dir", default=str(OUT_DIR))
+    ap.add_argument("--only", nargs="+", choices=sorted(SOURCES), help="compile just these sources")
+    ap.add_argument("--force", action="store_true", help="rebuild every part, even if its source is unchanged")
+    args = ap.parse_args()
+
+    sources = {k: v for k, v in SOURCES.items() if not args.only or k in args.only}
+    report = compile_sources(sources, Path(args.out_dir), force=args.force)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from . import config
+from .cache import artifact_version
+
+if TYPE_CHECKING:
+    from .models.clickbait import ClickbaitModel
+    from .models.fine6 import Fine6Model
+    from .models.fusion import FusionModel
+    from .models.multitask import MultiTaskModel
+    from .models.prefilter import PrefilterModel
+    from .models.source_prior import SourcePrior
+    from .models.veracity import VeracityModel
+
+
+if config.MODEL_LAYOUT not in config.MODEL_LAYOUTS:
+    raise ValueError(f"unsupported MODEL_LAYOUT: {config.MODEL_LAYOUT!r} (expected one of {config.MODEL_LAYOUTS})")
+
+if config.MODEL_LAYOUT == "multitask":
+    TRANSFORMERS = ("multitask",)
+else:
+    TRANSFORMERS = ("clickbait", "veracity", "fine6")
+COMPONENTS = TRANSFORMERS + ("fusion", "source_prior") + (("prefilter",) if config.PREFILTER_ENABLED else ())
+
+
+def component_paths() -> Dict[str, List[Path]]:
+    return {
+        "clickbait": [config.CLICKBAIT_MODEL_DIR],
+        "veracity": [config.VERACITY_MODEL_DIR],
+        "fine6": [config.FINE6_MODEL_DIR],
+        "multitask": [config.MULTITASK_MODEL_DIR],
+        "fusion": [config.FUSION_DIR],
+        "source_prior": [config.SOURCE_VERACITY_TABLE_PATH],
+        "prefilter": [config.PREFILTER_DIR],
+    }
+
+
+def component_fingerprints() -> Dict[str, str]:
+    from .models.backends import ONNX_DIRNAME
+
+    # The exported ONNX graphs are a cache derived from the weights next to
+    # them; writing them must not look like a new artifact version.
+    return {
+        name: artifact_version(paths, ignore=(ONNX_DIRNAME,))
+        for name, paths in component_paths().items()
+        if name in COMPONENTS
+    }
+
+
+def build_component(name: str):
+    if name == "clickbait":
+        from .models.clickbait import ClickbaitModel
+
+        return ClickbaitModel(
+            config.CLICKBAIT_MODEL_DIR,
+            device=config.DEVICE,
+            batch_size=config.INFERENCE_BATCH_SIZE,
+            precision=config.INFERENCE_PRECISION,
+            backend=config.INFERENCE_BACKEND,
+        )
+    if name == "veracity":
+        from .models.veracity import VeracityModel
+
+        return VeracityModel(
+            config.VERACITY_MODEL_DIR,
+            device=config.DEVICE,
+            batch_size=config.INFERENCE_BATCH_SIZE,
+            precision=config.INFERENCE_PRECISION,
+            backend=config.INFERENCE_BACKEND,
+            max_windows=config.LONG_DOC_MAX_WINDOWS,
+            window_stride=config.LONG_DOC_STRIDE,
+            window_pooling=config.LONG_DOC_POOLING,
+        )
+    if name == "fine6":
+        from .models.fine6 import Fine6Model
+
+        return Fine6Model(
+            config.FINE6_MODEL_DIR,
+            labels=config.FINE6_LABELS,
+            device=config.DEVICE,
+            batch_size=config.INFERENCE_BATCH_SIZE,
+            precision=config.INFERENCE_PRECISION,
+            backend=config.INFERENCE_BACKEND,
+            max_windows=config.LONG_DOC_MAX_WINDOWS,
+            window_stride=config.LONG_DOC_STRIDE,
+            window_pooling=config.LONG_DOC_POOLING,
+        )
+    if name == "multitask":
+        from .models.multitask import MultiTaskModel
+
+        return MultiTaskModel(
+            config.MULTITASK_MODEL_DIR,
+            labels=config.FINE6_LABELS,
+            device=config.DEVICE,
+            batch_size=config.INFERENCE_BATCH_SIZE,
+            precision=config.INFERENCE_PRECISION,
+            backend=config.INFERENCE_BACKEND,
+            max_windows=config.LONG_DOC_MAX_WINDOWS,
+            window_stride=config.LONG_DOC_STRIDE,
+            window_pooling=config.LONG_DOC_POOLING,
+        )
+    if name == "fusion":
+        from .models.fusion import FusionModel
+
+        return FusionModel(
+            model_path=config.FUSION_MODEL_PATH,
+            threshold_path=config.FUSION_THRESHOLD_PATH,
+            feature_schema_path=config.FUSION_FEATURE_SCHEMA_PATH,
+        )
+    if name == "source_prior":
+        from .models.source_prior import SourcePrior
+
+        return SourcePrior(
+            table_csv=config.SOURCE_VERACITY_TABLE_PATH,
+            platform_domains=config.PLATFORM_DOMAINS,
+            platform_neutral=config.PLATFORM_NEUTRAL,
+        )
+    if name == "prefilter":
+        from .models.prefilter import PrefilterModel
+
+        return PrefilterModel(
+            model_path=config.PREFILTER_MODEL_PATH,
+            thresholds_path=config.PREFILTER_THRESHOLDS_PATH,
+        )
+    raise ValueError(f"unknown artifact component: {name!r}")
+
+
+@dataclass(frozen=True)
+class ArtifactSet:
+    fusion: FusionModel
+    source_prior: SourcePrior
+    # Either the three single-task models or the shared multitask one,
+    # depending on MODEL_LAYOUT.
+    clickbait: Optional[ClickbaitModel] = None
+    veracity: Optional[VeracityModel] = None
+    fine6: Optional[Fine6Model] = None
+    multitask: Optional[MultiTaskModel] = None
+    prefilter: Optional[PrefilterModel] = None
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    load_seconds: Dict[str, float] = field(default_factory=dict)
+    generation: int = 0
+
+    @classmethod
+    def create(cls) -> "ArtifactSet":
+        return cls(**{name: build_component(name) for name in COMPONENTS})
+
+    @property
+    def share_encodings(self) -> bool:
+        if self.veracity is None or self.fine6 is None:
+            return False
+        return (
+            bool(self.veracity.tokenizer_fingerprint)
+            and self.veracity.tokenizer_fingerprint == self.fine6.tokenizer_fingerprint
+            and self.veracity.max_windows == self.fine6.max_windows
+            and self.veracity.window_stride == self.fine6.window_stride
+        )
+
+    @property
+    def version(self) -> str:
+        return artifact_version(
+            [],
+            extra=(
+                *(self.fingerprints.get(name, "") for name in COMPONENTS),
+                config.INFERENCE_PRECISION,
+                config.INFERENCE_BACKEND,
+                config.LONG_DOC_MAX_WINDOWS,
+                config.LONG_DOC_STRIDE,
+                config.LONG_DOC_POOLING,
+                config.INCONCLUSIVE_MIN_TOP_PROB,
+                config.NEUTRAL_MAX_TEXT_LEN,
+                config.NEUTRAL_CONTENT_MAX_P_TRUE,
+                config.HIGH_TRUST_MIN_P_TRUE,
+            ),
+        )
+
+    @property
+    def model_version(self) -> str:
+        # Only what the transformer outputs depend on; a new source table or
+        # fusion model keeps this unchanged.
+        return artifact_version(
+            [],
+            extra=(
+                *(self.fingerprints.get(name, "") for name in TRANSFORMERS),
+                config.INFERENCE_PRECISION,
+                config.INFERENCE_BACKEND,
+                config.LONG_DOC_MAX_WINDOWS,
+                config.LONG_DOC_STRIDE,
+                config.LONG_DOC_POOLING,
+            ),
+        )
+
+    def load(self, names: Iterable[str] = COMPONENTS) -> "ArtifactSet":
+        names = list(names)
+        fingerprints = component_fingerprints()
+
+        def _load(name: str) -> float:
+            t0 = time.perf_counter()
+            getattr(self, name).load()
+            return time.perf_counter() - t0
+
+        # Tokenizer parsing, file reads and tensor copies mostly release the
+        # GIL, so the components load side by side instead of back to back.
+        workers = max(1, min(config.ARTIFACT_LOAD_WORKERS, len(names)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="artifact-load") as pool:
+            seconds = dict(zip(names, pool.map(_load, names)))
+
+        return replace(
+            self,
+            fingerprints={**self.fingerprints, **{name: fingerprints[name] for name in names}},
+            load_seconds={**self.load_seconds, **seconds},
+        )
+
+    def with_reloaded(self, names: Iterable[str]) -> "ArtifactSet":
+        names = list(names)
+        fresh = {name: build_component(name) for name in names}
+        return replace(self, generation=self.generation + 1, **fresh).load(names)
+
+
+@dataclass
+class ReloadReport:
+    reloaded: List[str]
+    seconds: float
+    version: str
+    generation: int
+    error: Optional[str] = None
+
+
+class ArtifactManager:
+    def __init__(self, pipeline, *, watch_interval_s: float = 0.0):
+        self.pipeline = pipeline
+        self.watch_interval_s = float(watch_interval_s)
+
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self.last_report = None  # type: Optional[ReloadReport]
+
+    def changed(self) -> List[str]:
+        current = self.pipeline.artifacts.fingerprints
+        latest = component_fingerprints()
+        return [name for name in COMPONENTS if latest[name] != current.get(name)]
+
+    def reload(self, names: Optional[Iterable[str]] = None) -> ReloadReport:
+        with self._reload_lock:
+            self.pipeline.load()
+            t0 = time.perf_counter()
+            targets = self.changed() if names is None else list(names)
+            unknown = [n for n in targets if n not in COMPONENTS]
+            if unknown:
+                raise ValueError(f"unknown artifact components: {unknown}")
+
+            old = self.pipeline.artifacts
+            if not targets:
+                report = ReloadReport([], time.perf_counter() - t0, old.version, old.generation)
+                self.last_report = report
+                return report
+
+            try:
+                new = old.with_reloaded(targets)
+                if any(name in TRANSFORMERS for name in targets):
+                    self.pipeline.warm_up(new)
+            except Exception as e:
+                report = ReloadReport(
+                    targets, time.perf_counter() - t0, old.version, old.generation, error=repr(e)
+                )
+                self.last_report = report
+                return report
+
+            self.pipeline.swap(new)
+            report = ReloadReport(targets, time.perf_counter() - t0, new.version, new.generation)
+            self.last_report = report
+            return report
+
+    def start(self) -> None:
+        if self.watch_interval_s <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.watch_interval_s + 1.0)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_interval_s):
+            try:
+                if self.changed():
+                    report = self.reload()
+                    print(f"[artifacts] reload: {report}", flush=True)
+            except Exception as e:
+                print(f"[artifacts] watcher error: {e!r}", flush=True)
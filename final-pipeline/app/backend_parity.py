@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from . import config
+from .models.clickbait import ClickbaitModel
+from .models.fine6 import Fine6Model
+from .models.veracity import VeracityModel
+from .quant_parity import load_records
+from .utils.text import build_text_input, normalize_ws
+
+
+def _logits(model, texts: List[str]) -> tuple[np.ndarray, float]:
+    t0 = time.perf_counter()
+    if isinstance(model, Fine6Model):
+        res = model.predict_batch(texts)
+    else:
+        res = model.predict_proba_batch(texts)
+    return np.array([r.logits for r in res]), time.perf_counter() - t0
+
+
+def compare(name: str, ref_model, cand_model, texts: List[str], atol: float) -> Dict[str, Any]:
+    ref, t_ref = _logits(ref_model, texts)
+    cand, t_cand = _logits(cand_model, texts)
+    diff = np.abs(ref - cand)
+    max_diff = float(diff.max()) if diff.size else 0.0
+    return {
+        "model": name,
+        "n": len(texts),
+        "max_abs_logit_diff": max_diff,
+        "mean_abs_logit_diff": float(diff.mean()) if diff.size else 0.0,
+        "argmax_agreement": float((ref.argmax(axis=1) == cand.argmax(axis=1)).mean()) if len(texts) else 1.0,
+        "ref_seconds": t_ref,
+        "cand_seconds": t_cand,
+        "ok": max_diff <= atol,
+    }
+
+
+def run(
+    records: List[Dict[str, Any]],
+    *,
+    backend: str,
+    precision: str,
+    batch_size: int,
+    atol: float,
+) -> Dict[str, Any]:
+    text_inputs = [
+        build_text_input(title=r.get("title"), claim=r.get("claim"), body=r.get("body"))
+        for r in records
+    ]
+    clickbait_texts = [
+        normalize_ws(r.get("title") or "") or t
+        for r, t in zip(records, text_inputs)
+    ]
+
+    specs = [
+        ("clickbait", lambda b: ClickbaitModel(
+            config.CLICKBAIT_MODEL_DIR, device="cpu", batch_size=batch_size, precision=precision, backend=b
+        ), clickbait_texts),
+        ("veracity", lambda b: VeracityModel(
+            config.VERACITY_MODEL_DIR, device="cpu", batch_size=batch_size, precision=precision, backend=b
+        ), text_inputs),
+        ("fine6", lambda b: Fine6Model(
+            config.FINE6_MODEL_DIR, labels=config.FINE6_LABELS, device="cpu",
+            batch_size=batch_size, precision=precision, backend=b,
+        ), text_inputs),
+    ]
+
+    reports = []
+    for name, build, texts in specs:
+        ref_model = build("torch")
+        ref_model.load()
+        cand_model = build(backend)
+        cand_model.load()
+        reports.append(compare(name, ref_model, cand_model, texts, atol))
+        del ref_model, cand_model
+
+    return {
+        "n_records": len(records),
+        "backend": backend,
+        "precision": precision,
+        "atol": atol,
+        "ok": all(r["ok"] for r in reports),
+        "models": reports,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Check that an inference backend matches the torch logits.")
+    ap.add_argument("--input", required=True, help="sample (.jsonl or .csv with title/claim/body)")
+    ap.add_argument("--limit", type=int, default=200)
+    ap.add_argument("--backend", default="onnx")
+    ap.add_argument("--precision", default="fp32")
+    ap.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE)
+    ap.add_argument("--atol", type=float, default=1e-3)
+    ap.add_argument("--out", default=None, help="write the JSON report here as well")
+    args = ap.parse_args()
+
+    report = run(
+        load_records(Path(args.input), args.limit),
+        backend=args.backend,
+        precision=args.precision,
+        batch_size=args.batch_size,
+        atol=args.atol,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+
+_STOP = object()
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        *,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 0,
+        workers: int = 1,
+        name: str = "micro-batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(0, int(max_queue))
+        self.workers = max(1, int(workers))
+        self.name = name
+
+        # Bounded by submit_many rather than by the queue itself, so a
+        # multi-item request is queued whole or not at all.
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._submit_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if any(t.is_alive() for t in self._threads):
+            return
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if not self._threads:
+            return
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, item: Any) -> Future:
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items: List[Any]) -> List[Future]:
+        # All or none. Admission only needs room for one more item, so a
+        # request larger than max_queue is still served when the queue has
+        # room; the queue can then overshoot by up to one request.
+        if not self._threads:
+            raise RuntimeError("MicroBatcher not started")
+        with self._submit_lock:
+            depth = self._queue.qsize()
+            if self.max_queue and depth >= self.max_queue:
+                raise QueueFullError(f"inference queue is full ({self.max_queue} pending)")
+            futs = []
+            now = time.monotonic()
+            for item in items:
+                fut = Future()
+                fut.queue_depth = depth
+                fut.queue_wait_ms = 0.0
+                self._queue.put_nowait((item, fut, now))
+                futs.append(fut)
+        return futs
+
+    def _collect(self, first: Tuple[Any, Future, float]) -> Tuple[List[Tuple[Any, Future, float]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    nxt = self._queue.get_nowait()
+                else:
+                    nxt = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if nxt is _STOP:
+                return batch, True
+            batch.append(nxt)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+
+            started = time.monotonic()
+            pending = []
+            for item, fut, enqueued_at in batch:
+                if fut.set_running_or_notify_cancel():
+                    fut.queue_wait_ms = (started - enqueued_at) * 1000.0
+                    pending.append((item, fut))
+            if not pending:
+                continue
+
+            try:
+                results = self.batch_fn([item for item, _ in pending])
+                if len(results) != len(pending):
+                    raise RuntimeError(
+                        f"batch function returned {len(results)} results for {len(pending)} items"
+                    )
+            except BaseException as e:
+                for _, fut in pending:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), res in zip(pending, results):
+                fut.set_result(res)
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .utils.text import normalize_ws
+
+
+_MISS = object()
+
+
+def input_key(
+    *,
+    title: Optional[str],
+    claim: Optional[str],
+    body: Optional[str],
+    source_url: Optional[str],
+    version: str,
+) -> str:
+    payload = json.dumps(
+        [
+            normalize_ws(title or ""),
+            normalize_ws(claim or ""),
+            normalize_ws(body or ""),
+            (source_url or "").strip(),
+            version,
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def artifact_version(paths: Iterable[Path], extra: Iterable[Any] = (), ignore: Iterable[str] = ()) -> str:
+    ignore = set(ignore)
+    h = hashlib.sha1()
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(
+                p for p in path.rglob("*")
+                if p.is_file() and not ignore.intersection(p.relative_to(path).parts)
+            )
+        else:
+            files = [path]
+        for f in files:
+            if not f.exists():
+                continue
+            st = f.stat()
+            h.update(f"{f}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    for x in extra:
+        h.update(f"{x!r}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class SqliteTier:
+    def __init__(self, path: Path, ttl_seconds: float):
+        self.path = Path(path)
+        self.ttl_seconds = float(ttl_seconds)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Opened on first use, per process: serve.py imports this in the
+        # parent and forks, and a SQLite connection must not cross a fork.
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Callers hold self._lock.
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISS
+            value, created_at = row
+            if self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                conn.commit()
+                return _MISS
+        return json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, value, created_at) VALUES (?, ?, ?)",
+                (key, data, time.time()),
+            )
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+class PredictionCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = 10000,
+        ttl_seconds: float = 3600.0,
+        sqlite_path: Optional[Path] = None,
+    ):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.l2 = SqliteTier(sqlite_path, ttl_seconds) if sqlite_path else None
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # type: OrderedDict[str, Tuple[float, Any]]
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {
+            "hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.l2 is not None
+
+    def get(self, key: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                stored_at, value = hit
+                if self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    self._stats["expirations"] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+
+        if self.l2 is not None:
+            value = self.l2.get(key)
+            if value is not _MISS:
+                self._put_l1(key, value)
+                with self._lock:
+                    self._stats["l2_hits"] += 1
+                return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return _MISS
+
+    def put(self, key: str, value: Any) -> None:
+        self._put_l1(key, value)
+        if self.l2 is not None:
+            self.l2.put(key, value)
+
+    def _put_l1(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_submit(self, key: str, submit: Callable[[], Future]) -> Future:
+        return self.get_or_submit_many([key], lambda idx: [submit()])[0]
+
+    def get_or_submit_many(self, keys: List[str], submit: Callable[[List[int]], List[Future]]) -> List[Future]:
+        # One future per key: hits are already resolved (and marked
+        # cache_hit), keys in flight share the pending future, and the rest
+        # go to one submit() call with the indexes of their first occurrence.
+        if not self.enabled:
+            return submit(list(range(len(keys))))
+
+        futs: List[Optional[Future]] = [None] * len(keys)
+        for i, key in enumerate(keys):
+            value = self.get(key)
+            if value is not _MISS:
+                fut = Future()
+                fut.cache_hit = True
+                fut.set_result(value)
+                futs[i] = fut
+
+        new: Dict[str, Future] = {}
+        with self._lock:
+            todo: Dict[str, int] = {}
+            for i, key in enumerate(keys):
+                if futs[i] is not None:
+                    continue
+                fut = self._inflight.get(key)
+                if fut is not None:
+                    self._stats["coalesced"] += 1
+                    futs[i] = fut
+                elif key not in todo:
+                    todo[key] = i
+            if todo:
+                new = dict(zip(todo, submit(list(todo.values()))))
+                self._inflight.update(new)
+        for i, key in enumerate(keys):
+            if futs[i] is None:
+                futs[i] = new[key]
+
+        # Outside the lock: a future that is already done runs the callback
+        # right away, and _settle takes the lock.
+        for key, fut in new.items():
+            fut.add_done_callback(lambda f, key=key: self._settle(key, f))
+        return futs
+
+    def _settle(self, key: str, fut: Future) -> None:
+        if not fut.cancelled() and fut.exception() is None:
+            self.put(key, fut.result())
+        with self._lock:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._entries)
+            out["inflight"] = len(self._inflight)
+        lookups = out["hits"] + out["l2_hits"] + out["misses"]
+        out["hit_rate"] = (out["hits"] + out["l2_hits"]) / lookups if lookups else 0.0
+        out["max_entries"] = self.max_entries
+        out["ttl_seconds"] = self.ttl_seconds
+        out["sqlite"] = str(self.l2.path) if self.l2 is not None else None
+        return out
+
+    def close(self) -> None:
+        if self.l2 is not None:
+            self.l2.close()
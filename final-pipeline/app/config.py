@@ -2,9 +2,7 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import Dict, List, Set
-
-import torch
+from typing import Any, Dict, List, Set
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 
@@ -15,6 +13,12 @@ ARTIFACTS_DIR = Path(
 CLICKBAIT_MODEL_DIR = ARTIFACTS_DIR / "clickbait" / "rocloco_roberta_clickbait"
 VERACITY_MODEL_DIR = ARTIFACTS_DIR / "binary" / "veracity_roberta"
 FINE6_MODEL_DIR = ARTIFACTS_DIR / "multiclass" / "fine6_roberta"
+MULTITASK_MODEL_DIR = ARTIFACTS_DIR / "multitask" / "shared_roberta"
+
+# "separate": the three fine-tuned models above. "multitask": one shared
+# encoder with clickbait/veracity/fine6 heads (built by app.multitask_train).
+MODEL_LAYOUT = os.getenv("MODEL_LAYOUT", "separate").strip().lower()
+MODEL_LAYOUTS = ("separate", "multitask")
 
 FUSION_DIR = ARTIFACTS_DIR / "fusion"
 FUSION_MODEL_PATH = FUSION_DIR / "fusion_lr.joblib"
@@ -24,8 +28,21 @@ FUSION_FEATURE_SCHEMA_PATH = FUSION_DIR / "fusion_feature_schema.json"
 SOURCE_VERACITY_DIR = ARTIFACTS_DIR / "source_veracity"
 SOURCE_VERACITY_TABLE_PATH = SOURCE_VERACITY_DIR / "source_veracity_table.csv"
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-TORCH_DTYPE = torch.float16 if DEVICE == "cuda" else torch.float32
+# Optional TF-IDF first stage (built by app.prefilter_train): inputs it is
+# confident about skip the transformers entirely.
+PREFILTER_DIR = ARTIFACTS_DIR / "prefilter"
+PREFILTER_MODEL_PATH = PREFILTER_DIR / "tfidf_linear.joblib"
+PREFILTER_THRESHOLDS_PATH = PREFILTER_DIR / "prefilter_thresholds.json"
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32").strip().lower()
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").strip().lower()
+
+# Long-document mode for veracity/fine6: up to N overlapping 512-token
+# windows per input, pooled over the window logits. 1 = truncate.
+LONG_DOC_MAX_WINDOWS = int(os.getenv("LONG_DOC_MAX_WINDOWS", "1"))
+LONG_DOC_STRIDE = int(os.getenv("LONG_DOC_STRIDE", "128"))
+LONG_DOC_POOLING = os.getenv("LONG_DOC_POOLING", "mean").strip().lower()
 
 FINE6_LABELS: List[str] = [
     "TRUE",
@@ -53,6 +70,31 @@ NEUTRAL_MAX_TEXT_LEN = int(os.getenv("NEUTRAL_MAX_TEXT_LEN", "120"))
 NEUTRAL_CONTENT_MAX_P_TRUE = float(os.getenv("NEUTRAL_CONTENT_MAX_P_TRUE", "0.05"))
 HIGH_TRUST_MIN_P_TRUE = float(os.getenv("HIGH_TRUST_MIN_P_TRUE", "0.80"))
 
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "32"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_MAX = int(os.getenv("INFERENCE_QUEUE_MAX", "256"))
+INFERENCE_RETRY_AFTER_S = int(os.getenv("INFERENCE_RETRY_AFTER_S", "1"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+PREDICT_BATCH_MAX_ITEMS = int(os.getenv("PREDICT_BATCH_MAX_ITEMS", "1000"))
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "3600"))
+PREDICTION_CACHE_SQLITE_PATH = os.getenv("PREDICTION_CACHE_SQLITE_PATH", "").strip()
+
+NEARDUP_THRESHOLD = float(os.getenv("NEARDUP_THRESHOLD", "0"))
+NEARDUP_MAX_ENTRIES = int(os.getenv("NEARDUP_MAX_ENTRIES", "100000"))
+NEARDUP_PATH = os.getenv("NEARDUP_PATH", "").strip()
+
+ARTIFACT_WATCH_INTERVAL_S = float(os.getenv("ARTIFACT_WATCH_INTERVAL_S", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+
+ARTIFACT_LOAD_WORKERS = int(os.getenv("ARTIFACT_LOAD_WORKERS", "5"))
+WARMUP_SEQ_LENGTHS: List[int] = [
+    int(x) for x in os.getenv("WARMUP_SEQ_LENGTHS", "16,128,512").split(",") if x.strip()
+]
+
 
 PLATFORM_DOMAINS: Set[str] = {
     "facebook.com", "m.facebook.com",
@@ -161,3 +203,16 @@ PROPAGANDA_DOMAINS: Set[str] = {
     "theepochtimes.com",
     "breitbart.com",
 }
+
+
+def __getattr__(name: str) -> Any:
+    # DEVICE/TORCH_DTYPE need torch; resolve them on first use so importing
+    # the app (or just its config) does not pull torch in.
+    if name in ("DEVICE", "TORCH_DTYPE"):
+        import torch
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        globals()["DEVICE"] = device
+        globals()["TORCH_DTYPE"] = torch.float16 if device == "cuda" else torch.float32
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
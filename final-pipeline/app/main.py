@@ -1,9 +1,23 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+import copy
+import hmac
+import json
+import threading
+import time
+from dataclasses import asdict
+
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
+from . import config
+from .artifacts import ArtifactManager
+from .batching import MicroBatcher, QueueFullError
+from .cache import PredictionCache, input_key
+from .metrics import PipelineMetrics, Registry
 from .pipeline import FakeNewsPipeline, PipelineInput
 
 app = FastAPI(
@@ -12,6 +26,37 @@ app = FastAPI(
 )
 
 PIPELINE = FakeNewsPipeline()
+BATCHER = MicroBatcher(
+    PIPELINE.predict_batch,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    max_wait_ms=config.BATCH_MAX_WAIT_MS,
+    max_queue=config.INFERENCE_QUEUE_MAX,
+    workers=config.INFERENCE_WORKERS,
+)
+ARTIFACTS = ArtifactManager(PIPELINE, watch_interval_s=config.ARTIFACT_WATCH_INTERVAL_S)
+STARTUP: Dict[str, Any] = {"ready": False}
+CACHE = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_SIZE,
+    ttl_seconds=config.PREDICTION_CACHE_TTL_S,
+    sqlite_path=config.PREDICTION_CACHE_SQLITE_PATH or None,
+)
+
+
+REGISTRY = Registry()
+METRICS = PipelineMetrics(REGISTRY)
+PIPELINE.observers.append(METRICS.observe)
+QUEUE_WAIT = REGISTRY.histogram("fakenews_queue_wait_seconds", "Time /predict requests wait for a batch slot.")
+SHED = REGISTRY.counter("fakenews_shed_requests_total", "Requests rejected with 503 because the queue was full.")
+REGISTRY.gauge("fakenews_queue_depth", "Requests waiting in the inference queue.", lambda: BATCHER.depth)
+REGISTRY.gauge("fakenews_cache_entries", "Entries in the in-memory prediction cache.", lambda: CACHE.stats()["size"])
+REGISTRY.counter_fn(
+    "fakenews_cache_hits_total",
+    "Prediction cache hits (memory and SQLite).",
+    lambda: CACHE.stats()["hits"] + CACHE.stats()["l2_hits"],
+)
+REGISTRY.counter_fn("fakenews_cache_misses_total", "Prediction cache misses.", lambda: CACHE.stats()["misses"])
+REGISTRY.counter_fn("fakenews_cache_coalesced_total", "Requests coalesced onto an in-flight prediction.",
+                    lambda: CACHE.stats()["coalesced"])
 
 
 class PredictRequest(BaseModel):
@@ -21,22 +66,190 @@ class PredictRequest(BaseModel):
     source_url: Optional[str] = Field(default=None, description="URL of the source/article/post (optional)")
 
 
+class PredictBatchRequest(BaseModel):
+    items: List[PredictRequest] = Field(default_factory=list, description="Articles/posts to score")
+
+
+class ReloadRequest(BaseModel):
+    components: Optional[List[str]] = Field(
+        default=None,
+        description="Components to reload (default: whichever changed on disk)",
+    )
+
+
+def _to_input(req: PredictRequest) -> PipelineInput:
+    return PipelineInput(
+        title=req.title,
+        claim=req.claim,
+        body=req.body,
+        source_url=req.source_url,
+    )
+
+
+def _cache_key(inp: PipelineInput) -> str:
+    return input_key(
+        title=inp.title,
+        claim=inp.claim,
+        body=inp.body,
+        source_url=inp.source_url,
+        version=PIPELINE.artifact_version,
+    )
+
+
+def _response(value: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+    # Cached results are shared, so every caller gets its own copy. Their
+    # stages/near_duplicate describe the call that computed them; a hit ran
+    # no stages and looked up no near-duplicate.
+    out = copy.deepcopy(value)
+    out["cached"] = cached
+    if cached:
+        out["stages"] = {"evaluated": [], "reused": [], "skipped": []}
+        out["near_duplicate"] = None
+    return out
+
+
+def _require_ready() -> None:
+    if not STARTUP["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail="models are still loading",
+            headers={"Retry-After": str(config.INFERENCE_RETRY_AFTER_S)},
+        )
+
+
+def _boot() -> None:
+    t0 = time.perf_counter()
+    try:
+        if config.TORCH_NUM_THREADS > 0:
+            import torch
+
+            torch.set_num_threads(config.TORCH_NUM_THREADS)
+        PIPELINE.load()
+        if PIPELINE.near_dups is not None:
+            PIPELINE.near_dups.load()
+        STARTUP["load_seconds"] = dict(PIPELINE.artifacts.load_seconds)
+        STARTUP["warmup_seconds"] = PIPELINE.warm_up()
+    except Exception as e:
+        STARTUP["error"] = repr(e)
+        print(f"[startup] failed: {e!r}", flush=True)
+        return
+    STARTUP["total_seconds"] = time.perf_counter() - t0
+    STARTUP["version"] = PIPELINE.artifact_version
+    STARTUP["ready"] = True
+    print(f"[startup] {json.dumps(STARTUP)}", flush=True)
+    ARTIFACTS.start()
+
+
 @app.get("/health")
 def health() -> Dict[str, Any]:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready() -> Dict[str, Any]:
+    if not STARTUP["ready"]:
+        raise HTTPException(status_code=503, detail=STARTUP)
+    return STARTUP
+
+
 @app.on_event("startup")
 def _startup():
-    PIPELINE.load()
+    BATCHER.start()
+    threading.Thread(target=_boot, name="startup", daemon=True).start()
 
 
-@app.post("/predict")
-def predict(req: PredictRequest) -> Dict[str, Any]:
-    inp = PipelineInput(
-        title=req.title,
-        claim=req.claim,
-        body=req.body,
-        source_url=req.source_url,
+@app.on_event("shutdown")
+def _shutdown():
+    ARTIFACTS.stop()
+    BATCHER.stop()
+    CACHE.close()
+    if PIPELINE.near_dups is not None:
+        PIPELINE.near_dups.save()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+def cache_stats() -> Dict[str, Any]:
+    out = CACHE.stats()
+    if PIPELINE.near_dups is not None:
+        out["near_duplicates"] = PIPELINE.near_dups.stats()
+    return out
+
+
+@app.post("/admin/reload")
+def admin_reload(
+        req: Optional[ReloadRequest] = None,
+        x_admin_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    # No token configured means no remote reloads (the file watcher still works).
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="admin reload is disabled (ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest((x_admin_token or "").encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+    try:
+        report = ARTIFACTS.reload(req.components if req is not None else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if report.error:
+        raise HTTPException(status_code=500, detail=asdict(report))
+    return asdict(report)
+
+
+def _shed(e: QueueFullError) -> HTTPException:
+    SHED.inc()
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(config.INFERENCE_RETRY_AFTER_S)},
     )
-    return PIPELINE.predict(inp)
+
+
+@app.post("/predict")
+async def predict(req: PredictRequest, response: Response) -> Dict[str, Any]:
+    _require_ready()
+    inp = _to_input(req)
+    try:
+        fut = CACHE.get_or_submit(_cache_key(inp), lambda: BATCHER.submit(inp))
+    except QueueFullError as e:
+        raise _shed(e)
+    # The future may be shared with coalesced callers; one client going away
+    # must not cancel it for the others.
+    result = await asyncio.shield(asyncio.wrap_future(fut))
+    QUEUE_WAIT.observe(getattr(fut, "queue_wait_ms", 0.0) / 1000.0)
+    response.headers["X-Queue-Depth"] = str(getattr(fut, "queue_depth", 0))
+    response.headers["X-Queue-Wait-Ms"] = f"{getattr(fut, 'queue_wait_ms', 0.0):.2f}"
+    return _response(result, getattr(fut, "cache_hit", False))
+
+
+@app.post("/predict/batch")
+async def predict_batch(req: PredictBatchRequest, response: Response) -> Dict[str, Any]:
+    _require_ready()
+    if len(req.items) > config.PREDICT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"too many items: {len(req.items)} > {config.PREDICT_BATCH_MAX_ITEMS}",
+        )
+    inps = [_to_input(item) for item in req.items]
+    keys = [_cache_key(inp) for inp in inps]
+
+    # Through the cache like /predict: hits are answered, keys already in
+    # flight (from any request) are shared, and the rest go to the batcher,
+    # whose workers run the models and whose full queue sheds the request.
+    try:
+        futs = CACHE.get_or_submit_many(keys, lambda idx: BATCHER.submit_many([inps[i] for i in idx]))
+    except QueueFullError as e:
+        raise _shed(e)
+    values = await asyncio.gather(*(asyncio.shield(asyncio.wrap_future(f)) for f in futs))
+    results = [_response(v, getattr(f, "cache_hit", False)) for f, v in zip(futs, values)]
+
+    queued = [f for f in futs if not getattr(f, "cache_hit", False)]
+    wait_ms = max((getattr(f, "queue_wait_ms", 0.0) for f in queued), default=0.0)
+    if queued:
+        QUEUE_WAIT.observe(wait_ms / 1000.0)
+    response.headers["X-Queue-Depth"] = str(max((getattr(f, "queue_depth", 0) for f in queued), default=0))
+    response.headers["X-Queue-Wait-Ms"] = f"{wait_ms:.2f}"
+    return {"results": results}
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import math
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 384, 512)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024)
+WINDOW_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16)
+# Stages that run a transformer forward pass.
+TORCH_STAGES = frozenset({"shared_encoder", "clickbait", "veracity", "fine6"})
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.label_names else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last)], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        out = []
+        for key, (counts, total) in items:
+            acc = 0
+            for le, c in zip((*self.buckets, math.inf), counts):
+                acc += c
+                out.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', _fmt(le)))} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, key)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.label_names, key)} {acc}")
+        return out
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            return [f"{self.name} {_fmt(float(self.fn()))}"]
+        except Exception:
+            return []
+
+
+class CounterFn(Gauge):
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help, fn))
+
+    def counter_fn(self, name: str, help: str, fn: Callable[[], float]) -> CounterFn:
+        return self.register(CounterFn(name, help, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class PipelineMetrics:
+    def __init__(self, registry: Registry, prefix: str = "fakenews"):
+        self.stage_seconds = registry.histogram(
+            f"{prefix}_stage_seconds", "Time spent in each pipeline stage per batch.", ("stage",)
+        )
+        self.batch_size = registry.histogram(
+            f"{prefix}_batch_size", "Rows per predict_batch call.", buckets=BATCH_BUCKETS
+        )
+        self.input_tokens = registry.histogram(
+            f"{prefix}_input_tokens", "Tokens per window after truncation.", buckets=TOKEN_BUCKETS
+        )
+        self.input_windows = registry.histogram(
+            f"{prefix}_input_windows", "Long-document windows per input.", buckets=WINDOW_BUCKETS
+        )
+        self.tokens = registry.counter(f"{prefix}_tokens_total", "Tokens encoded for the shared text encoding.")
+        self.truncated = registry.counter(
+            f"{prefix}_truncated_inputs_total", "Inputs cut because their last window hit the max length."
+        )
+        self.predictions = registry.counter(f"{prefix}_predictions_total", "Rows scored by the pipeline.")
+        self.overrides = registry.counter(
+            f"{prefix}_neutral_override_total", "Rows resolved by the high-trust neutral override."
+        )
+        self.paths = registry.counter(
+            f"{prefix}_verdict_path_total", "Rows by the path that produced the verdict.", ("path",)
+        )
+        self.torch_free = registry.counter(
+            f"{prefix}_torch_free_rows_total", "Rows answered without any transformer forward pass."
+        )
+        self.gated = registry.counter(f"{prefix}_gated_label_total", "Final gated labels.", ("label",))
+        self.inconclusive = registry.counter(
+            f"{prefix}_inconclusive_total", "INCONCLUSIVE outcomes by where they came from.", ("source",)
+        )
+        self.max_tokens = 512
+
+    def observe(self, run, results: List[Dict[str, Any]]) -> None:
+        for stage, seconds in run.seconds.items():
+            self.stage_seconds.observe(seconds, stage=stage)
+        self.batch_size.observe(len(results))
+        self.predictions.inc(len(results))
+
+        n_tokens = 0
+        truncated = 0
+        for windows in run.values("text_encoding"):
+            self.input_windows.observe(len(windows))
+            for w in windows:
+                n = len(w["input_ids"])
+                n_tokens += n
+                self.input_tokens.observe(n)
+            truncated += len(windows[-1]["input_ids"]) >= self.max_tokens
+        if n_tokens:
+            self.tokens.inc(n_tokens)
+        if truncated:
+            self.truncated.inc(truncated)
+
+        overrides = 0
+        torch_free = 0
+        fine6_inconclusive = 0
+        paths: Dict[str, int] = {}
+        labels: Dict[str, int] = {}
+        for out in results:
+            overrides += bool(out["fusion"]["features"].get("neutral_override"))
+            torch_free += TORCH_STAGES.isdisjoint(out["stages"]["evaluated"])
+            paths[out["path"]] = paths.get(out["path"], 0) + 1
+            fine6_inconclusive += out["fine6"]["fine6_label"] == "INCONCLUSIVE"
+            label = out["gated"]["gated_label"]
+            labels[label] = labels.get(label, 0) + 1
+
+        if overrides:
+            self.overrides.inc(overrides)
+        if torch_free:
+            self.torch_free.inc(torch_free)
+        for path, n in paths.items():
+            self.paths.inc(n, path=path)
+        if fine6_inconclusive:
+            self.inconclusive.inc(fine6_inconclusive, source="fine6")
+        if labels.get("INCONCLUSIVE"):
+            self.inconclusive.inc(labels["INCONCLUSIVE"], source="gated")
+        for label, n in labels.items():
+            self.gated.inc(n, label=label)
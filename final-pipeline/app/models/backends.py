@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification
+
+from .inference import apply_precision
+
+
+BACKENDS = ("torch", "onnx")
+
+ONNX_DIRNAME = "onnx"
+ONNX_OPSET = 17
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_dir: Path, *, device: str = "cpu", precision: str = "fp32"):
+        self.model_dir = Path(model_dir)
+        self.device = device
+        self.precision = precision
+        self.model = None
+
+    def load(self) -> None:
+        model = AutoModelForSequenceClassification.from_pretrained(str(self.model_dir))
+        model.to(self.device)
+        model.eval()
+        self.model = apply_precision(model, precision=self.precision, device=self.device)
+
+    def share_memory(self) -> None:
+        if self.model is None:
+            raise RuntimeError("TorchBackend not loaded")
+        if self.device == "cpu":
+            self.model.share_memory()
+
+    @torch.no_grad()
+    def logits(self, batch: Dict[str, torch.Tensor]) -> np.ndarray:
+        if self.model is None:
+            raise RuntimeError("TorchBackend not loaded")
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+        out = self.model(**batch)
+        return out.logits.detach().cpu().numpy()
+
+
+class _LogitsOnly(torch.nn.Module):
+    def __init__(self, model, input_names: List[str]):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *args):
+        return self.model(**dict(zip(self.input_names, args))).logits
+
+
+def onnx_path(model_dir: Path, precision: str = "fp32") -> Path:
+    name = "model.onnx" if precision == "fp32" else f"model.{precision}.onnx"
+    return Path(model_dir) / ONNX_DIRNAME / name
+
+
+def _is_stale(target: Path, sources: List[Path]) -> bool:
+    if not target.exists():
+        return True
+    mtime = target.stat().st_mtime
+    return any(src.exists() and src.stat().st_mtime > mtime for src in sources)
+
+
+def export_onnx(model_dir: Path, out_path: Optional[Path] = None, *, opset: int = ONNX_OPSET) -> Path:
+    model_dir = Path(model_dir)
+    out_path = Path(out_path) if out_path is not None else onnx_path(model_dir)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    model = AutoModelForSequenceClassification.from_pretrained(str(model_dir), attn_implementation="eager")
+    model.eval()
+
+    input_names = ["input_ids", "attention_mask"]
+    if getattr(model.config, "type_vocab_size", 0) > 0:
+        input_names.append("token_type_ids")
+
+    sample = {name: torch.ones((2, 8), dtype=torch.long) for name in input_names}
+    if "token_type_ids" in sample:
+        sample["token_type_ids"] = torch.zeros((2, 8), dtype=torch.long)
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    tmp_path = out_path.with_suffix(".onnx.tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model, input_names),
+            tuple(sample[name] for name in input_names),
+            str(tmp_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+        )
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def ensure_onnx(model_dir: Path, precision: str = "fp32") -> Path:
+    model_dir = Path(model_dir)
+    fp32_path = onnx_path(model_dir)
+    weights = [model_dir / "model.safetensors", model_dir / "pytorch_model.bin", model_dir / "config.json"]
+    if _is_stale(fp32_path, weights):
+        export_onnx(model_dir, fp32_path)
+
+    if precision == "fp32":
+        return fp32_path
+    if precision != "int8":
+        raise ValueError(f"unsupported inference precision: {precision!r}")
+
+    int8_path = onnx_path(model_dir, "int8")
+    if _is_stale(int8_path, [fp32_path]):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp_path = int8_path.with_suffix(".onnx.tmp")
+        quantize_dynamic(str(fp32_path), str(tmp_path), weight_type=QuantType.QInt8)
+        tmp_path.replace(int8_path)
+    return int8_path
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_dir: Path,
+        *,
+        device: str = "cpu",
+        precision: str = "fp32",
+        intra_op_threads: int = 0,
+    ):
+        self.model_dir = Path(model_dir)
+        self.device = device
+        self.precision = precision
+        self.intra_op_threads = int(intra_op_threads)
+        self.session = None
+        self.input_names: List[str] = []
+
+    def load(self) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("onnxruntime is required for the onnx inference backend") from e
+
+        if self.device != "cpu":
+            raise ValueError("the onnx inference backend only supports cpu")
+
+        path = ensure_onnx(self.model_dir, self.precision)
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads > 0:
+            opts.intra_op_num_threads = self.intra_op_threads
+
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def share_memory(self) -> None:
+        pass
+
+    def logits(self, batch: Dict[str, torch.Tensor]) -> np.ndarray:
+        if self.session is None:
+            raise RuntimeError("OnnxBackend not loaded")
+        feed = {name: batch[name].cpu().numpy().astype(np.int64) for name in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+
+def make_backend(
+    name: str,
+    model_dir: Path,
+    *,
+    device: str = "cpu",
+    precision: str = "fp32",
+):
+    name = (name or "torch").strip().lower()
+    if name == "torch":
+        return TorchBackend(model_dir, device=device, precision=precision)
+    if name == "onnx":
+        return OnnxBackend(model_dir, device=device, precision=precision)
+    raise ValueError(f"unsupported inference backend: {name!r} (expected one of {BACKENDS})")
@@ -2,11 +2,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 
 import numpy as np
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
+
+from .backends import make_backend
+from .inference import encode, tokenizer_fingerprint, windowed_logits
 
 
 @dataclass
@@ -18,44 +21,93 @@ class Fine6Result:
 
 
 class Fine6Model:
-    def __init__(self, model_dir: Path, labels: List[str], device: str = "cpu"):
+    def __init__(
+        self,
+        model_dir: Path,
+        labels: List[str],
+        device: str = "cpu",
+        batch_size: int = 32,
+        precision: str = "fp32",
+        backend: str = "torch",
+        max_windows: int = 1,
+        window_stride: int = 128,
+        window_pooling: str = "mean",
+    ):
         self.model_dir = Path(model_dir)
         self.labels = labels
         self.device = device
+        self.batch_size = batch_size
+        self.precision = precision
+        self.backend_name = backend
+        self.max_windows = max_windows
+        self.window_stride = window_stride
+        self.window_pooling = window_pooling
         self.tokenizer = None
-        self.model = None
+        self.tokenizer_fingerprint = ""
+        self.backend = None
 
     def load(self) -> None:
         self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
-        self.model = AutoModelForSequenceClassification.from_pretrained(str(self.model_dir))
-        self.model.to(self.device)
-        self.model.eval()
+        self.tokenizer_fingerprint = tokenizer_fingerprint(self.model_dir)
+        backend = make_backend(
+            self.backend_name,
+            self.model_dir,
+            device=self.device,
+            precision=self.precision,
+        )
+        backend.load()
+        self.backend = backend
 
-    @torch.no_grad()
     def predict(self, text: str) -> Fine6Result:
-        if self.model is None or self.tokenizer is None:
-            raise RuntimeError("Fine6Model not loaded")
+        return self.predict_batch([text])[0]
 
-        enc = self.tokenizer(
-            text,
-            truncation=True,
+    def encode(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        if self.tokenizer is None:
+            raise RuntimeError("Fine6Model not loaded")
+        return encode(
+            self.tokenizer,
+            texts,
             max_length=512,
-            return_tensors="pt",
+            stride=self.window_stride,
+            max_windows=self.max_windows,
         )
-        enc = {k: v.to(self.device) for k, v in enc.items()}
-        out = self.model(**enc)
-        logits = out.logits.detach().cpu().numpy()[0]
-        probs_arr = torch.softmax(torch.tensor(logits), dim=-1).numpy()
-
-        probs = {}
-        for i, lab in enumerate(self.labels):
-            if i < len(probs_arr):
-                probs[lab] = float(probs_arr[i])
-            else:
-                probs[lab] = 0.0
-
-        best_idx = int(np.argmax(probs_arr))
-        label = self.labels[best_idx] if best_idx < len(self.labels) else str(best_idx)
-        top_prob = float(probs_arr[best_idx])
-
-        return Fine6Result(label=label, probs=probs, top_prob=top_prob, logits=logits.tolist())
+
+    def predict_batch(
+        self,
+        texts: List[str],
+        features: Optional[List[List[Dict[str, Any]]]] = None,
+    ) -> List[Fine6Result]:
+        if self.backend is None or self.tokenizer is None:
+            raise RuntimeError("Fine6Model not loaded")
+        if not texts:
+            return []
+        if features is None:
+            features = self.encode(texts)
+
+        logits = windowed_logits(
+            self.tokenizer,
+            self.backend,
+            features,
+            batch_size=self.batch_size,
+            pooling=self.window_pooling,
+        )
+        probs = torch.softmax(torch.tensor(logits), dim=-1).numpy()
+        return [self._result(row_logits, row_probs) for row_logits, row_probs in zip(logits, probs)]
+
+    def _result(self, logits: np.ndarray, probs_arr: np.ndarray) -> Fine6Result:
+        return fine6_result(self.labels, logits, probs_arr)
+
+
+def fine6_result(labels: List[str], logits: np.ndarray, probs_arr: np.ndarray) -> Fine6Result:
+    probs = {}
+    for i, lab in enumerate(labels):
+        if i < len(probs_arr):
+            probs[lab] = float(probs_arr[i])
+        else:
+            probs[lab] = 0.0
+
+    best_idx = int(np.argmax(probs_arr))
+    label = labels[best_idx] if best_idx < len(labels) else str(best_idx)
+    top_prob = float(probs_arr[best_idx])
+
+    return Fine6Result(label=label, probs=probs, top_prob=top_prob, logits=logits.tolist())
@@ -4,7 +4,7 @@ import json
 import math
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 
 import joblib
 import numpy as np
@@ -20,6 +20,48 @@ def logit(p: float) -> float:
     return math.log(p / (1.0 - p))
 
 
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    return np.exp(-np.logaddexp(0.0, -z))
+
+
+def linear_params(model, features: List[str]) -> Optional[Tuple[np.ndarray, float]]:
+    steps = list(getattr(model, "steps", [("clf", model)]))
+    if not steps:
+        return None
+    *pre, (_, clf) = steps
+
+    coef = getattr(clf, "coef_", None)
+    intercept = getattr(clf, "intercept_", None)
+    if coef is None or intercept is None or np.shape(coef)[0] != 1 or len(getattr(clf, "classes_", [])) != 2:
+        return None
+    w = np.asarray(coef, dtype=np.float64)[0].copy()
+    b = float(np.asarray(intercept, dtype=np.float64)[0])
+
+    names = getattr(model, "feature_names_in_", None)
+    for _, step in pre:
+        if step == "passthrough" or step is None:
+            continue
+        if type(step).__name__ != "StandardScaler":
+            return None
+        mean = getattr(step, "mean_", None) if getattr(step, "with_mean", True) else None
+        scale = getattr(step, "scale_", None) if getattr(step, "with_std", True) else None
+        mean = np.zeros_like(w) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones_like(w) if scale is None else np.asarray(scale, dtype=np.float64)
+        b -= float(np.sum(w * mean / scale))
+        w = w / scale
+        if names is None:
+            names = getattr(step, "feature_names_in_", None)
+
+    if names is not None:
+        names = [str(n) for n in names]
+        if sorted(names) != sorted(features):
+            return None
+        w = np.array([w[names.index(f)] for f in features])
+    elif len(w) != len(features):
+        return None
+    return w, b
+
+
 @dataclass
 class FusionResult:
     final_p_true: float
@@ -42,6 +84,8 @@ class FusionModel:
         self.model = None
         self.threshold = 0.5
         self.features: List[str] = []
+        self.weights: Optional[np.ndarray] = None
+        self.bias = 0.0
 
     def load(self) -> None:
         if not self.model_path.exists():
@@ -65,6 +109,42 @@ class FusionModel:
                 "has_source",
             ]
 
+        self.weights = None
+        params = linear_params(self.model, self.features)
+        if params is not None:
+            w, b = params
+            probe = self._probe_matrix(len(self.features))
+            if np.allclose(sigmoid(probe @ w + b), self._sklearn_proba(probe), rtol=0.0, atol=1e-9):
+                self.weights, self.bias = w, b
+
+    @property
+    def vectorized(self) -> bool:
+        return self.weights is not None
+
+    def _probe_matrix(self, n_features: int) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(64, n_features))
+        if "text_len" in self.features:
+            X[:, self.features.index("text_len")] = rng.uniform(0, 20000, size=64)
+        if "has_source" in self.features:
+            X[:, self.features.index("has_source")] = rng.integers(0, 2, size=64)
+        return X
+
+    def _sklearn_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(pd.DataFrame(X, columns=self.features))[:, 1]
+
+    def predict_many(self, X: np.ndarray) -> np.ndarray:
+        if self.model is None:
+            raise RuntimeError("FusionModel not loaded")
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"expected {len(self.features)} features ({self.features}), got {X.shape[1]}")
+        if self.weights is not None:
+            return sigmoid(X @ self.weights + self.bias)
+        return self._sklearn_proba(X)
+
     def predict(
         self,
         *,
@@ -74,18 +154,46 @@ class FusionModel:
         text_len: int,
         has_source: int,
     ) -> FusionResult:
+        return self.predict_batch([
+            {
+                "p_true_content": p_true_content,
+                "p_clickbait": p_clickbait,
+                "source_score": source_score,
+                "text_len": text_len,
+                "has_source": has_source,
+            }
+        ])[0]
+
+    def predict_batch(self, rows: List[Dict[str, Any]]) -> List[FusionResult]:
         if self.model is None:
             raise RuntimeError("FusionModel not loaded")
-
-        feat = {
+        if not rows:
+            return []
+
+        feats = [self._features(**row) for row in rows]
+        X = np.array([[feat[k] for k in self.features] for feat in feats], dtype=np.float64)
+        ps = self.predict_many(X)
+
+        results = []
+        for feat, p in zip(feats, ps):
+            p = float(p)
+            label = "TRUE" if p >= self.threshold else "FALSE"
+            results.append(FusionResult(final_p_true=p, threshold=self.threshold, binary_label=label, features=feat))
+        return results
+
+    @staticmethod
+    def _features(
+        *,
+        p_true_content: float,
+        p_clickbait: float,
+        source_score: float,
+        text_len: int,
+        has_source: int,
+    ) -> Dict[str, float]:
+        return {
             "logit_p_true_content": logit(float(p_true_content)),
             "logit_p_not_clickbait": logit(1.0 - float(p_clickbait)),
             "source_score": float(source_score),
             "text_len": float(text_len),
             "has_source": float(has_source),
         }
-
-        X = pd.DataFrame([{k: feat[k] for k in self.features}])
-        p = float(self.model.predict_proba(X)[:, 1][0])
-        label = "TRUE" if p >= self.threshold else "FALSE"
-        return FusionResult(final_p_true=p, threshold=self.threshold, binary_label=label, features=feat)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+
+
+PRECISIONS = ("fp32", "int8")
+POOLINGS = ("mean", "max")
+
+# Generous characters-per-token estimate used to cut a text before
+# tokenizing it; rows that come up short are retried with a longer cut.
+_CHARS_PER_TOKEN = 8
+
+TOKENIZER_FILES = (
+    "tokenizer.json",
+    "vocab.txt",
+    "tokenizer_config.json",
+    "special_tokens_map.json",
+)
+
+
+def apply_precision(model, *, precision: str = "fp32", device: str = "cpu"):
+    if precision not in PRECISIONS:
+        raise ValueError(f"unsupported inference precision: {precision!r} (expected one of {PRECISIONS})")
+    if precision == "fp32":
+        return model
+    if device != "cpu":
+        raise ValueError("int8 dynamic quantization is only supported on cpu")
+
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def tokenizer_fingerprint(model_dir: Path) -> str:
+    h = hashlib.sha1()
+    for name in TOKENIZER_FILES:
+        path = Path(model_dir) / name
+        if not path.exists():
+            continue
+        h.update(name.encode("utf-8"))
+        h.update(hashlib.sha1(path.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def encode(
+    tokenizer,
+    texts: List[str],
+    *,
+    max_length: int = 512,
+    stride: int = 128,
+    max_windows: int = 1,
+) -> List[List[Dict[str, Any]]]:
+    # Splits each text into at most `max_windows` overlapping windows and
+    # tokenizes only as much of it as that budget can hold. With
+    # max_windows=1 this is plain truncation at max_length.
+    if not texts:
+        return []
+    max_windows = max(1, int(max_windows))
+    span = max(1, max_length - tokenizer.num_special_tokens_to_add(pair=False))
+    stride = min(max(0, int(stride)), span - 1)
+    budget = span + (max_windows - 1) * (span - stride)
+
+    out: List[List[Dict[str, Any]]] = [[] for _ in texts]
+    limits = [budget * _CHARS_PER_TOKEN] * len(texts)
+    todo = list(range(len(texts)))
+    while todo:
+        enc = tokenizer(
+            [texts[i][:limits[i]] for i in todo],
+            truncation=True,
+            max_length=max_length,
+            stride=stride,
+            return_overflowing_tokens=True,
+        )
+        keys = [k for k in enc.keys() if k != "overflow_to_sample_mapping"]
+        windows: List[List[Dict[str, Any]]] = [[] for _ in todo]
+        for w, j in enumerate(enc["overflow_to_sample_mapping"]):
+            windows[j].append({k: enc[k][w] for k in keys})
+
+        retry = []
+        for j, i in enumerate(todo):
+            # Filling exactly `max_windows` from a cut text may end on a
+            # token split by the cut, so only more windows than needed
+            # proves the cut was long enough.
+            if len(windows[j]) <= max_windows and limits[i] < len(texts[i]):
+                limits[i] *= 4
+                retry.append(i)
+            else:
+                out[i] = windows[j][:max_windows]
+        todo = retry
+    return out
+
+
+def batched_apply(
+    tokenizer,
+    fn,
+    features: List[Dict[str, Any]],
+    *,
+    batch_size: int = 32,
+) -> np.ndarray:
+    # Pads length-sorted chunks so each one is padded to a similar length,
+    # and returns fn's rows in the original order.
+    order = sorted(range(len(features)), key=lambda i: len(features[i]["input_ids"]))
+
+    step = max(1, int(batch_size))
+    chunks = []
+    for start in range(0, len(order), step):
+        idx = order[start:start + step]
+        padded = tokenizer.pad([features[i] for i in idx], padding=True, return_tensors="pt")
+        chunks.append(fn(padded))
+
+    sorted_out = np.concatenate(chunks, axis=0)
+    out = np.empty_like(sorted_out)
+    out[order] = sorted_out
+    return out
+
+
+def batched_logits(
+    tokenizer,
+    backend,
+    features: List[Dict[str, Any]],
+    *,
+    batch_size: int = 32,
+) -> np.ndarray:
+    return batched_apply(tokenizer, backend.logits, features, batch_size=batch_size)
+
+
+def pool_windows(logits: np.ndarray, counts: List[int], pooling: str = "mean") -> np.ndarray:
+    if pooling not in POOLINGS:
+        raise ValueError(f"unsupported window pooling: {pooling!r} (expected one of {POOLINGS})")
+    if len(logits) == len(counts):
+        return logits
+
+    pooled = []
+    start = 0
+    for n in counts:
+        chunk = logits[start:start + n]
+        start += n
+        pooled.append(chunk.max(axis=0) if pooling == "max" else chunk.mean(axis=0))
+    return np.stack(pooled)
+
+
+def windowed_logits(
+    tokenizer,
+    backend,
+    windows: List[List[Dict[str, Any]]],
+    *,
+    batch_size: int = 32,
+    pooling: str = "mean",
+) -> np.ndarray:
+    if pooling not in POOLINGS:
+        raise ValueError(f"unsupported window pooling: {pooling!r} (expected one of {POOLINGS})")
+    flat = [w for row in windows for w in row]
+    logits = batched_logits(tokenizer, backend, flat, batch_size=batch_size)
+    return pool_windows(logits, [len(row) for row in windows], pooling)
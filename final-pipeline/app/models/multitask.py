@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from .clickbait import ClickbaitResult
+from .fine6 import Fine6Result, fine6_result
+from .inference import apply_precision, batched_apply, encode, pool_windows, tokenizer_fingerprint
+from .veracity import VeracityResult
+
+
+TASKS = ("clickbait", "veracity", "fine6")
+
+HEADS_CONFIG = "heads.json"
+HEADS_WEIGHTS = "heads.safetensors"
+HEADS_FORMAT = 1
+
+
+class ClassificationHead(torch.nn.Module):
+    # Same layers as BERT's pooler + classifier and RoBERTa's classification
+    # head, so the head of a fine-tuned single-task model can be copied in.
+    def __init__(self, hidden_size: int, num_labels: int, dropout: float = 0.1):
+        super().__init__()
+        self.dense = torch.nn.Linear(hidden_size, hidden_size)
+        self.dropout = torch.nn.Dropout(dropout)
+        self.out_proj = torch.nn.Linear(hidden_size, num_labels)
+
+    def forward(self, cls: torch.Tensor) -> torch.Tensor:
+        return self.out_proj(self.dropout(torch.tanh(self.dense(self.dropout(cls)))))
+
+
+class MultiTaskNet(torch.nn.Module):
+    def __init__(self, encoder, heads: Dict[str, ClassificationHead]):
+        super().__init__()
+        self.encoder = encoder
+        self.heads = torch.nn.ModuleDict(heads)
+
+    def cls(self, batch: Dict[str, torch.Tensor]) -> torch.Tensor:
+        return self.encoder(**batch).last_hidden_state[:, 0]
+
+
+def load_net(model_dir: Path) -> MultiTaskNet:
+    from safetensors.torch import load_file
+
+    model_dir = Path(model_dir)
+    spec = json.loads((model_dir / HEADS_CONFIG).read_text(encoding="utf-8"))
+    if spec.get("format") != HEADS_FORMAT:
+        raise ValueError(f"unsupported multitask heads format in {model_dir}: {spec.get('format')!r}")
+    missing = [t for t in TASKS if t not in spec.get("tasks", {})]
+    if missing:
+        raise ValueError(f"multitask model in {model_dir} has no head for {missing}")
+
+    encoder = AutoModel.from_pretrained(str(model_dir), add_pooling_layer=False)
+    hidden_size = encoder.config.hidden_size
+    net = MultiTaskNet(encoder, {
+        task: ClassificationHead(hidden_size, int(spec["tasks"][task]["num_labels"])) for task in TASKS
+    })
+    net.heads.load_state_dict(load_file(str(model_dir / HEADS_WEIGHTS)))
+    return net
+
+
+def save_net(net: MultiTaskNet, model_dir: Path, tokenizer, meta: Optional[Dict[str, Any]] = None) -> None:
+    from safetensors.torch import save_file
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    net.encoder.save_pretrained(str(model_dir))
+    tokenizer.save_pretrained(str(model_dir))
+    save_file(
+        {k: v.detach().cpu().contiguous() for k, v in net.heads.state_dict().items()},
+        str(model_dir / HEADS_WEIGHTS),
+    )
+    spec = {
+        "format": HEADS_FORMAT,
+        "tasks": {task: {"num_labels": net.heads[task].out_proj.out_features} for task in TASKS},
+    }
+    (model_dir / HEADS_CONFIG).write_text(json.dumps(spec, indent=2), encoding="utf-8")
+    if meta is not None:
+        (model_dir / "meta.json").write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+class MultiTaskBackend:
+    name = "torch"
+
+    def __init__(self, model_dir: Path, *, device: str = "cpu", precision: str = "fp32"):
+        self.model_dir = Path(model_dir)
+        self.device = device
+        self.precision = precision
+        self.net = None
+
+    def load(self) -> None:
+        net = load_net(self.model_dir)
+        net.to(self.device)
+        net.eval()
+        self.net = apply_precision(net, precision=self.precision, device=self.device)
+
+    def share_memory(self) -> None:
+        if self.net is None:
+            raise RuntimeError("MultiTaskBackend not loaded")
+        if self.device == "cpu":
+            self.net.share_memory()
+
+    @torch.no_grad()
+    def hidden(self, batch: Dict[str, torch.Tensor]) -> np.ndarray:
+        if self.net is None:
+            raise RuntimeError("MultiTaskBackend not loaded")
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+        return self.net.cls(batch).float().cpu().numpy()
+
+    @torch.no_grad()
+    def head_logits(self, task: str, hidden: np.ndarray) -> np.ndarray:
+        if self.net is None:
+            raise RuntimeError("MultiTaskBackend not loaded")
+        return self.net.heads[task](torch.from_numpy(hidden).to(self.device)).float().cpu().numpy()
+
+
+@dataclass
+class SharedHidden:
+    # Encoder [CLS] vectors: one per text_input window, and one for the
+    # clickbait input.
+    text: np.ndarray
+    clickbait: np.ndarray
+
+
+class MultiTaskModel:
+    def __init__(
+        self,
+        model_dir: Path,
+        labels: List[str],
+        device: str = "cpu",
+        batch_size: int = 32,
+        precision: str = "fp32",
+        backend: str = "torch",
+        max_windows: int = 1,
+        window_stride: int = 128,
+        window_pooling: str = "mean",
+    ):
+        if (backend or "torch").strip().lower() != "torch":
+            raise ValueError(f"the multitask model only supports the torch inference backend, not {backend!r}")
+        self.model_dir = Path(model_dir)
+        self.labels = labels
+        self.device = device
+        self.batch_size = batch_size
+        self.precision = precision
+        self.backend_name = "torch"
+        self.max_windows = max_windows
+        self.window_stride = window_stride
+        self.window_pooling = window_pooling
+        self.tokenizer = None
+        self.tokenizer_fingerprint = ""
+        self.backend = None
+
+    def load(self) -> None:
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+        self.tokenizer_fingerprint = tokenizer_fingerprint(self.model_dir)
+        backend = MultiTaskBackend(self.model_dir, device=self.device, precision=self.precision)
+        backend.load()
+        self.backend = backend
+
+    def encode(self, texts: List[str], max_windows: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        if self.tokenizer is None:
+            raise RuntimeError("MultiTaskModel not loaded")
+        return encode(
+            self.tokenizer,
+            texts,
+            max_length=512,
+            stride=self.window_stride,
+            max_windows=self.max_windows if max_windows is None else max_windows,
+        )
+
+    def shared_hidden(
+        self,
+        texts: List[str],
+        windows: List[List[Dict[str, Any]]],
+        clickbait_texts: List[str],
+    ) -> List[SharedHidden]:
+        if self.backend is None or self.tokenizer is None:
+            raise RuntimeError("MultiTaskModel not loaded")
+        if not texts:
+            return []
+
+        # Clickbait reads the title. Without one its input is text_input,
+        # whose first window is exactly that text truncated, so only rows
+        # with a distinct title need an encoder pass of their own.
+        own = [j for j, (c, t) in enumerate(zip(clickbait_texts, texts)) if c != t]
+        text_hidden = self._hidden(windows)
+        out = [SharedHidden(text=h, clickbait=h[:1]) for h in text_hidden]
+        # Titles are padded as their own group; mixed into the text windows
+        # they would be padded up to the longest body.
+        title_windows = self.encode([clickbait_texts[j] for j in own], max_windows=1)
+        for j, h in zip(own, self._hidden(title_windows)):
+            out[j].clickbait = h
+        return out
+
+    def _hidden(self, windows: List[List[Dict[str, Any]]]) -> List[np.ndarray]:
+        if not windows:
+            return []
+        flat = [w for row in windows for w in row]
+        hidden = batched_apply(self.tokenizer, self.backend.hidden, flat, batch_size=self.batch_size)
+        return np.split(hidden, np.cumsum([len(row) for row in windows])[:-1])
+
+    def logits(self, task: str, hidden: List[np.ndarray]) -> np.ndarray:
+        if self.backend is None:
+            raise RuntimeError("MultiTaskModel not loaded")
+        logits = self.backend.head_logits(task, np.concatenate(hidden))
+        return pool_windows(logits, [len(h) for h in hidden], self.window_pooling)
+
+    def _probs(self, task: str, hidden: List[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        logits = self.logits(task, hidden)
+        return logits, torch.softmax(torch.tensor(logits), dim=-1).numpy()
+
+    def clickbait(self, hidden: List[SharedHidden]) -> List[ClickbaitResult]:
+        if not hidden:
+            return []
+        logits, probs = self._probs("clickbait", [h.clickbait for h in hidden])
+        return [
+            ClickbaitResult(
+                p_clickbait=float(p[1]) if p.shape[0] > 1 else float(p[0]),
+                logits=row.tolist(),
+            )
+            for row, p in zip(logits, probs)
+        ]
+
+    def veracity(self, hidden: List[SharedHidden]) -> List[VeracityResult]:
+        if not hidden:
+            return []
+        logits, probs = self._probs("veracity", [h.text for h in hidden])
+        return [
+            VeracityResult(p_true=float(p[1]) if p.shape[0] > 1 else float(p[0]), logits=row.tolist())
+            for row, p in zip(logits, probs)
+        ]
+
+    def fine6(self, hidden: List[SharedHidden]) -> List[Fine6Result]:
+        if not hidden:
+            return []
+        logits, probs = self._probs("fine6", [h.text for h in hidden])
+        return [fine6_result(self.labels, row, p) for row, p in zip(logits, probs)]
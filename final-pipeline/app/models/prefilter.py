@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import joblib
+import numpy as np
+
+
+@dataclass
+class PrefilterResult:
+    p_true: float
+    # "TRUE"/"FALSE" when past a tuned threshold, else None (run the models).
+    label: Optional[str] = None
+    threshold: Optional[float] = None
+
+
+class PrefilterModel:
+    def __init__(self, model_path: Path, thresholds_path: Path):
+        self.model_path = Path(model_path)
+        self.thresholds_path = Path(thresholds_path)
+
+        self.model = None
+        self.true_index = 1
+        # Without tuned thresholds the prefilter scores but never decides.
+        self.threshold_true: Optional[float] = None
+        self.threshold_false: Optional[float] = None
+
+    def load(self) -> None:
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"Prefilter model not found: {self.model_path}")
+        self.model = joblib.load(self.model_path)
+        classes = [int(c) for c in getattr(self.model, "classes_", [0, 1])]
+        if sorted(classes) != [0, 1]:
+            raise ValueError(f"prefilter model must be binary 0/1, got classes {classes}")
+        self.true_index = classes.index(1)
+
+        self.threshold_true = self.threshold_false = None
+        if self.thresholds_path.exists():
+            obj = json.loads(self.thresholds_path.read_text(encoding="utf-8"))
+            if obj.get("threshold_true") is not None:
+                self.threshold_true = float(obj["threshold_true"])
+            if obj.get("threshold_false") is not None:
+                self.threshold_false = float(obj["threshold_false"])
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        if self.model is None:
+            raise RuntimeError("PrefilterModel not loaded")
+        if not texts:
+            return np.empty(0)
+        return self.model.predict_proba(list(texts))[:, self.true_index]
+
+    def predict_batch(self, texts: List[str]) -> List[PrefilterResult]:
+        results = []
+        for p in self.predict_proba(texts):
+            p = float(p)
+            if self.threshold_true is not None and p >= self.threshold_true:
+                results.append(PrefilterResult(p, "TRUE", self.threshold_true))
+            elif self.threshold_false is not None and p <= self.threshold_false:
+                results.append(PrefilterResult(p, "FALSE", self.threshold_false))
+            else:
+                results.append(PrefilterResult(p))
+        return results
@@ -2,11 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
 
 import pandas as pd
 
-from ..utils.domains import get_domain, normalize_domain, is_platform_domain
+from ..utils.domains import DomainIndex, DomainSet, get_domain, normalize_domain
 
 @dataclass
 class SourcePriorResult:
@@ -14,6 +13,7 @@ class SourcePriorResult:
     source_score: float
     p_true: float
     evidence: str
+    matched_domain: str = ""
 
 
 class SourcePrior:
@@ -27,43 +27,45 @@ class SourcePrior:
         default_p_true: float = 0.5,
     ):
         self.table_csv = Path(table_csv)
-        self.platform_domains = platform_domains
+        self.platform_domains = DomainSet(platform_domains)
         self.platform_neutral = platform_neutral
         self.default_score = float(default_score)
         self.default_p_true = float(default_p_true)
 
-        self._table = None  # type: Optional[pd.DataFrame]
-        self._map_score = {}
-        self._map_p_true = {}
-        self._map_evidence = {}
+        self._index = DomainIndex([], [], [], [])
 
     def load(self) -> None:
         if not self.table_csv.exists():
-            self._table = pd.DataFrame()
+            self._index = DomainIndex([], [], [], [])
             return
 
         df = pd.read_csv(self.table_csv, encoding="utf-8")
-        df["source_domain"] = df["source_domain"].fillna("").astype(str).str.lower().str.replace("www.", "", regex=False)
+        df["source_domain"] = df["source_domain"].fillna("").astype(str)
 
         if "source_score_final" not in df.columns:
             raise ValueError("source veracity table missing 'source_score_final'")
         if "p_true_final" not in df.columns:
             raise ValueError("source veracity table missing 'p_true_final'")
 
-        self._table = df
-        self._map_score = dict(zip(df["source_domain"], df["source_score_final"]))
-        self._map_p_true = dict(zip(df["source_domain"], df["p_true_final"]))
-        self._map_evidence = dict(zip(df["source_domain"], df.get("evidence", ["unknown"] * len(df))))
+        self._index = DomainIndex(
+            df["source_domain"].tolist(),
+            df["source_score_final"].tolist(),
+            df["p_true_final"].tolist(),
+            df["evidence"].tolist() if "evidence" in df.columns else ["unknown"] * len(df),
+        )
 
     def lookup(self, source_url: str) -> SourcePriorResult:
         domain = normalize_domain(get_domain(source_url))
         if not domain:
             return SourcePriorResult("", self.default_score, self.default_p_true, "no-source")
 
-        if self.platform_neutral and is_platform_domain(domain, self.platform_domains):
-            return SourcePriorResult(domain, 0.0, 0.5, "platform-neutral")
+        if self.platform_neutral:
+            platform = self.platform_domains.match(domain)
+            if platform:
+                return SourcePriorResult(domain, 0.0, 0.5, "platform-neutral", platform)
 
-        score = float(self._map_score.get(domain, self.default_score))
-        p_true = float(self._map_p_true.get(domain, self.default_p_true))
-        evidence = str(self._map_evidence.get(domain, "default"))
-        return SourcePriorResult(domain, score, p_true, evidence)
+        hit = self._index.cached_lookup(domain)
+        if hit is None:
+            return SourcePriorResult(domain, self.default_score, self.default_p_true, "default")
+        matched, score, p_true, evidence = hit
+        return SourcePriorResult(domain, score, p_true, evidence, matched)
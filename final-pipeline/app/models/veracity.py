@@ -2,10 +2,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
+
+from .backends import make_backend
+from .inference import encode, tokenizer_fingerprint, windowed_logits
 
 
 @dataclass
@@ -15,32 +19,78 @@ class VeracityResult:
 
 
 class VeracityModel:
-    def __init__(self, model_dir: Path, device: str = "cpu"):
+    def __init__(
+        self,
+        model_dir: Path,
+        device: str = "cpu",
+        batch_size: int = 32,
+        precision: str = "fp32",
+        backend: str = "torch",
+        max_windows: int = 1,
+        window_stride: int = 128,
+        window_pooling: str = "mean",
+    ):
         self.model_dir = Path(model_dir)
         self.device = device
+        self.batch_size = batch_size
+        self.precision = precision
+        self.backend_name = backend
+        self.max_windows = max_windows
+        self.window_stride = window_stride
+        self.window_pooling = window_pooling
         self.tokenizer = None
-        self.model = None
+        self.tokenizer_fingerprint = ""
+        self.backend = None
 
     def load(self) -> None:
         self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
-        self.model = AutoModelForSequenceClassification.from_pretrained(str(self.model_dir))
-        self.model.to(self.device)
-        self.model.eval()
+        self.tokenizer_fingerprint = tokenizer_fingerprint(self.model_dir)
+        backend = make_backend(
+            self.backend_name,
+            self.model_dir,
+            device=self.device,
+            precision=self.precision,
+        )
+        backend.load()
+        self.backend = backend
 
-    @torch.no_grad()
     def predict_proba(self, text: str) -> VeracityResult:
-        if self.model is None or self.tokenizer is None:
-            raise RuntimeError("VeracityModel not loaded")
+        return self.predict_proba_batch([text])[0]
 
-        enc = self.tokenizer(
-            text,
-            truncation=True,
+    def encode(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        if self.tokenizer is None:
+            raise RuntimeError("VeracityModel not loaded")
+        return encode(
+            self.tokenizer,
+            texts,
             max_length=512,
-            return_tensors="pt",
+            stride=self.window_stride,
+            max_windows=self.max_windows,
+        )
+
+    def predict_proba_batch(
+        self,
+        texts: List[str],
+        features: Optional[List[List[Dict[str, Any]]]] = None,
+    ) -> List[VeracityResult]:
+        if self.backend is None or self.tokenizer is None:
+            raise RuntimeError("VeracityModel not loaded")
+        if not texts:
+            return []
+        if features is None:
+            features = self.encode(texts)
+
+        logits = windowed_logits(
+            self.tokenizer,
+            self.backend,
+            features,
+            batch_size=self.batch_size,
+            pooling=self.window_pooling,
         )
-        enc = {k: v.to(self.device) for k, v in enc.items()}
-        out = self.model(**enc)
-        logits = out.logits.detach().cpu().numpy()[0]
         probs = torch.softmax(torch.tensor(logits), dim=-1).numpy()
-        p_true = float(probs[1]) if probs.shape[0] > 1 else float(probs[0])
-        return VeracityResult(p_true=p_true, logits=logits.tolist())
+
+        results = []
+        for row_logits, row_probs in zip(logits, probs):
+            p_true = float(row_probs[1]) if row_probs.shape[0] > 1 else float(row_probs[0])
+            results.append(VeracityResult(p_true=p_true, logits=row_logits.tolist()))
+        return results
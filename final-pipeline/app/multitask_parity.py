@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from . import config
+from .models.clickbait import ClickbaitModel
+from .models.fine6 import Fine6Model
+from .models.multitask import MultiTaskModel
+from .models.veracity import VeracityModel
+from .quant_parity import load_records
+from .utils.text import build_text_input, normalize_ws
+
+
+def _n_params(module) -> int:
+    return int(sum(p.numel() for p in module.parameters()))
+
+
+def _outputs(results: List[Any]) -> tuple[np.ndarray, np.ndarray]:
+    logits = np.array([r.logits for r in results])
+    if results and hasattr(results[0], "probs"):
+        probs = np.array([list(r.probs.values()) for r in results])
+    else:
+        probs = np.array([[getattr(r, "p_true", getattr(r, "p_clickbait", None))] for r in results])
+    return logits, probs
+
+
+def compare(name: str, ref: List[Any], cand: List[Any], min_agreement: float) -> Dict[str, Any]:
+    ref_logits, ref_probs = _outputs(ref)
+    cand_logits, cand_probs = _outputs(cand)
+    if ref_probs.shape[1] == 1:
+        agree = (ref_probs[:, 0] >= 0.5) == (cand_probs[:, 0] >= 0.5)
+    else:
+        agree = ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1)
+    logit_diff = np.abs(ref_logits - cand_logits)
+    prob_diff = np.abs(ref_probs - cand_probs)
+    agreement = float(agree.mean()) if agree.size else 1.0
+    return {
+        "model": name,
+        "n": len(ref),
+        "label_agreement": agreement,
+        "max_abs_prob_diff": float(prob_diff.max()) if prob_diff.size else 0.0,
+        "mean_abs_prob_diff": float(prob_diff.mean()) if prob_diff.size else 0.0,
+        "max_abs_logit_diff": float(logit_diff.max()) if logit_diff.size else 0.0,
+        "ok": agreement >= min_agreement,
+    }
+
+
+def run(records: List[Dict[str, Any]], *, batch_size: int, min_agreement: float) -> Dict[str, Any]:
+    text_inputs = [
+        build_text_input(title=r.get("title"), claim=r.get("claim"), body=r.get("body"))
+        for r in records
+    ]
+    clickbait_texts = [
+        normalize_ws(r.get("title") or "") or t
+        for r, t in zip(records, text_inputs)
+    ]
+    window_kwargs = dict(
+        max_windows=config.LONG_DOC_MAX_WINDOWS,
+        window_stride=config.LONG_DOC_STRIDE,
+        window_pooling=config.LONG_DOC_POOLING,
+    )
+
+    separate = {
+        "clickbait": ClickbaitModel(config.CLICKBAIT_MODEL_DIR, device="cpu", batch_size=batch_size),
+        "veracity": VeracityModel(config.VERACITY_MODEL_DIR, device="cpu", batch_size=batch_size, **window_kwargs),
+        "fine6": Fine6Model(
+            config.FINE6_MODEL_DIR, labels=config.FINE6_LABELS, device="cpu", batch_size=batch_size, **window_kwargs
+        ),
+    }
+    for model in separate.values():
+        model.load()
+
+    t0 = time.perf_counter()
+    ref = {
+        "clickbait": separate["clickbait"].predict_proba_batch(clickbait_texts),
+        "veracity": separate["veracity"].predict_proba_batch(text_inputs),
+        "fine6": separate["fine6"].predict_batch(text_inputs),
+    }
+    t_ref = time.perf_counter() - t0
+
+    multitask = MultiTaskModel(
+        config.MULTITASK_MODEL_DIR, labels=config.FINE6_LABELS, device="cpu", batch_size=batch_size, **window_kwargs
+    )
+    multitask.load()
+
+    # The pipeline's path: one encoding and one encoder pass, then the heads.
+    t0 = time.perf_counter()
+    hidden = multitask.shared_hidden(text_inputs, multitask.encode(text_inputs), clickbait_texts)
+    cand = {
+        "clickbait": multitask.clickbait(hidden),
+        "veracity": multitask.veracity(hidden),
+        "fine6": multitask.fine6(hidden),
+    }
+    t_cand = time.perf_counter() - t0
+
+    reports = [compare(name, ref[name], cand[name], min_agreement) for name in ref]
+    return {
+        "n_records": len(records),
+        "min_agreement": min_agreement,
+        "ok": all(r["ok"] for r in reports),
+        "separate_seconds": t_ref,
+        "multitask_seconds": t_cand,
+        "speedup": t_ref / t_cand if t_cand > 0 else 0.0,
+        "separate_params": sum(_n_params(m.backend.model) for m in separate.values()),
+        "multitask_params": _n_params(multitask.backend.net),
+        "models": reports,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Compare the shared-encoder multitask model with the three single-task models."
+    )
+    ap.add_argument("--input", required=True, help="sample (.jsonl or .csv with title/claim/body)")
+    ap.add_argument("--limit", type=int, default=500)
+    ap.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE)
+    ap.add_argument("--min-agreement", type=float, default=0.95, help="required label agreement per task")
+    ap.add_argument("--out", default=None, help="write the JSON report here as well")
+    args = ap.parse_args()
+
+    report = run(
+        load_records(Path(args.input), args.limit),
+        batch_size=args.batch_size,
+        min_agreement=args.min_agreement,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
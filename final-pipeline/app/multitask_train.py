@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+from . import config
+from .models.multitask import TASKS, ClassificationHead, MultiTaskNet, save_net
+from .utils.text import normalize_ws
+
+REPO_ROOT = config.PROJECT_ROOT.parent
+
+# Where the training notebooks read/write their splits.
+DEFAULT_DATA = {
+    "clickbait": REPO_ROOT / "dataset-creation" / "RoCliCo" / "Train",
+    "veracity": REPO_ROOT / "binary" / "UnifiedBinary" / "train.csv",
+    "fine6": REPO_ROOT / "multiclass" / "UnifiedFineGrained" / "train_fine6.csv",
+}
+
+
+def teacher_dirs() -> Dict[str, Path]:
+    return {
+        "clickbait": config.CLICKBAIT_MODEL_DIR,
+        "veracity": config.VERACITY_MODEL_DIR,
+        "fine6": config.FINE6_MODEL_DIR,
+    }
+
+
+def load_clickbait(path: Path) -> Tuple[List[str], List[int]]:
+    # RoCliCo: a directory of JSON lists or the combined CSV. The pipeline
+    # feeds clickbait the title alone, so that is what it is trained on.
+    path = Path(path)
+    if path.is_dir():
+        rows = []
+        for fp in sorted(path.glob("*.json")):
+            rows.extend(json.loads(fp.read_text(encoding="utf-8")))
+        df = pd.DataFrame(rows)
+    else:
+        df = pd.read_csv(path, encoding="utf-8")
+    df["title"] = df["title"].fillna("").astype(str).map(normalize_ws)
+    df["category"] = df["category"].fillna("").astype(str).str.strip().str.lower()
+    df = df[(df["title"].str.len() > 0) & df["category"].isin(["clickbait", "nonclickbait"])]
+    return df["title"].tolist(), (df["category"] == "clickbait").astype(int).tolist()
+
+
+def load_veracity(path: Path) -> Tuple[List[str], List[int]]:
+    df = pd.read_csv(path, encoding="utf-8")
+    df = df[df["text_input"].notna() & df["y"].notna()]
+    return df["text_input"].astype(str).tolist(), df["y"].astype(int).tolist()
+
+
+def fine6_label_ids(teacher_dir: Path) -> Dict[str, int]:
+    # Hard labels must use the fine6 teacher's index order, which is what
+    # the runtime reads the head's outputs in.
+    try:
+        label2id = json.loads((Path(teacher_dir) / "config.json").read_text(encoding="utf-8")).get("label2id") or {}
+    except (OSError, ValueError):
+        label2id = {}
+    ids = {normalize_ws(str(k).replace("_", " ")).upper(): int(v) for k, v in label2id.items()}
+    if set(ids) >= set(config.FINE6_LABELS):
+        return ids
+    return {lab: i for i, lab in enumerate(config.FINE6_LABELS)}
+
+
+def load_fine6(path: Path, label_ids: Dict[str, int]) -> Tuple[List[str], List[int]]:
+    df = pd.read_csv(path, encoding="utf-8")
+    df = df[df["text_input"].notna()]
+    names = df["fine6"].fillna("").astype(str).map(lambda s: normalize_ws(s.replace("_", " ")).upper())
+    # Unknown labels stay in the set with -1 and only learn from the teacher.
+    return df["text_input"].astype(str).tolist(), [label_ids.get(n, -1) for n in names]
+
+
+def head_from_classifier(model) -> ClassificationHead:
+    cfg = model.config
+    clf = model.classifier
+    if hasattr(clf, "dense") and hasattr(clf, "out_proj"):
+        # RoBERTa-style head on the [CLS] vector.
+        dense, out = clf.dense, clf.out_proj
+    elif getattr(model.base_model, "pooler", None) is not None:
+        # BERT-style: pooler dense + tanh, then the classifier.
+        dense, out = model.base_model.pooler.dense, clf
+    else:
+        raise ValueError(f"cannot convert the classification head of {type(model).__name__}")
+    head = ClassificationHead(cfg.hidden_size, cfg.num_labels, dropout=getattr(cfg, "hidden_dropout_prob", 0.1))
+    head.dense.load_state_dict(dense.state_dict())
+    head.out_proj.load_state_dict(out.state_dict())
+    return head
+
+
+def _same_encoder(teacher, encoder) -> bool:
+    theirs = teacher.base_model.state_dict()
+    for name, tensor in encoder.state_dict().items():
+        other = theirs.get(name)
+        if other is None or other.shape != tensor.shape or not torch.equal(other, tensor):
+            return False
+    return True
+
+
+def convert(teachers: Dict[str, Path], init_from: str) -> Tuple[MultiTaskNet, List[str]]:
+    # The encoder comes from one teacher and each head from its own teacher,
+    # so `init_from`'s task is reproduced exactly before any fine-tuning.
+    # The other tasks are only reproduced if their teacher has the same
+    # encoder weights; the tasks that do not are returned alongside.
+    encoder = AutoModel.from_pretrained(str(teachers[init_from]), add_pooling_layer=False)
+    heads, differing = {}, []
+    for task in TASKS:
+        teacher = AutoModelForSequenceClassification.from_pretrained(str(teachers[task]))
+        if teacher.config.hidden_size != encoder.config.hidden_size:
+            raise ValueError(f"{task} teacher hidden size differs from the {init_from} encoder")
+        heads[task] = head_from_classifier(teacher)
+        if task != init_from and not _same_encoder(teacher, encoder):
+            differing.append(task)
+        del teacher
+    return MultiTaskNet(encoder, heads), differing
+
+
+def teacher_logits(task: str, texts: List[str], batch_size: int) -> np.ndarray:
+    from .artifacts import build_component
+
+    # The teachers run exactly as the separate-model pipeline runs them.
+    model = build_component(task)
+    model.load()
+    if task == "fine6":
+        res = model.predict_batch(texts)
+    else:
+        res = model.predict_proba_batch(texts)
+    return np.array([r.logits for r in res], dtype=np.float32)
+
+
+def _cycle(n: int, batch_size: int, rng: random.Random) -> Iterator[List[int]]:
+    while True:
+        order = list(range(n))
+        rng.shuffle(order)
+        for start in range(0, n, batch_size):
+            yield order[start:start + batch_size]
+
+
+def _task_loss(
+    logits: torch.Tensor,
+    labels: torch.Tensor,
+    teacher: Optional[torch.Tensor],
+    distill_weight: float,
+    class_weights: Optional[torch.Tensor],
+) -> torch.Tensor:
+    loss = logits.new_zeros(())
+    hard = labels >= 0
+    if distill_weight < 1.0 and bool(hard.any()):
+        loss = loss + (1.0 - distill_weight) * F.cross_entropy(logits[hard], labels[hard], weight=class_weights)
+    if teacher is not None and distill_weight > 0.0:
+        loss = loss + distill_weight * F.kl_div(
+            F.log_softmax(logits, dim=-1), F.softmax(teacher, dim=-1), reduction="batchmean"
+        )
+    return loss
+
+
+def _fine6_class_weights(labels: List[int], num_labels: int) -> torch.Tensor:
+    # Same inverse-frequency weighting as the fine6 notebook.
+    freq = np.bincount([y for y in labels if y >= 0], minlength=num_labels).astype(np.float32)
+    freq = np.maximum(freq, 1.0)
+    weights = freq.sum() / freq
+    return torch.tensor(weights / weights.mean(), dtype=torch.float32)
+
+
+def train(
+    net: MultiTaskNet,
+    tokenizer,
+    data: Dict[str, Tuple[List[str], List[int]]],
+    teachers: Dict[str, Optional[np.ndarray]],
+    *,
+    steps: int,
+    batch_size: int,
+    lr: float,
+    weight_decay: float,
+    distill_weight: float,
+    max_length: int,
+    device: str,
+    seed: int,
+) -> List[Dict[str, float]]:
+    from transformers import get_linear_schedule_with_warmup
+
+    rng = random.Random(seed)
+    torch.manual_seed(seed)
+    features = {
+        task: tokenizer(texts, truncation=True, max_length=max_length)
+        for task, (texts, _) in data.items()
+    }
+    features = {
+        task: [{k: enc[k][i] for k in enc.keys()} for i in range(len(data[task][0]))]
+        for task, enc in features.items()
+    }
+    batches = {task: _cycle(len(data[task][0]), batch_size, rng) for task in TASKS}
+    class_weights = {
+        "fine6": _fine6_class_weights(data["fine6"][1], net.heads["fine6"].out_proj.out_features).to(device),
+    }
+
+    net.to(device)
+    net.train()
+    opt = torch.optim.AdamW(net.parameters(), lr=lr, weight_decay=weight_decay)
+    sched = get_linear_schedule_with_warmup(opt, max(1, steps // 16), steps)
+
+    log = []
+    t0 = time.perf_counter()
+    for step in range(1, steps + 1):
+        # One encoder pass over a sub-batch of every task, as at inference.
+        idx = {task: next(batches[task]) for task in TASKS}
+        feats, spans, start = [], {}, 0
+        for task in TASKS:
+            feats.extend(features[task][i] for i in idx[task])
+            spans[task] = (start, start + len(idx[task]))
+            start += len(idx[task])
+        batch = {k: v.to(device) for k, v in tokenizer.pad(feats, padding=True, return_tensors="pt").items()}
+        cls = net.cls(batch)
+
+        losses = {}
+        for task in TASKS:
+            a, b = spans[task]
+            labels = torch.tensor([data[task][1][i] for i in idx[task]], dtype=torch.long, device=device)
+            teacher = None
+            if teachers.get(task) is not None:
+                teacher = torch.from_numpy(teachers[task][idx[task]]).to(device)
+            losses[task] = _task_loss(
+                net.heads[task](cls[a:b]), labels, teacher, distill_weight, class_weights.get(task)
+            )
+
+        loss = sum(losses.values())
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(net.parameters(), 1.0)
+        opt.step()
+        sched.step()
+        opt.zero_grad(set_to_none=True)
+
+        if step % 50 == 0 or step == steps:
+            entry = {"step": step, "loss": loss.item(), **{t: l.item() for t, l in losses.items()}}
+            log.append(entry)
+            print(
+                f"[multitask] step {step}/{steps} loss={entry['loss']:.4f} "
+                + " ".join(f"{t}={entry[t]:.4f}" for t in TASKS)
+                + f" ({time.perf_counter() - t0:.0f}s)",
+                file=sys.stderr,
+                flush=True,
+            )
+    net.eval()
+    return log
+
+
+def _replace_dir(tmp: Path, out: Path) -> None:
+    # The artifact watcher fingerprints the directory; swap it in whole.
+    old = out.with_name(out.name + ".old")
+    if old.exists():
+        shutil.rmtree(old)
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    if old.exists():
+        shutil.rmtree(old)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Build the shared-encoder multitask artifact from the three single-task models, "
+                    "optionally fine-tuning it on their training data."
+    )
+    ap.add_argument("--out", default=str(config.MULTITASK_MODEL_DIR))
+    ap.add_argument("--init-from", choices=TASKS, default="veracity", help="teacher whose encoder is the start point")
+    ap.add_argument("--steps", type=int, default=0, help="fine-tuning steps (0 = convert only)")
+    ap.add_argument("--epochs", type=float, default=0.0, help="alternative to --steps, over the largest task")
+    ap.add_argument("--batch-size", type=int, default=8, help="examples per task per step")
+    ap.add_argument("--lr", type=float, default=2e-5)
+    ap.add_argument("--weight-decay", type=float, default=0.01)
+    ap.add_argument(
+        "--distill-weight", type=float, default=0.5,
+        help="share of the loss that matches the single-task models' outputs (1 = pure distillation)",
+    )
+    ap.add_argument("--max-length", type=int, default=512)
+    ap.add_argument("--limit", type=int, default=0, help="examples per task (0 = all)")
+    ap.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument(
+        "--allow-unshared", action="store_true",
+        help="write a convert-only artifact even if the teachers' encoders differ",
+    )
+    for task, default in DEFAULT_DATA.items():
+        ap.add_argument(f"--{task}-data", default=str(default))
+    args = ap.parse_args()
+
+    teachers = teacher_dirs()
+    tokenizer = AutoTokenizer.from_pretrained(str(teachers[args.init_from]))
+    net, differing = convert(teachers, args.init_from)
+
+    meta: Dict[str, Any] = {
+        "init_from": args.init_from,
+        "teachers": {task: str(path) for task, path in teachers.items()},
+        "fine6_labels": config.FINE6_LABELS,
+        "steps": 0,
+        # Heads that sat on another encoder in their teacher.
+        "unshared_heads": differing,
+    }
+
+    if differing and args.steps <= 0 and args.epochs <= 0:
+        # Without fine-tuning those heads read an encoder they were never
+        # trained on, and their outputs are not the single-task models'.
+        msg = (
+            f"the {', '.join(differing)} teacher encoder(s) differ from the {args.init_from} encoder, "
+            f"so a convert-only artifact does not reproduce those tasks; fine-tune with --steps/--epochs"
+        )
+        if not args.allow_unshared:
+            raise SystemExit(f"[multitask] {msg} (or pass --allow-unshared)")
+        print(f"[multitask] WARNING: {msg}", file=sys.stderr, flush=True)
+
+    if args.steps > 0 or args.epochs > 0:
+        label_ids = fine6_label_ids(teachers["fine6"])
+        data = {
+            "clickbait": load_clickbait(Path(args.clickbait_data)),
+            "veracity": load_veracity(Path(args.veracity_data)),
+            "fine6": load_fine6(Path(args.fine6_data), label_ids),
+        }
+        if args.limit > 0:
+            data = {task: (texts[:args.limit], ys[:args.limit]) for task, (texts, ys) in data.items()}
+        for task, (texts, _) in data.items():
+            if not texts:
+                raise SystemExit(f"no {task} training examples in {getattr(args, task + '_data')}")
+
+        steps = args.steps
+        if steps <= 0:
+            largest = max(len(texts) for texts, _ in data.values())
+            steps = max(1, int(args.epochs * largest / args.batch_size))
+
+        soft: Dict[str, Optional[np.ndarray]] = {task: None for task in TASKS}
+        if args.distill_weight > 0:
+            for task in TASKS:
+                print(f"[multitask] teacher logits for {task} ({len(data[task][0])} examples)", file=sys.stderr)
+                soft[task] = teacher_logits(task, data[task][0], batch_size=32)
+
+        meta["log"] = train(
+            net,
+            tokenizer,
+            data,
+            soft,
+            steps=steps,
+            batch_size=args.batch_size,
+            lr=args.lr,
+            weight_decay=args.weight_decay,
+            distill_weight=args.distill_weight,
+            max_length=args.max_length,
+            device=args.device,
+            seed=args.seed,
+        )
+        meta.update({
+            "steps": steps,
+            "batch_size": args.batch_size,
+            "lr": args.lr,
+            "distill_weight": args.distill_weight,
+            "examples": {task: len(texts) for task, (texts, _) in data.items()},
+            "data": {task: getattr(args, f"{task}_data") for task in TASKS},
+            "fine6_label_ids": label_ids,
+        })
+
+    out = Path(args.out)
+    tmp = out.with_name(out.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    save_net(net.cpu(), tmp, tokenizer, meta)
+    _replace_dir(tmp, out)
+    print(json.dumps({"out": str(out), "steps": meta["steps"], "init_from": args.init_from}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .utils.text import normalize_ws, strip_urls
+
+_PRIME = (1 << 61) - 1
+_MASK32 = np.uint64(0xFFFFFFFF)
+_FORMAT = 3
+
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+# A single added "nu" flips a claim but barely moves its MinHash, so only
+# texts with the same number of negations can match each other.
+_NEGATIONS = frozenset({
+    "nu", "nici", "niciun", "nicio", "niciodata", "nimic", "fara", "n",
+    "not", "no", "never", "without",
+})
+
+
+def normalize_text(text: str) -> str:
+    # Folds diacritics (ş/ș, ţ/ț and text typed without them) and
+    # punctuation, which vary freely between copies of the same claim.
+    text = unicodedata.normalize("NFKD", strip_urls(text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return normalize_ws(_NON_WORD_RE.sub(" ", text))
+
+
+@dataclass
+class NearDupMatch:
+    id: str
+    similarity: float
+    values: Dict[str, Any]
+
+
+@dataclass
+class _Entry:
+    signature: np.ndarray
+    values: Dict[str, Any] = field(default_factory=dict)
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, shingle: int = 5, max_chars: int = 4000, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        # a, h < 2**32 keeps a*h + b inside uint64 before the mod.
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.max_chars = max_chars
+        self._powers = np.array([pow(31, k, 1 << 32) for k in range(shingle - 1, -1, -1)], dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        codes = np.frombuffer(text[:self.max_chars].encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        n = len(codes) - self.shingle + 1
+        if n <= 0:
+            return np.empty(0, dtype=np.uint64)
+        h = np.zeros(n, dtype=np.uint64)
+        for k, p in enumerate(self._powers):
+            h = (h + codes[k:k + n] * p) & _MASK32
+        return np.unique(h)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        sh = self.shingles(text)
+        if sh.size == 0:
+            return None
+        hv = (self.a[:, None] * sh[None, :] + self.b[:, None]) % np.uint64(_PRIME)
+        return (hv & _MASK32).min(axis=1).astype(np.uint32)
+
+
+class NearDupIndex:
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.9,
+        max_entries: int = 100000,
+        num_perm: int = 64,
+        bands: int = 16,
+        min_chars: int = 40,
+        path: Optional[Path] = None,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = float(threshold)
+        self.max_entries = max(1, int(max_entries))
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_chars = min_chars
+        self.path = Path(path) if path else None
+        self.hasher = MinHasher(num_perm=num_perm)
+
+        self.version = ""
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, text: str) -> Tuple[str, Optional[np.ndarray]]:
+        norm = normalize_text(text)
+        if len(norm) < self.min_chars:
+            return "", None
+        negations = sum(w in _NEGATIONS for w in norm.split())
+        digest = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        return f"{negations}:{digest}", self.hasher.signature(norm)
+
+    def _band_keys(self, sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        r = self.rows
+        return [(b, sig[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def _check_version(self, version: str) -> None:
+        if version != self.version:
+            self._entries.clear()
+            self._buckets.clear()
+            self.version = version
+
+    def lookup(self, key: str, sig: Optional[np.ndarray], version: str) -> Optional[NearDupMatch]:
+        if sig is None:
+            return None
+        with self._lock:
+            self._check_version(version)
+            best_id, best_sim = None, 0.0
+            if key in self._entries:
+                best_id, best_sim = key, 1.0
+            else:
+                candidates: Set[str] = set()
+                for bk in self._band_keys(sig):
+                    candidates |= self._buckets.get(bk, set())
+                polarity = key.split(":", 1)[0]
+                for cid in candidates:
+                    if cid.split(":", 1)[0] != polarity:
+                        continue
+                    sim = float(np.count_nonzero(self._entries[cid].signature == sig)) / sig.size
+                    if sim > best_sim:
+                        best_id, best_sim = cid, sim
+            if best_id is None or best_sim < self.threshold:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._entries.move_to_end(best_id)
+            return NearDupMatch(best_id, best_sim, dict(self._entries[best_id].values))
+
+    def add(self, key: str, sig: Optional[np.ndarray], values: Dict[str, Any], version: str) -> None:
+        if sig is None or not values:
+            return
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.values.update(values)
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = _Entry(sig, dict(values))
+            for bk in self._band_keys(sig):
+                self._buckets.setdefault(bk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        old_key, old = self._entries.popitem(last=False)
+        for bk in self._band_keys(old.signature):
+            bucket = self._buckets.get(bk)
+            if bucket is not None:
+                bucket.discard(old_key)
+                if not bucket:
+                    del self._buckets[bk]
+        self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = len(self._entries)
+        out["max_entries"] = self.max_entries
+        out["threshold"] = self.threshold
+        out["path"] = str(self.path) if self.path is not None else None
+        return out
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            payload = {
+                "format": _FORMAT,
+                "version": self.version,
+                "params": (self.hasher.num_perm, self.bands),
+                "entries": [(k, e.signature, e.values) for k, e in self._entries.items()],
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Forked serve.py workers all save on shutdown: one tmp file each, so
+        # the last complete write wins instead of a mix of several.
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open("rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            # A cache: start empty rather than keep the service from booting.
+            print(f"[neardup] ignoring unreadable {self.path}: {e!r}", flush=True)
+            return
+        params = (self.hasher.num_perm, self.bands)
+        if not isinstance(payload, dict) or payload.get("format") != _FORMAT or tuple(payload.get("params", ())) != params:
+            return
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self.version = payload["version"]
+        for key, sig, values in payload["entries"][-self.max_entries:]:
+            self.add(key, sig, values, payload["version"])
@@ -1,15 +1,25 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional, Dict, Any
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, List, Tuple
 
 from . import config
+from .artifacts import TRANSFORMERS, ArtifactSet
+from .neardup import NearDupIndex, NearDupMatch
+from .utils.domains import DomainSet
 from .utils.text import build_text_input, text_len, normalize_ws
-from .models.clickbait import ClickbaitModel
-from .models.veracity import VeracityModel
-from .models.fine6 import Fine6Model
-from .models.fusion import FusionModel
-from .models.source_prior import SourcePrior
+from .stages import StageGraph, StageRun
+
+if TYPE_CHECKING:
+    from .models.clickbait import ClickbaitModel, ClickbaitResult
+    from .models.veracity import VeracityModel, VeracityResult
+    from .models.fine6 import Fine6Model, Fine6Result
+    from .models.fusion import FusionModel, FusionResult
+    from .models.source_prior import SourcePrior, SourcePriorResult
+    from .models.multitask import SharedHidden
+    from .models.prefilter import PrefilterResult
 
 
 @dataclass
@@ -20,96 +30,459 @@ class PipelineInput:
     source_url: Optional[str] = None
 
 
+# Stages whose outputs depend only on text_input, and so can be reused for a
+# near-duplicate text whatever its source. Clickbait reads the title, whose
+# case and punctuation the near-dup key throws away, so it always runs.
+NEARDUP_STAGES = ("veracity", "fine6")
+
+_WARMUP_WORDS = (
+    "guvernul", "a", "anunțat", "astăzi", "noi", "măsuri", "pentru", "economie",
+    "iar", "ministerul", "sănătății", "spune", "că", "situația", "este", "stabilă",
+)
+
+
 class FakeNewsPipeline:
     def __init__(self):
-        self.clickbait = ClickbaitModel(config.CLICKBAIT_MODEL_DIR, device=config.DEVICE)
-        self.veracity = VeracityModel(config.VERACITY_MODEL_DIR, device=config.DEVICE)
-        self.fine6 = Fine6Model(config.FINE6_MODEL_DIR, labels=config.FINE6_LABELS, device=config.DEVICE)
-
-        self.fusion = FusionModel(
-            model_path=config.FUSION_MODEL_PATH,
-            threshold_path=config.FUSION_THRESHOLD_PATH,
-            feature_schema_path=config.FUSION_FEATURE_SCHEMA_PATH,
-        )
-
-        self.source_prior = SourcePrior(
-            table_csv=config.SOURCE_VERACITY_TABLE_PATH,
-            platform_domains=config.PLATFORM_DOMAINS,
-            platform_neutral=config.PLATFORM_NEUTRAL,
-        )
+        self.satire_domains = DomainSet(config.SATIRE_DOMAINS)
+        self.propaganda_domains = DomainSet(config.PROPAGANDA_DOMAINS)
 
+        self._graph = self._build_graph()
+        # Called with the finished StageRun and outputs of every predict_batch call.
+        self.observers: List[Callable[[StageRun, List[Dict[str, Any]]], None]] = []
+        self._artifacts = None  # type: Optional[ArtifactSet]
+        self._lock = threading.Lock()
         self._loaded = False
 
+        self.near_dups = None  # type: Optional[NearDupIndex]
+        if config.NEARDUP_THRESHOLD > 0:
+            self.near_dups = NearDupIndex(
+                threshold=config.NEARDUP_THRESHOLD,
+                max_entries=config.NEARDUP_MAX_ENTRIES,
+                path=config.NEARDUP_PATH or None,
+            )
+
+    @property
+    def artifacts(self) -> ArtifactSet:
+        # Built on first access rather than in __init__ so that constructing
+        # the pipeline does not import torch/transformers.
+        if self._artifacts is None:
+            with self._lock:
+                if self._artifacts is None:
+                    self._artifacts = ArtifactSet.create()
+        return self._artifacts
+
+    @property
+    def clickbait(self) -> ClickbaitModel:
+        return self.artifacts.clickbait
+
+    @property
+    def veracity(self) -> VeracityModel:
+        return self.artifacts.veracity
+
+    @property
+    def fine6(self) -> Fine6Model:
+        return self.artifacts.fine6
+
+    @property
+    def fusion(self) -> FusionModel:
+        return self.artifacts.fusion
+
+    @property
+    def source_prior(self) -> SourcePrior:
+        return self.artifacts.source_prior
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def artifact_version(self) -> str:
+        return self._artifacts.version if self._loaded else ""
+
     def load(self) -> None:
         if self._loaded:
             return
-        self.clickbait.load()
-        self.veracity.load()
-        self.fine6.load()
-        self.fusion.load()
-        self.source_prior.load()
-        self._loaded = True
+        artifacts = self.artifacts
+        with self._lock:
+            if self._loaded:
+                return
+            self._artifacts = artifacts.load()
+            self._loaded = True
 
-    def predict(self, inp: PipelineInput) -> Dict[str, Any]:
+    def swap(self, artifacts: ArtifactSet) -> ArtifactSet:
+        with self._lock:
+            old, self._artifacts = self._artifacts, artifacts
+            self._loaded = True
+        return old
+
+    def warm_up(
+            self,
+            artifacts: Optional[ArtifactSet] = None,
+            lengths: Optional[List[int]] = None,
+    ) -> Dict[int, float]:
+        # One pass per sequence-length bucket; no source, so every row takes
+        # the full path through all three transformers and fusion.
+        if artifacts is None:
+            self.load()
+            artifacts = self._artifacts
+        # The prefilter or the near-dup index could answer the warm-up rows
+        # without the models, and the synthetic rows must not end up in the
+        # index or the metrics.
+        artifacts = replace(artifacts, prefilter=None)
+        timings = {}
+        for n in lengths or config.WARMUP_SEQ_LENGTHS:
+            words = " ".join(_WARMUP_WORDS[i % len(_WARMUP_WORDS)] for i in range(max(1, n)))
+            t0 = time.perf_counter()
+            self._predict_batch(
+                [PipelineInput(title=words[:120], body=words)],
+                artifacts,
+                near_dups=None,
+                observe=False,
+            )
+            timings[n] = time.perf_counter() - t0
+        return timings
+
+    def share_memory(self) -> None:
         self.load()
+        for name in TRANSFORMERS:
+            getattr(self.artifacts, name).backend.share_memory()
 
-        text_input = build_text_input(title=inp.title, claim=inp.claim, body=inp.body)
-        tl = text_len(text_input)
+    def predict(self, inp: PipelineInput) -> Dict[str, Any]:
+        return self.predict_batch([inp])[0]
 
-        clickbait_text = normalize_ws(inp.title or "") or text_input
-        cb = self.clickbait.predict_proba(clickbait_text)
+    def predict_batch(
+            self,
+            inps: List[PipelineInput],
+            artifacts: Optional[ArtifactSet] = None,
+    ) -> List[Dict[str, Any]]:
+        if artifacts is None:
+            self.load()
+            artifacts = self._artifacts
+        return self._predict_batch(inps, artifacts, near_dups=self.near_dups, observe=True)
 
-        ver = self.veracity.predict_proba(text_input)
+    def _predict_batch(
+            self,
+            inps: List[PipelineInput],
+            artifacts: ArtifactSet,
+            near_dups: Optional[NearDupIndex],
+            observe: bool,
+    ) -> List[Dict[str, Any]]:
+        if not inps:
+            return []
 
-        sp = self.source_prior.lookup(inp.source_url or "")
+        # Every stage of this call reads from the same snapshot, so a
+        # concurrent swap() only affects batches that start after it.
+        run = self._graph.run(inps, context=artifacts)
+        rows = list(range(len(inps)))
 
-        if (
-                tl < config.NEUTRAL_MAX_TEXT_LEN
-                and ver.p_true < config.NEUTRAL_CONTENT_MAX_P_TRUE
-                and sp.p_true >= config.HIGH_TRUST_MIN_P_TRUE
-        ):
-            return {
-                "input": {
-                    "text_len": tl,
-                    "source_url": inp.source_url or "",
-                    "source_domain": sp.source_domain,
-                },
-                "component_outputs": {
-                    "p_clickbait": cb.p_clickbait,
-                    "p_true_content": ver.p_true,
-                    "source_score": sp.source_score,
-                    "p_true_source": sp.p_true,
-                    "source_evidence": sp.evidence,
-                },
-                "fusion": {
-                    "final_p_true": sp.p_true,
-                    "threshold": self.fusion.threshold,
-                    "binary_label": "TRUE",
-                    "features": {
-                        "neutral_override": True
-                    },
-                },
-                "fine6": {
-                    "fine6_label": "TRUE",
-                    "raw_fine6_label": "TRUE",
-                    "top_prob": 1.0,
-                    "probs": {"TRUE": 1.0},
-                },
-                "gated": {
-                    "gated_label": "TRUE",
-                },
+        near_keys, matches = self._near_dup_lookup(near_dups, run, rows, artifacts)
+
+        tls = run.get("text_len", rows)
+        sps = run.get("source_prior", rows)
+
+        # Rows the TF-IDF stage is confident about never reach the models.
+        prefiltered = {}
+        if artifacts.prefilter is not None:
+            todo = [i for i in rows if i not in matches]
+            prefiltered = {i: res for i, res in zip(todo, run.get("prefilter", todo)) if res.label is not None}
+
+        # Only rows that pass the cheap half of the neutral override need
+        # veracity before deciding; everyone else goes down the full path.
+        candidates = [
+            i for i in rows
+            if i not in prefiltered
+            and tls[i] < config.NEUTRAL_MAX_TEXT_LEN and sps[i].p_true >= config.HIGH_TRUST_MIN_P_TRUE
+        ]
+        vers = run.get("veracity", candidates)
+        overrides = {
+            i for i, ver in zip(candidates, vers)
+            if ver.p_true < config.NEUTRAL_CONTENT_MAX_P_TRUE
+        }
+
+        full_idx = [i for i in rows if i not in overrides and i not in prefiltered]
+        run.get("fusion", full_idx)
+        run.get("fine6", full_idx)
+        self._near_dup_store(near_dups, run, rows, near_keys, matches, artifacts)
+
+        t0 = time.perf_counter()
+        results = []
+        for i, inp in enumerate(inps):
+            args = (
+                inp,
+                run.value("text_len", i),
+                run.value("clickbait", i),
+                run.value("veracity", i),
+                run.value("source_prior", i),
+            )
+            if i in prefiltered:
+                out = self._prefilter_output(inp, args[1], args[4], prefiltered[i])
+                out["path"] = "prefilter"
+            elif i in overrides:
+                out = self._override_output(*args, artifacts.fusion.threshold)
+                out["path"] = "override"
+            else:
+                out = self._full_output(*args, run.value("fusion", i), run.value("fine6", i))
+                out["path"] = "full"
+            out["stages"] = {
+                "evaluated": run.evaluated(i),
+                "reused": run.reused(i),
+                "skipped": run.skipped(i),
+            }
+            match = matches.get(i)
+            out["near_duplicate"] = (
+                {"id": match.id, "similarity": match.similarity} if match is not None else None
+            )
+            results.append(out)
+        run.seconds["gating"] = time.perf_counter() - t0
+
+        if observe:
+            for observer in self.observers:
+                observer(run, results)
+        return results
+
+    def _near_dup_lookup(
+            self,
+            near_dups: Optional[NearDupIndex],
+            run: StageRun,
+            rows: List[int],
+            artifacts: ArtifactSet,
+    ) -> Tuple[Dict[int, Tuple[str, Any]], Dict[int, NearDupMatch]]:
+        if near_dups is None:
+            return {}, {}
+        version = artifacts.model_version
+        keys = {}
+        matches = {}
+        for i, text in zip(rows, run.get("text_input", rows)):
+            keys[i] = key, sig = near_dups.key(text)
+            match = near_dups.lookup(key, sig, version)
+            if match is None:
+                continue
+            matches[i] = match
+            for name, value in match.values.items():
+                run.put(name, i, value)
+        return keys, matches
+
+    def _near_dup_store(
+            self,
+            near_dups: Optional[NearDupIndex],
+            run: StageRun,
+            rows: List[int],
+            keys: Dict[int, Tuple[str, Any]],
+            matches: Dict[int, NearDupMatch],
+            artifacts: ArtifactSet,
+    ) -> None:
+        if near_dups is None:
+            return
+        version = artifacts.model_version
+        for i in rows:
+            key, sig = keys[i]
+            if i in matches:
+                # Fill in whatever the matched entry was missing rather than
+                # starting a second entry for the same claim.
+                key = matches[i].id
+            fresh = {
+                name: run.value(name, i)
+                for name in NEARDUP_STAGES
+                if run.value(name, i) is not None and not run.is_reused(name, i)
             }
+            near_dups.add(key, sig, fresh, version)
 
-        fusion_out = self.fusion.predict(
-            p_true_content=ver.p_true,
-            p_clickbait=cb.p_clickbait,
-            source_score=sp.source_score,
-            text_len=tl,
-            has_source=1 if sp.source_domain else 0,
+    def _build_graph(self) -> StageGraph:
+        graph = StageGraph()
+        graph.add("text_input", self._stage_text_input)
+        graph.add("text_len", self._stage_text_len, deps=("text_input",))
+        graph.add("source_prior", self._stage_source_prior)
+        graph.add("prefilter", self._stage_prefilter, deps=("text_input",))
+        graph.add("text_encoding", self._stage_text_encoding, deps=("text_input",))
+        if config.MODEL_LAYOUT == "multitask":
+            # One encoder pass per row covers all three heads.
+            graph.add("shared_encoder", self._stage_shared_encoder, deps=("text_input", "text_encoding"))
+            graph.add("veracity", self._stage_veracity_head, deps=("shared_encoder",))
+            graph.add("clickbait", self._stage_clickbait_head, deps=("shared_encoder",))
+        else:
+            graph.add("veracity", self._stage_veracity, deps=("text_input", "text_encoding"))
+            graph.add("clickbait", self._stage_clickbait, deps=("text_input",))
+        graph.add(
+            "fusion",
+            self._stage_fusion,
+            deps=("veracity", "clickbait", "source_prior", "text_len"),
+        )
+        if config.MODEL_LAYOUT == "multitask":
+            graph.add("fine6", self._stage_fine6_head, deps=("shared_encoder",))
+        else:
+            graph.add("fine6", self._stage_fine6, deps=("text_input",))
+        return graph
+
+    def _stage_text_input(self, run: StageRun, rows: List[int]) -> List[str]:
+        return [
+            build_text_input(title=run.inputs[i].title, claim=run.inputs[i].claim, body=run.inputs[i].body)
+            for i in rows
+        ]
+
+    def _stage_text_len(self, run: StageRun, rows: List[int]) -> List[int]:
+        return [text_len(t) for t in run.get("text_input", rows)]
+
+    def _stage_source_prior(self, run: StageRun, rows: List[int]) -> List[SourcePriorResult]:
+        return [run.context.source_prior.lookup(run.inputs[i].source_url or "") for i in rows]
+
+    def _stage_prefilter(self, run: StageRun, rows: List[int]) -> List[PrefilterResult]:
+        return run.context.prefilter.predict_batch(run.get("text_input", rows))
+
+    def _stage_text_encoding(self, run: StageRun, rows: List[int]) -> List[Dict[str, Any]]:
+        model = run.context.multitask or run.context.veracity
+        return model.encode(run.get("text_input", rows))
+
+    def _stage_veracity(self, run: StageRun, rows: List[int]) -> List[VeracityResult]:
+        return run.context.veracity.predict_proba_batch(
+            run.get("text_input", rows),
+            features=run.get("text_encoding", rows),
         )
 
-        fine = self.fine6.predict(text_input)
+    def _clickbait_texts(self, run: StageRun, rows: List[int]) -> List[str]:
+        return [
+            normalize_ws(run.inputs[i].title or "") or t
+            for i, t in zip(rows, run.get("text_input", rows))
+        ]
+
+    def _stage_clickbait(self, run: StageRun, rows: List[int]) -> List[ClickbaitResult]:
+        return run.context.clickbait.predict_proba_batch(self._clickbait_texts(run, rows))
+
+    def _stage_shared_encoder(self, run: StageRun, rows: List[int]) -> List[SharedHidden]:
+        return run.context.multitask.shared_hidden(
+            run.get("text_input", rows),
+            run.get("text_encoding", rows),
+            self._clickbait_texts(run, rows),
+        )
+
+    def _stage_veracity_head(self, run: StageRun, rows: List[int]) -> List[VeracityResult]:
+        return run.context.multitask.veracity(run.get("shared_encoder", rows))
+
+    def _stage_clickbait_head(self, run: StageRun, rows: List[int]) -> List[ClickbaitResult]:
+        return run.context.multitask.clickbait(run.get("shared_encoder", rows))
 
+    def _stage_fine6_head(self, run: StageRun, rows: List[int]) -> List[Fine6Result]:
+        return run.context.multitask.fine6(run.get("shared_encoder", rows))
+
+    def _stage_fusion(self, run: StageRun, rows: List[int]) -> List[FusionResult]:
+        return run.context.fusion.predict_batch([
+            {
+                "p_true_content": ver.p_true,
+                "p_clickbait": cb.p_clickbait,
+                "source_score": sp.source_score,
+                "text_len": tl,
+                "has_source": 1 if sp.source_domain else 0,
+            }
+            for ver, cb, sp, tl in zip(
+                run.get("veracity", rows),
+                run.get("clickbait", rows),
+                run.get("source_prior", rows),
+                run.get("text_len", rows),
+            )
+        ])
+
+    def _stage_fine6(self, run: StageRun, rows: List[int]) -> List[Fine6Result]:
+        features = run.get("text_encoding", rows) if run.context.share_encodings else None
+        return run.context.fine6.predict_batch(run.get("text_input", rows), features=features)
+
+    def _override_output(
+            self,
+            inp: PipelineInput,
+            tl: int,
+            cb: Optional[ClickbaitResult],
+            ver: VeracityResult,
+            sp: SourcePriorResult,
+            threshold: float,
+    ) -> Dict[str, Any]:
+        return {
+            "input": {
+                "text_len": tl,
+                "source_url": inp.source_url or "",
+                "source_domain": sp.source_domain,
+            },
+            "component_outputs": {
+                "p_clickbait": cb.p_clickbait if cb is not None else None,
+                "p_true_content": ver.p_true,
+                "source_score": sp.source_score,
+                "p_true_source": sp.p_true,
+                "source_evidence": sp.evidence,
+            },
+            "fusion": {
+                "final_p_true": sp.p_true,
+                "threshold": threshold,
+                "binary_label": "TRUE",
+                "features": {
+                    "neutral_override": True
+                },
+            },
+            "fine6": {
+                "fine6_label": "TRUE",
+                "raw_fine6_label": "TRUE",
+                "top_prob": 1.0,
+                "probs": {"TRUE": 1.0},
+            },
+            "gated": {
+                "gated_label": "TRUE",
+            },
+        }
+
+    def _prefilter_output(
+            self,
+            inp: PipelineInput,
+            tl: int,
+            sp: SourcePriorResult,
+            pre: PrefilterResult,
+    ) -> Dict[str, Any]:
+        label = pre.label
+        conf = pre.p_true if label == "TRUE" else 1.0 - pre.p_true
+        gated_label = self._gated_fine_label(
+            fusion_binary=label,
+            fine_probs={label: conf},
+            top_prob=conf,
+            source_domain=sp.source_domain,
+        )
+        return {
+            "input": {
+                "text_len": tl,
+                "source_url": inp.source_url or "",
+                "source_domain": sp.source_domain,
+            },
+            "component_outputs": {
+                "p_clickbait": None,
+                "p_true_content": None,
+                "p_true_prefilter": pre.p_true,
+                "source_score": sp.source_score,
+                "p_true_source": sp.p_true,
+                "source_evidence": sp.evidence,
+            },
+            "fusion": {
+                "final_p_true": pre.p_true,
+                "threshold": pre.threshold,
+                "binary_label": label,
+                "features": {
+                    "prefilter": True
+                },
+            },
+            "fine6": {
+                "fine6_label": label,
+                "raw_fine6_label": label,
+                "top_prob": conf,
+                "probs": {label: conf},
+            },
+            "gated": {
+                "gated_label": gated_label,
+            },
+        }
+
+    def _full_output(
+            self,
+            inp: PipelineInput,
+            tl: int,
+            cb: ClickbaitResult,
+            ver: VeracityResult,
+            sp: SourcePriorResult,
+            fusion_out: FusionResult,
+            fine: Fine6Result,
+    ) -> Dict[str, Any]:
         fine6_label = fine.label
         if fine.top_prob < config.INCONCLUSIVE_MIN_TOP_PROB:
             fine6_label = "INCONCLUSIVE"
@@ -161,13 +534,13 @@ class FakeNewsPipeline:
     ) -> str:
         if (
                 fusion_binary == "FALSE"
-                and source_domain in config.SATIRE_DOMAINS
+                and source_domain in self.satire_domains
         ):
             return "SATIRE"
 
         if (
                 fusion_binary == "FALSE"
-                and source_domain in config.PROPAGANDA_DOMAINS
+                and source_domain in self.propaganda_domains
                 and fine_probs.get("PROPAGANDA", 0.0) >= 0.05
         ):
             return "PROPAGANDA"
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import replace
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from . import config
+from .models.prefilter import PrefilterModel
+from .score import FIELDS, batched, read_records, to_input
+from .utils.text import build_text_input
+
+REPO_ROOT = config.PROJECT_ROOT.parent
+DEFAULT_TRAIN = REPO_ROOT / "binary" / "UnifiedBinary" / "train.csv"
+
+
+def build_model(kind: str, seed: int):
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.svm import LinearSVC
+
+    if kind == "svm":
+        base = LinearSVC(C=0.5, class_weight="balanced", random_state=seed)
+    else:
+        base = LogisticRegression(C=4.0, class_weight="balanced", max_iter=2000)
+    # The thresholds are set on probabilities, so the scores are calibrated.
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(
+            lowercase=True,
+            ngram_range=(1, 2),
+            min_df=2,
+            max_df=0.95,
+            sublinear_tf=True,
+            max_features=500000,
+        )),
+        ("clf", CalibratedClassifierCV(base, method="sigmoid", cv=3)),
+    ])
+
+
+def _dump(obj: Any, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def _write_json(obj: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(obj, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def fit(args) -> Dict[str, Any]:
+    df = pd.read_csv(args.train, encoding="utf-8")
+    df = df[df["text_input"].notna() & df["y"].notna()]
+    if args.limit > 0:
+        df = df.sample(n=min(args.limit, len(df)), random_state=args.seed)
+    texts = df["text_input"].astype(str).tolist()
+    ys = df["y"].astype(int).to_numpy()
+    if sorted(set(ys.tolist())) != [0, 1]:
+        raise SystemExit(f"{args.train}: y must contain both 0 and 1")
+
+    t0 = time.perf_counter()
+    model = build_model(args.model, args.seed)
+    model.fit(texts, ys)
+    _dump(model, Path(args.out))
+    return {
+        "out": str(args.out),
+        "model": args.model,
+        "examples": len(texts),
+        "vocabulary": len(model.named_steps["tfidf"].vocabulary_),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def _threshold(p: np.ndarray, agree: np.ndarray, target: float, min_support: int) -> Tuple[Optional[float], int]:
+    # p and agree are sorted most-confident first. Take the longest prefix
+    # whose agreement with the full pipeline stays at the target, cutting
+    # only between distinct scores so the threshold reproduces the prefix.
+    if p.size == 0:
+        return None, 0
+    acc = np.cumsum(agree) / np.arange(1, p.size + 1)
+    cut = np.append(p[1:] != p[:-1], True)
+    ok = np.nonzero((acc >= target) & cut & (np.arange(1, p.size + 1) >= min_support))[0]
+    if ok.size == 0:
+        return None, 0
+    k = int(ok[-1]) + 1
+    return float(p[k - 1]), k
+
+
+def reference(records: List[Dict[str, Any]], batch_size: int) -> Tuple[List[Dict[str, Any]], Any]:
+    from .pipeline import FakeNewsPipeline, PipelineInput
+
+    pipeline = FakeNewsPipeline()
+    pipeline.load()
+    artifacts = replace(pipeline.artifacts, prefilter=None)
+    outs = []
+    for chunk in batched(records, batch_size):
+        inps = [PipelineInput(**{k: v for k, v in rec.items() if k != "id"}) for rec in chunk]
+        outs.extend(pipeline.predict_batch(inps, artifacts=artifacts))
+        print(f"[prefilter] reference {len(outs)}/{len(records)}", file=sys.stderr)
+    return outs, pipeline
+
+
+def tune(args) -> Dict[str, Any]:
+    records = [to_input(rec, FIELDS) for rec in islice(read_records(Path(args.input)), args.limit or None)]
+    if not records:
+        raise SystemExit(f"no records in {args.input}")
+    outs, pipeline = reference(records, args.batch_size)
+
+    prefilter = PrefilterModel(Path(args.model_path), Path(args.out))
+    prefilter.load()
+    texts = [build_text_input(title=r["title"], claim=r["claim"], body=r["body"]) for r in records]
+    p = prefilter.predict_proba(texts)
+
+    def agrees(i: int, label: str) -> bool:
+        out = outs[i]
+        if args.agree_on == "binary":
+            return out["fusion"]["binary_label"] == label
+        # Same gating the pipeline applies to a prefiltered row.
+        conf = float(p[i]) if label == "TRUE" else 1.0 - float(p[i])
+        gated = pipeline._gated_fine_label(
+            fusion_binary=label,
+            fine_probs={label: conf},
+            top_prob=conf,
+            source_domain=out["input"]["source_domain"],
+        )
+        return out["gated"]["gated_label"] == gated
+
+    order = np.argsort(-p, kind="stable")
+    agree = np.array([agrees(i, "TRUE") for i in order], dtype=float)
+    threshold_true, n_true = _threshold(p[order], agree, args.target_agreement, args.min_support)
+
+    # The TRUE side is checked first at serving time, so the FALSE side is
+    # tuned on what it leaves.
+    rest = order[n_true:][::-1]
+    agree = np.array([agrees(i, "FALSE") for i in rest], dtype=float)
+    threshold_false, n_false = _threshold(p[rest], agree, args.target_agreement, args.min_support)
+
+    fired = {int(i): "TRUE" for i in order[:n_true]}
+    fired.update({int(i): "FALSE" for i in rest[:n_false]})
+    n_agree = sum(agrees(i, label) for i, label in fired.items())
+    n = len(records)
+    report = {
+        "threshold_true": threshold_true,
+        "threshold_false": threshold_false,
+        "agree_on": args.agree_on,
+        "target_agreement": args.target_agreement,
+        "n_records": n,
+        "coverage": len(fired) / n,
+        "coverage_true": n_true / n,
+        "coverage_false": n_false / n,
+        "prefilter_agreement": n_agree / len(fired) if fired else None,
+        # Rows the prefilter does not take keep the full pipeline's answer.
+        "overall_agreement": (n - len(fired) + n_agree) / n,
+        "model_path": str(args.model_path),
+        "input": str(args.input),
+    }
+    _write_json(report, Path(args.out))
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fit the TF-IDF prefilter and tune its skip thresholds.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    f = sub.add_parser("fit", help="fit the calibrated TF-IDF linear model")
+    f.add_argument("--train", default=str(DEFAULT_TRAIN), help="CSV with text_input and y (1 = TRUE)")
+    f.add_argument("--model", choices=("svm", "lr"), default="svm")
+    f.add_argument("--out", default=str(config.PREFILTER_MODEL_PATH))
+    f.add_argument("--limit", type=int, default=0, help="subsample this many rows (0 = all)")
+    f.add_argument("--seed", type=int, default=42)
+
+    t = sub.add_parser("tune", help="pick thresholds against the full pipeline's verdicts")
+    t.add_argument("--input", required=True, help="held-out records (.jsonl or .csv with title/claim/body/source_url)")
+    t.add_argument("--model-path", default=str(config.PREFILTER_MODEL_PATH))
+    t.add_argument("--out", default=str(config.PREFILTER_THRESHOLDS_PATH))
+    t.add_argument("--target-agreement", type=float, default=0.98, help="required agreement on the rows each side takes")
+    t.add_argument("--min-support", type=int, default=20, help="fewest tuning rows a side may fire on")
+    t.add_argument("--agree-on", choices=("gated", "binary"), default="gated")
+    t.add_argument("--limit", type=int, default=0)
+    t.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE)
+    args = ap.parse_args()
+
+    report = fit(args) if args.cmd == "fit" else tune(args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import torch
+
+from . import config
+from .models.clickbait import ClickbaitModel
+from .models.fine6 import Fine6Model
+from .models.veracity import VeracityModel
+from .utils.text import build_text_input, normalize_ws
+
+
+def load_records(path: Path, limit: int) -> List[Dict[str, Any]]:
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        df = pd.read_csv(path, encoding="utf-8")
+    else:
+        df = pd.read_json(path, lines=True)
+    # Float columns keep NaN under where(); object dtype lets None stick.
+    df = df.astype(object).where(df.notna(), None)
+    if limit > 0:
+        df = df.head(limit)
+    return df.to_dict(orient="records")
+
+
+def weights_nbytes(model) -> int:
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell()
+
+
+def _probs(model, texts: List[str]) -> tuple[np.ndarray, float]:
+    t0 = time.perf_counter()
+    if isinstance(model, Fine6Model):
+        res = model.predict_batch(texts)
+        probs = np.array([[r.probs[lab] for lab in model.labels] for r in res])
+    elif isinstance(model, ClickbaitModel):
+        res = model.predict_proba_batch(texts)
+        probs = np.array([r.p_clickbait for r in res])[:, None]
+    else:
+        res = model.predict_proba_batch(texts)
+        probs = np.array([r.p_true for r in res])[:, None]
+    return probs, time.perf_counter() - t0
+
+
+def compare(name: str, fp32_model, int8_model, texts: List[str]) -> Dict[str, Any]:
+    p32, t32 = _probs(fp32_model, texts)
+    p8, t8 = _probs(int8_model, texts)
+
+    if p32.shape[1] == 1:
+        agree = (p32[:, 0] >= 0.5) == (p8[:, 0] >= 0.5)
+    else:
+        agree = p32.argmax(axis=1) == p8.argmax(axis=1)
+    drift = np.abs(p32 - p8)
+
+    size32 = weights_nbytes(fp32_model.backend.model)
+    size8 = weights_nbytes(int8_model.backend.model)
+    return {
+        "model": name,
+        "n": len(texts),
+        "agreement": float(agree.mean()) if len(texts) else 1.0,
+        "max_abs_prob_drift": float(drift.max()) if drift.size else 0.0,
+        "mean_abs_prob_drift": float(drift.mean()) if drift.size else 0.0,
+        "fp32_seconds": t32,
+        "int8_seconds": t8,
+        "speedup": (t32 / t8) if t8 > 0 else None,
+        "fp32_weights_bytes": size32,
+        "int8_weights_bytes": size8,
+        "size_ratio": (size32 / size8) if size8 > 0 else None,
+    }
+
+
+def run(records: List[Dict[str, Any]], batch_size: int) -> Dict[str, Any]:
+    text_inputs = [
+        build_text_input(title=r.get("title"), claim=r.get("claim"), body=r.get("body"))
+        for r in records
+    ]
+    clickbait_texts = [
+        normalize_ws(r.get("title") or "") or t
+        for r, t in zip(records, text_inputs)
+    ]
+
+    specs = [
+        ("clickbait", lambda prec: ClickbaitModel(
+            config.CLICKBAIT_MODEL_DIR, device="cpu", batch_size=batch_size, precision=prec
+        ), clickbait_texts),
+        ("veracity", lambda prec: VeracityModel(
+            config.VERACITY_MODEL_DIR, device="cpu", batch_size=batch_size, precision=prec
+        ), text_inputs),
+        ("fine6", lambda prec: Fine6Model(
+            config.FINE6_MODEL_DIR, labels=config.FINE6_LABELS, device="cpu", batch_size=batch_size, precision=prec
+        ), text_inputs),
+    ]
+
+    reports = []
+    for name, build, texts in specs:
+        fp32_model = build("fp32")
+        fp32_model.load()
+        int8_model = build("int8")
+        int8_model.load()
+        reports.append(compare(name, fp32_model, int8_model, texts))
+        del fp32_model, int8_model
+
+    return {"n_records": len(records), "models": reports}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compare int8 dynamic-quantized models against fp32.")
+    ap.add_argument("--input", required=True, help="held-out sample (.jsonl or .csv with title/claim/body)")
+    ap.add_argument("--limit", type=int, default=500)
+    ap.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE)
+    ap.add_argument("--out", default=None, help="write the JSON report here as well")
+    args = ap.parse_args()
+
+    report = run(load_records(Path(args.input), args.limit), args.batch_size)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
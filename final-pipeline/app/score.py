@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import config
+
+
+FIELDS = {
+    "title": ["title", "listing_title"],
+    "claim": ["claim"],
+    "body": ["body", "text"],
+    "source_url": ["source_url"],
+    "id": ["id", "url"],
+}
+
+
+def read_records(path: Path) -> Iterator[Dict[str, Any]]:
+    for rec, _ in read_records_from(path):
+        yield rec
+
+
+def read_records_from(
+    path: Path, skip: int = 0, offset: Optional[int] = None
+) -> Iterator[Tuple[Dict[str, Any], Optional[int]]]:
+    # (record, byte offset just past it) pairs after the first `skip`
+    # records. JSONL seeks straight to `offset` when it is known; CSV (whose
+    # quoted fields may span lines) always parses the skipped records.
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        return _csv_records(path, skip)
+    if offset is None:
+        return islice(_jsonl_records(path, 0), skip, None)
+    return _jsonl_records(path, offset)
+
+
+def _csv_records(path: Path, skip: int) -> Iterator[Tuple[Dict[str, Any], Optional[int]]]:
+    with path.open("r", encoding="utf-8", newline="") as f:
+        csv.field_size_limit(sys.maxsize)
+        for rec in islice(csv.DictReader(f), skip, None):
+            yield rec, None
+
+
+def _jsonl_records(path: Path, offset: int) -> Iterator[Tuple[Dict[str, Any], Optional[int]]]:
+    with path.open("rb") as f:
+        f.seek(offset)
+        pos = offset
+        for line in f:
+            pos += len(line)
+            line = line.strip()
+            if line:
+                yield json.loads(line), pos
+
+
+def _first(rec: Dict[str, Any], names: List[str]) -> Optional[str]:
+    for name in names:
+        v = rec.get(name)
+        if v is not None and v != "" and v == v:
+            return str(v)
+    return None
+
+
+def to_input(rec: Dict[str, Any], fields: Dict[str, List[str]]) -> Dict[str, Optional[str]]:
+    return {k: _first(rec, names) for k, names in fields.items()}
+
+
+def batched(it: Iterable[Any], n: int) -> Iterator[List[Any]]:
+    it = iter(it)
+    while True:
+        chunk = list(islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+def flat_row(index: int, rec_id: Optional[str], out: Dict[str, Any]) -> Dict[str, Any]:
+    comp = out["component_outputs"]
+    return {
+        "index": index,
+        "id": rec_id,
+        "source_domain": out["input"]["source_domain"],
+        "text_len": out["input"]["text_len"],
+        "p_clickbait": comp["p_clickbait"],
+        "p_true_content": comp["p_true_content"],
+        "source_score": comp["source_score"],
+        "p_true_source": comp["p_true_source"],
+        "final_p_true": out["fusion"]["final_p_true"],
+        "binary_label": out["fusion"]["binary_label"],
+        "neutral_override": bool(out["fusion"]["features"].get("neutral_override", False)),
+        "fine6_label": out["fine6"]["fine6_label"],
+        "fine6_top_prob": out["fine6"]["top_prob"],
+        "gated_label": out["gated"]["gated_label"],
+        "path": out["path"],
+    }
+
+
+# Each worker process owns one pipeline; it is built by the pool initializer.
+_PIPELINE = None
+
+
+def _init_worker(threads: int) -> None:
+    global _PIPELINE
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+    from .pipeline import FakeNewsPipeline
+
+    _PIPELINE = FakeNewsPipeline()
+    _PIPELINE.load()
+
+
+def _score(batch: List[Tuple[int, Dict[str, Optional[str]]]], full: bool) -> List[Dict[str, Any]]:
+    from .pipeline import PipelineInput
+
+    inps = [
+        PipelineInput(title=x["title"], claim=x["claim"], body=x["body"], source_url=x["source_url"])
+        for _, x in batch
+    ]
+    rows = []
+    for (index, x), out in zip(batch, _PIPELINE.predict_batch(inps)):
+        row = flat_row(index, x["id"], out)
+        if full:
+            row["result"] = out
+        rows.append(row)
+    return rows
+
+
+class NdjsonSink:
+    def __init__(self, path: Path, offset: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("ab")
+        # Anything past the last checkpoint is a partial write from an
+        # interrupted run and is scored again.
+        self._f.truncate(offset)
+        self._f.seek(offset)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._f.write(b"".join(
+            json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n" for r in rows
+        ))
+
+    def commit(self) -> Dict[str, Any]:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return {"offset": self._f.tell()}
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ParquetSink:
+    def __init__(self, path: Path, part: int, rows_per_part: int):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("pyarrow is required for --format parquet") from e
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.part = part
+        self.rows_per_part = max(1, rows_per_part)
+        self._rows: List[Dict[str, Any]] = []
+        for stale in self.dir.glob("part-*.parquet"):
+            if int(stale.stem.split("-")[1]) >= part:
+                stale.unlink()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for r in rows:
+            if "result" in r:
+                r = dict(r, result=json.dumps(r["result"], ensure_ascii=False))
+            self._rows.append(r)
+
+    def pending(self) -> int:
+        return len(self._rows)
+
+    def commit(self) -> Dict[str, Any]:
+        if self._rows:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            out = self.dir / f"part-{self.part:05d}.parquet"
+            tmp = out.with_suffix(".parquet.tmp")
+            pq.write_table(pa.Table.from_pylist(self._rows), tmp, compression="zstd")
+            os.replace(tmp, out)
+            self.part += 1
+            self._rows = []
+        return {"part": self.part}
+
+    def close(self) -> None:
+        self.commit()
+
+
+def _load_checkpoint(path: Path, settings: Dict[str, Any]) -> Dict[str, Any]:
+    if not path.exists():
+        return {"consumed": 0, "input_offset": 0, "sink": {}}
+    ckpt = json.loads(path.read_text(encoding="utf-8"))
+    if ckpt.get("settings") != settings:
+        raise SystemExit(
+            f"checkpoint {path} was written with different settings; pass --restart to start over"
+        )
+    return ckpt
+
+
+def _save_checkpoint(
+    path: Path,
+    settings: Dict[str, Any],
+    consumed: int,
+    input_offset: Optional[int],
+    sink_state: Dict[str, Any],
+) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(
+        json.dumps({
+            "settings": settings,
+            "consumed": consumed,
+            "input_offset": input_offset,
+            "sink": sink_state,
+            "updated_at": time.time(),
+        }),
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+
+
+def run(
+    input_path: Path,
+    out_path: Path,
+    *,
+    fmt: str,
+    fields: Dict[str, List[str]],
+    batch_size: int,
+    workers: int,
+    full: bool,
+    checkpoint_every: int,
+    rows_per_part: int,
+    restart: bool,
+    limit: int,
+) -> Dict[str, Any]:
+    ckpt_path = Path(str(out_path).rstrip("/") + ".ckpt.json")
+    settings = {"input": str(Path(input_path).resolve()), "format": fmt, "fields": fields, "full": full}
+    if restart and ckpt_path.exists():
+        ckpt_path.unlink()
+    ckpt = _load_checkpoint(ckpt_path, settings)
+    consumed = int(ckpt["consumed"])
+
+    if fmt == "parquet":
+        sink = ParquetSink(out_path, int(ckpt["sink"].get("part", 0)), rows_per_part)
+    else:
+        if restart:
+            out_path.unlink(missing_ok=True)
+        sink = NdjsonSink(out_path, int(ckpt["sink"].get("offset", 0)))
+
+    # JSONL resumes by seeking to the checkpointed byte offset rather than
+    # re-parsing every consumed record.
+    input_offset = ckpt.get("input_offset")
+    records = read_records_from(input_path, consumed, input_offset)
+    records = islice(records, max(0, limit - consumed) if limit > 0 else None)
+    batches = batched(
+        ((i, to_input(r, fields), pos) for i, (r, pos) in enumerate(records, start=consumed)),
+        batch_size,
+    )
+
+    workers = max(1, workers)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if workers == 1:
+        _init_worker(config.TORCH_NUM_THREADS)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+
+    t0 = time.perf_counter()
+    start = consumed
+    since_ckpt = 0
+    pending: deque = deque()
+
+    def _drain(block_until: int) -> None:
+        nonlocal consumed, input_offset, since_ckpt
+        while len(pending) > block_until:
+            fut, n, end_offset = pending.popleft()
+            rows = fut.result() if isinstance(fut, Future) else fut
+            sink.write(rows)
+            consumed += n
+            input_offset = end_offset
+            since_ckpt += n
+            # A parquet checkpoint closes a part, so --checkpoint-every below
+            # --rows-per-part means smaller parts.
+            flush = since_ckpt >= checkpoint_every
+            if fmt == "parquet":
+                flush = flush or sink.pending() >= rows_per_part
+            if flush:
+                _save_checkpoint(ckpt_path, settings, consumed, input_offset, sink.commit())
+                since_ckpt = 0
+                rate = (consumed - start) / max(1e-9, time.perf_counter() - t0)
+                print(f"[score] {consumed} records ({rate:.1f}/s)", file=sys.stderr, flush=True)
+
+    try:
+        for items in batches:
+            batch = [(i, x) for i, x, _ in items]
+            end_offset = items[-1][2]
+            if pool is None:
+                pending.append((_score(batch, full), len(batch), end_offset))
+                _drain(0)
+            else:
+                # Bounded: at most two batches per worker are in flight, and
+                # results are written in input order so the checkpoint is a
+                # single record count.
+                pending.append((pool.submit(_score, batch, full), len(batch), end_offset))
+                _drain(2 * workers)
+        _drain(0)
+        _save_checkpoint(ckpt_path, settings, consumed, input_offset, sink.commit())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        sink.close()
+
+    seconds = time.perf_counter() - t0
+    return {
+        "input": str(input_path),
+        "output": str(out_path),
+        "resumed_from": start,
+        "records": consumed,
+        "scored": consumed - start,
+        "seconds": seconds,
+        "records_per_s": (consumed - start) / seconds if seconds > 0 else 0.0,
+    }
+
+
+def _fields(args: argparse.Namespace) -> Dict[str, List[str]]:
+    out = {}
+    for key, default in FIELDS.items():
+        value = getattr(args, f"{key}_field")
+        out[key] = [x.strip() for x in value.split(",") if x.strip()] if value else default
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Score a JSONL/CSV corpus with FakeNewsPipeline, streaming and resumable."
+    )
+    ap.add_argument("input", help=".jsonl or .csv corpus")
+    ap.add_argument("--out", required=True, help="NDJSON file, or a directory of parquet parts")
+    ap.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    ap.add_argument("--batch-size", type=int, default=config.INFERENCE_BATCH_SIZE)
+    ap.add_argument("--workers", type=int, default=1, help="scoring processes (each loads its own models)")
+    ap.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=0,
+        help="records between checkpoints (default: 1000 for NDJSON, --rows-per-part for parquet, "
+             "where each checkpoint writes a part)",
+    )
+    ap.add_argument("--rows-per-part", type=int, default=50000, help="rows per parquet part file")
+    ap.add_argument("--full", action="store_true", help="also write the complete pipeline output per record")
+    ap.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    ap.add_argument("--limit", type=int, default=0, help="stop after this many input records")
+    for key, default in FIELDS.items():
+        ap.add_argument(
+            f"--{key.replace('_', '-')}-field",
+            default="",
+            help=f"comma-separated record fields for {key}, first non-empty wins (default: {','.join(default)})",
+        )
+    args = ap.parse_args()
+
+    report = run(
+        Path(args.input),
+        Path(args.out),
+        fmt=args.format,
+        fields=_fields(args),
+        batch_size=max(1, args.batch_size),
+        workers=args.workers,
+        full=args.full,
+        checkpoint_every=max(1, args.checkpoint_every or (args.rows_per_part if args.format == "parquet" else 1000)),
+        rows_per_part=args.rows_per_part,
+        restart=args.restart,
+        limit=args.limit,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
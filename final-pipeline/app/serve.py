@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from . import config
+
+
+def memory_usage(pid: int) -> Dict[str, int]:
+    fields = {"Rss": 0, "Pss": 0, "Shared_Clean": 0, "Shared_Dirty": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    path = Path(f"/proc/{pid}/smaps_rollup")
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in fields:
+            fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss_bytes": fields["Rss"],
+        "pss_bytes": fields["Pss"],
+        "shared_bytes": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        "unique_bytes": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def memory_report(parent_pid: int, worker_pids: List[int]) -> Dict[str, object]:
+    workers = {str(pid): memory_usage(pid) for pid in worker_pids}
+    unique_total = sum(w.get("unique_bytes", 0) for w in workers.values())
+    rss_total = sum(w.get("rss_bytes", 0) for w in workers.values())
+    return {
+        "parent": memory_usage(parent_pid),
+        "workers": workers,
+        "workers_unique_total_bytes": unique_total,
+        "workers_rss_total_bytes": rss_total,
+    }
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, threads: int, log_level: str) -> None:
+    import torch
+    import uvicorn
+
+    from .main import app
+
+    torch.set_num_threads(threads)
+    config.TORCH_NUM_THREADS = threads
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, lifespan="on"))
+    server.run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket, threads: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        code = 0
+        try:
+            _run_worker(sock, threads, log_level)
+        except BaseException:
+            code = 1
+            raise
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Load the pipeline once, then fork uvicorn workers that share its weights."
+    )
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", "2")))
+    ap.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=0,
+        help="torch intra-op threads per worker (default: cpu_count // workers)",
+    )
+    ap.add_argument("--report-after", type=float, default=0.0, help="print a memory report N seconds after start")
+    ap.add_argument("--log-level", default="info")
+    args = ap.parse_args()
+
+    workers = max(1, args.workers)
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+    import torch
+
+    # Keep the parent single-threaded: it only loads weights, and an
+    # initialized OpenMP pool does not survive fork.
+    torch.set_num_threads(1)
+
+    from .main import PIPELINE
+
+    t0 = time.perf_counter()
+    if config.INFERENCE_BACKEND == "torch":
+        PIPELINE.load()
+        PIPELINE.share_memory()
+    print(f"[serve] artifacts loaded in {time.perf_counter() - t0:.1f}s; forking {workers} workers x {threads} threads",
+          flush=True)
+
+    sock = _bind(args.host, args.port)
+    gc.collect()
+    gc.freeze()
+
+    pids = [_spawn(sock, threads, args.log_level) for _ in range(workers)]
+    stopping = False
+
+    def _report(*_):
+        print(json.dumps(memory_report(os.getpid(), pids), indent=2), flush=True)
+
+    def _stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGUSR1, _report)
+
+    if args.report_after > 0:
+        signal.signal(signal.SIGALRM, _report)
+        signal.setitimer(signal.ITIMER_REAL, args.report_after)
+
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid not in pids:
+            continue
+        idx = pids.index(pid)
+        if stopping:
+            pids.pop(idx)
+            continue
+        print(f"[serve] worker {pid} exited with status {status}; respawning", file=sys.stderr, flush=True)
+        time.sleep(1.0)
+        pids[idx] = _spawn(sock, threads, args.log_level)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
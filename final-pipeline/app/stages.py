@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Set, Tuple
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[["StageRun", List[int]], List[Any]]
+    deps: Tuple[str, ...] = ()
+
+
+class StageGraph:
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, fn: Callable[["StageRun", List[int]], List[Any]], deps: Sequence[str] = ()) -> None:
+        if name in self._stages:
+            raise ValueError(f"duplicate stage: {name}")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"stage {name!r} depends on unknown stage {dep!r}")
+        self._stages[name] = Stage(name=name, fn=fn, deps=tuple(deps))
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._stages)
+
+    def stage(self, name: str) -> Stage:
+        return self._stages[name]
+
+    def run(self, inputs: Sequence[Any], context: Any = None) -> "StageRun":
+        return StageRun(self, list(inputs), context)
+
+
+@dataclass
+class StageRun:
+    graph: StageGraph
+    inputs: List[Any]
+    context: Any = None
+    seconds: Dict[str, float] = field(default_factory=dict)
+    _values: Dict[str, Dict[int, Any]] = field(default_factory=dict)
+    _reused: Dict[str, Set[int]] = field(default_factory=dict)
+
+    def get(self, name: str, rows: Sequence[int]) -> List[Any]:
+        stage = self.graph.stage(name)
+        values = self._values.setdefault(name, {})
+
+        missing = [r for r in rows if r not in values]
+        if missing:
+            for dep in stage.deps:
+                self.get(dep, missing)
+            t0 = time.perf_counter()
+            out = stage.fn(self, missing)
+            # Exclusive of deps, which were evaluated above.
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - t0
+            if len(out) != len(missing):
+                raise RuntimeError(f"stage {name!r} returned {len(out)} values for {len(missing)} rows")
+            values.update(zip(missing, out))
+
+        return [values[r] for r in rows]
+
+    def put(self, name: str, row: int, value: Any) -> None:
+        # Supplies a stage value from elsewhere (e.g. a near-duplicate), so
+        # get() treats the row as done and never runs the stage for it.
+        self.graph.stage(name)
+        self._values.setdefault(name, {})[row] = value
+        self._reused.setdefault(name, set()).add(row)
+
+    def value(self, name: str, row: int, default: Any = None) -> Any:
+        return self._values.get(name, {}).get(row, default)
+
+    def values(self, name: str) -> List[Any]:
+        reused = self._reused.get(name, set())
+        return [v for r, v in self._values.get(name, {}).items() if r not in reused]
+
+    def evaluated(self, row: int) -> List[str]:
+        return [n for n in self.graph.names if row in self._values.get(n, {}) and not self.is_reused(n, row)]
+
+    def reused(self, row: int) -> List[str]:
+        return [n for n in self.graph.names if self.is_reused(n, row)]
+
+    def skipped(self, row: int) -> List[str]:
+        return [n for n in self.graph.names if row not in self._values.get(n, {})]
+
+    def is_reused(self, name: str, row: int) -> bool:
+        return row in self._reused.get(name, ())
@@ -1,24 +1,122 @@
 from __future__ import annotations
 
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
 from urllib.parse import urlparse
 
 
+@lru_cache(maxsize=65536)
 def get_domain(url: str) -> str:
     url = (url or "").strip()
     if not url:
         return ""
     try:
-        netloc = urlparse(url).netloc.lower()
-        return netloc.replace("www.", "")
+        host = urlparse(url).hostname or ""
     except Exception:
         return ""
+    return normalize_domain(host)
 
 
 def normalize_domain(domain: str) -> str:
-    d = (domain or "").strip().lower()
-    return d.replace("www.", "")
+    d = (domain or "").strip().lower().rstrip(".")
+    if d.startswith("www."):
+        d = d[4:]
+    return d
 
 
-def is_platform_domain(domain: str, platform_set: set[str]) -> bool:
+def domain_suffixes(domain: str) -> List[str]:
+    labels = normalize_domain(domain).split(".")
+    if len(labels) < 2:
+        return []
+    return [".".join(labels[i:]) for i in range(len(labels) - 1)]
+
+
+def _reverse(domain: str) -> str:
+    return ".".join(reversed(domain.split(".")))
+
+
+def _suffix_keys(domain: str) -> List[Tuple[str, str]]:
+    labels = normalize_domain(domain).split(".")
+    n = len(labels)
+    if n < 2:
+        return []
+    out = []
+    fwd = labels[-1]
+    rev = labels[-1]
+    for label in reversed(labels[:-1]):
+        fwd = label + "." + fwd
+        rev = rev + "." + label
+        out.append((rev, fwd))
+    out.reverse()
+    return out
+
+
+class DomainSet:
+    def __init__(self, domains: Iterable[str]):
+        keys = {_reverse(normalize_domain(d)) for d in domains if normalize_domain(d)}
+        self._keys: List[str] = sorted(keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _find(self, domain: str) -> Tuple[int, str]:
+        keys = self._keys
+        n = len(keys)
+        for key, suffix in _suffix_keys(domain):
+            i = bisect_left(keys, key)
+            if i < n and keys[i] == key:
+                return i, suffix
+        return -1, ""
+
+    def match(self, domain: str) -> str:
+        return self._find(domain)[1]
+
+    def __contains__(self, domain: object) -> bool:
+        return isinstance(domain, str) and self._find(domain)[0] >= 0
+
+
+class DomainIndex(DomainSet):
+    def __init__(
+        self,
+        domains: Sequence[str],
+        scores: Sequence[float],
+        p_trues: Sequence[float],
+        evidences: Sequence[str],
+        *,
+        cache_size: int = 65536,
+    ):
+        rows = {}
+        for d, s, p, e in zip(domains, scores, p_trues, evidences):
+            d = normalize_domain(d)
+            if d:
+                rows[_reverse(d)] = (float(s), float(p), str(e))
+
+        self._keys = sorted(rows)
+        self.evidence_vocab: List[str] = sorted({r[2] for r in rows.values()})
+        codes = {e: i for i, e in enumerate(self.evidence_vocab)}
+
+        self.scores = array("d", (rows[k][0] for k in self._keys))
+        self.p_trues = array("d", (rows[k][1] for k in self._keys))
+        self.evidence_codes = array("H", (codes[rows[k][2]] for k in self._keys))
+
+        self.cached_lookup = lru_cache(maxsize=cache_size)(self.lookup)
+
+    def lookup(self, domain: str) -> Optional[Tuple[str, float, float, str]]:
+        i, matched = self._find(domain)
+        if i < 0:
+            return None
+        return (
+            matched,
+            self.scores[i],
+            self.p_trues[i],
+            self.evidence_vocab[self.evidence_codes[i]],
+        )
+
+
+def is_platform_domain(domain: str, platform_set) -> bool:
     d = normalize_domain(domain)
-    return d in platform_set
+    if isinstance(platform_set, DomainSet):
+        return d in platform_set
+    return d in platform_set or any(s in platform_set for s in domain_suffixes(d))
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+from app import config
+from app.utils.domains import DomainIndex, normalize_domain
+
+
+def _measure(build: Callable[[], Any]) -> tuple[Any, int]:
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def _time_lookups(fn: Callable[[str], Any], hosts: List[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for h in hosts:
+            fn(h)
+    return (time.perf_counter() - t0) / (repeat * len(hosts)) * 1e9
+
+
+def run(table_csv: Path, n_hosts: int, repeat: int, seed: int) -> Dict[str, Any]:
+    df = pd.read_csv(table_csv, encoding="utf-8")
+    domains = df["source_domain"].fillna("").astype(str).tolist()
+    scores = df["source_score_final"].tolist()
+    p_trues = df["p_true_final"].tolist()
+    evidences = df["evidence"].tolist() if "evidence" in df.columns else ["unknown"] * len(df)
+
+    def build_dicts():
+        keys = [d.lower().replace("www.", "") for d in domains]
+        return (
+            dict(zip(keys, scores)),
+            dict(zip(keys, p_trues)),
+            dict(zip(keys, evidences)),
+        )
+
+    (map_score, map_p_true, map_evidence), dict_bytes = _measure(build_dicts)
+    index, index_bytes = _measure(lambda: DomainIndex(domains, scores, p_trues, evidences))
+
+    rng = random.Random(seed)
+    known = [normalize_domain(d) for d in domains if normalize_domain(d)]
+    hosts = []
+    for _ in range(n_hosts):
+        r = rng.random()
+        d = rng.choice(known)
+        if r < 0.5:
+            hosts.append(d)
+        elif r < 0.8:
+            hosts.append(f"{rng.choice(['m', 'stiri', 'amp', 'news'])}.{d}")
+        else:
+            hosts.append(f"unknown{rng.randrange(10 ** 6)}.ro")
+
+    def dict_lookup(h):
+        return map_score.get(h), map_p_true.get(h), map_evidence.get(h)
+
+    dict_hits = sum(1 for h in hosts if h in map_score)
+    index_hits = sum(1 for h in hosts if index.lookup(h) is not None)
+
+    return {
+        "table_rows": len(df),
+        "hosts": len(hosts),
+        "dicts": {
+            "memory_bytes": dict_bytes,
+            "lookup_ns": _time_lookups(dict_lookup, hosts, repeat),
+            "hits": dict_hits,
+        },
+        "domain_index": {
+            "memory_bytes": index_bytes,
+            "lookup_ns": _time_lookups(index.lookup, hosts, repeat),
+            "cached_lookup_ns": _time_lookups(index.cached_lookup, hosts, repeat),
+            "hits": index_hits,
+        },
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compare DomainIndex against the per-column dicts.")
+    ap.add_argument("--table", default=str(config.SOURCE_VERACITY_TABLE_PATH))
+    ap.add_argument("--hosts", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    print(json.dumps(run(Path(args.table), args.hosts, args.repeat, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
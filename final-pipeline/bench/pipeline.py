@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SHIPPED_ARTIFACTS = Path(__file__).resolve().parents[1] / "artifacts"
+
+MODELS = {
+    "clickbait/rocloco_roberta_clickbait": 2,
+    "binary/veracity_roberta": 2,
+    "multiclass/fine6_roberta": 6,
+}
+
+FUSION_FEATURES = [
+    "logit_p_true_content",
+    "logit_p_not_clickbait",
+    "source_score",
+    "text_len",
+    "has_source",
+]
+
+STAGES = (
+    "text_input",
+    "text_len",
+    "source_prior",
+    "prefilter",
+    "text_encoding",
+    "shared_encoder",
+    "veracity",
+    "clickbait",
+    "fusion",
+    "fine6",
+    "gating",
+)
+
+WORDS = (
+    "guvernul", "a", "anunțat", "astăzi", "noi", "măsuri", "pentru", "economie", "iar",
+    "ministerul", "sănătății", "spune", "că", "situația", "este", "stabilă", "în", "toate",
+    "județele", "țării", "conform", "unui", "comunicat", "oficial", "publicat", "ieri",
+)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    # Most shipped files are git-lfs pointers, which are not JSON.
+    try:
+        obj = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _build_model(src: Path, dst: Path, num_labels: int, shape: Dict[str, int], seed: int) -> Dict[str, Any]:
+    import torch
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer, BertConfig, BertTokenizerFast
+
+    if _read_json(src / "tokenizer.json") is not None:
+        tok = AutoTokenizer.from_pretrained(str(src))
+    else:
+        # Positional: the first parameter is `vocab_file` in transformers 4
+        # and `vocab` (path or dict) in 5.
+        tok = BertTokenizerFast(str(src / "vocab.txt"), do_lower_case=False)
+
+    shipped = _read_json(src / "config.json")
+    if shipped and "model_type" in shipped:
+        shipped = dict(shipped)
+        cfg = AutoConfig.for_model(shipped.pop("model_type"), **shipped)
+    else:
+        cfg = BertConfig()
+    cfg.vocab_size = len(tok)
+    cfg.num_labels = num_labels
+    for k, v in shape.items():
+        setattr(cfg, k, v)
+
+    torch.manual_seed(seed)
+    dst.mkdir(parents=True, exist_ok=True)
+    tok.save_pretrained(str(dst))
+    AutoModelForSequenceClassification.from_config(cfg).save_pretrained(str(dst))
+    return {
+        "model_type": cfg.model_type,
+        "from_shipped_config": bool(shipped),
+        "hidden_size": cfg.hidden_size,
+        "num_hidden_layers": cfg.num_hidden_layers,
+        "num_attention_heads": cfg.num_attention_heads,
+        "vocab_size": cfg.vocab_size,
+    }
+
+
+def _build_multitask(dst: Path, seed: int) -> None:
+    import torch
+    from transformers import AutoTokenizer
+
+    from app.models.multitask import save_net
+    from app.multitask_train import convert
+
+    # Only read with MODEL_LAYOUT=multitask; same shape as the single-task
+    # models, so the two layouts' timings can be compared directly. It is
+    # not fine-tuned, so only its veracity outputs match the separate models.
+    teachers = {
+        "clickbait": dst / "clickbait/rocloco_roberta_clickbait",
+        "veracity": dst / "binary/veracity_roberta",
+        "fine6": dst / "multiclass/fine6_roberta",
+    }
+    torch.manual_seed(seed)
+    tokenizer = AutoTokenizer.from_pretrained(str(teachers["veracity"]))
+    net, _ = convert(teachers, "veracity")
+    save_net(net, dst / "multitask/shared_roberta", tokenizer)
+
+
+def _build_fusion(dst: Path, seed: int) -> None:
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    n = 2000
+    X = pd.DataFrame({
+        "logit_p_true_content": rng.normal(0, 3, n),
+        "logit_p_not_clickbait": rng.normal(0, 2, n),
+        "source_score": rng.normal(0, 1, n),
+        "text_len": rng.uniform(0, 20000, n),
+        "has_source": rng.integers(0, 2, n),
+    })[FUSION_FEATURES]
+    z = 0.8 * X["logit_p_true_content"] + 0.3 * X["logit_p_not_clickbait"] + X["source_score"]
+    y = (z + rng.normal(0, 1, n) > 0).astype(int)
+    model = Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression())]).fit(X, y)
+
+    dst.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, dst / "fusion_lr.joblib")
+    (dst / "fusion_threshold.json").write_text(json.dumps({"threshold": 0.5}), encoding="utf-8")
+    (dst / "fusion_feature_schema.json").write_text(json.dumps({"features": FUSION_FEATURES}), encoding="utf-8")
+
+
+def _build_source_table(dst: Path, n_sources: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    domains = [f"sursa{i}.ro" for i in range(n_sources)]
+    lines = ["source_domain,p_true_final,source_score_final,evidence"]
+    for d in domains:
+        p = rng.random()
+        lines.append(f"{d},{p:.6f},{rng.gauss(0, 1):.6f},{rng.choice(['internal', 'mbfc', 'unknown'])}")
+    dst.mkdir(parents=True, exist_ok=True)
+    (dst / "source_veracity_table.csv").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return domains
+
+
+def _build_prefilter(dst: Path, seed: int) -> None:
+    import joblib
+
+    from app.prefilter_train import build_model
+
+    # Label by which half of the vocabulary dominates, so the bench texts
+    # land on both sides of the thresholds as well as between them.
+    rng = random.Random(seed)
+    true_words = set(WORDS[: len(WORDS) // 2])
+    texts, ys = [], []
+    for _ in range(600):
+        text = _text(rng, rng.randrange(100, 1000))
+        words = text.split()
+        texts.append(text)
+        ys.append(int(2 * sum(w in true_words for w in words) > len(words)))
+    model = build_model("lr", seed).fit(texts, ys)
+
+    dst.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, dst / "tfidf_linear.joblib")
+    (dst / "prefilter_thresholds.json").write_text(
+        json.dumps({"threshold_true": 0.9, "threshold_false": 0.1}), encoding="utf-8"
+    )
+
+
+def build_artifacts(dst: Path, *, shape: Dict[str, int], n_sources: int, seed: int) -> Dict[str, Any]:
+    # A seed per model: like the shipped models, the synthetic ones must not
+    # share encoder weights.
+    models = {
+        sub: _build_model(SHIPPED_ARTIFACTS / sub, dst / sub, n, shape, seed + i)
+        for i, (sub, n) in enumerate(MODELS.items())
+    }
+    _build_multitask(dst, seed)
+    _build_fusion(dst / "fusion", seed)
+    _build_prefilter(dst / "prefilter", seed)
+    domains = _build_source_table(dst / "source_veracity", n_sources, seed)
+    return {"models": models, "sources": len(domains)}
+
+
+def _text(rng: random.Random, n_chars: int) -> str:
+    out, size = [], 0
+    while size < n_chars:
+        w = rng.choice(WORDS)
+        out.append(w)
+        size += len(w) + 1
+    return " ".join(out)[:n_chars]
+
+
+def make_inputs(n: int, text_len: int, n_sources: int, rng: random.Random) -> list:
+    from app.pipeline import PipelineInput
+
+    inps = []
+    for _ in range(n):
+        r = rng.random()
+        d = f"sursa{rng.randrange(n_sources)}.ro"
+        if r < 0.5:
+            url = f"https://{d}/articol"
+        elif r < 0.75:
+            url = f"https://stiri.{d}/articol"
+        else:
+            url = None
+        inps.append(PipelineInput(title=_text(rng, 60), body=_text(rng, text_len), source_url=url))
+    return inps
+
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q * (len(xs) - 1))))]
+
+
+def _summary(xs: List[float]) -> Dict[str, float]:
+    ms = [x * 1000.0 for x in xs]
+    return {"p50": statistics.median(ms), "p95": _pct(ms, 0.95), "mean": statistics.fmean(ms)}
+
+
+def run(
+    artifacts_dir: Path,
+    *,
+    batch_sizes: List[int],
+    text_lengths: List[int],
+    repeat: int,
+    warmup: int,
+    n_sources: int,
+    seed: int,
+) -> Dict[str, Any]:
+    os.environ["ARTIFACTS_DIR"] = str(artifacts_dir)
+    from app import config
+    from app.pipeline import FakeNewsPipeline
+
+    if config.ARTIFACTS_DIR != Path(artifacts_dir).resolve():
+        raise RuntimeError(f"app.config was imported before the benchmark set ARTIFACTS_DIR ({config.ARTIFACTS_DIR})")
+
+    pipeline = FakeNewsPipeline()
+    t0 = time.perf_counter()
+    pipeline.load()
+    load_s = time.perf_counter() - t0
+
+    timings: List[Dict[str, float]] = []
+    pipeline.observers.append(lambda r, _: timings.append(dict(r.seconds)))
+
+    rng = random.Random(seed)
+    cases = []
+    for text_len in text_lengths:
+        for batch_size in batch_sizes:
+            totals = []
+            timings.clear()
+            for i in range(warmup + repeat):
+                inps = make_inputs(batch_size, text_len, n_sources, rng)
+                t0 = time.perf_counter()
+                pipeline.predict_batch(inps)
+                if i >= warmup:
+                    totals.append(time.perf_counter() - t0)
+            stage_runs = timings[warmup:]
+            p50 = statistics.median(totals)
+            cases.append({
+                "batch_size": batch_size,
+                "text_len": text_len,
+                "total_ms": _summary(totals),
+                "items_per_s": batch_size / p50 if p50 > 0 else 0.0,
+                "stages_ms": {s: _summary([t.get(s, 0.0) for t in stage_runs]) for s in STAGES},
+            })
+            print(
+                f"[bench] batch={batch_size:<4} len={text_len:<6} p50={p50 * 1000:8.2f} ms "
+                f"({batch_size / p50:8.1f} items/s)",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    return {"load_seconds": load_s, "artifact_load_seconds": pipeline.artifacts.load_seconds, "cases": cases}
+
+
+def _meta(args: argparse.Namespace, built: Dict[str, Any]) -> Dict[str, Any]:
+    import torch
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=Path(__file__).parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "artifacts": built,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float, min_ms: float) -> List[str]:
+    def key(c: Dict[str, Any]) -> Tuple[int, int]:
+        return c["batch_size"], c["text_len"]
+
+    old = {key(c): c for c in baseline.get("cases", [])}
+    regressions = []
+    for case in current.get("cases", []):
+        ref = old.get(key(case))
+        if ref is None:
+            continue
+        pairs = [("total", ref["total_ms"]["p50"], case["total_ms"]["p50"])]
+        pairs += [
+            (s, ref["stages_ms"][s]["p50"], case["stages_ms"][s]["p50"])
+            for s in STAGES
+            if s in ref.get("stages_ms", {}) and s in case["stages_ms"]
+        ]
+        for name, was, now in pairs:
+            # Sub-`min_ms` stages are mostly timer noise; only flag real slowdowns.
+            if now - was > min_ms and now > was * (1.0 + threshold):
+                regressions.append(
+                    f"batch={case['batch_size']} len={case['text_len']} {name}: "
+                    f"{was:.3f} -> {now:.3f} ms (+{(now / was - 1.0) * 100 if was > 0 else float('inf'):.0f}%)"
+                )
+    return regressions
+
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Benchmark FakeNewsPipeline stage by stage on tiny random-initialized artifacts."
+    )
+    ap.add_argument("--out", default="", help="write results JSON here")
+    ap.add_argument("--compare", default="", help="baseline results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed p50 slowdown before failing (0.15 = 15%%)")
+    ap.add_argument("--min-ms", type=float, default=0.05, help="ignore slowdowns smaller than this many ms")
+    ap.add_argument("--artifacts", default="", help="build the synthetic artifacts here (default: a temp dir)")
+    ap.add_argument("--batch-sizes", type=_ints, default=[1, 8, 32])
+    ap.add_argument("--text-lengths", type=_ints, default=[100, 1000, 5000], help="characters of body text")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--sources", type=int, default=5000, help="rows in the synthetic source table")
+    ap.add_argument("--hidden-size", type=int, default=64)
+    ap.add_argument("--layers", type=int, default=2)
+    ap.add_argument("--heads", type=int, default=2)
+    ap.add_argument("--full-size", action="store_true", help="keep the shipped/BERT-base model shape")
+    ap.add_argument("--threads", type=int, default=0, help="torch intra-op threads (default: torch's choice)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    import torch
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    shape = {} if args.full_size else {
+        "hidden_size": args.hidden_size,
+        "num_hidden_layers": args.layers,
+        "num_attention_heads": args.heads,
+        "intermediate_size": 4 * args.hidden_size,
+    }
+
+    with tempfile.TemporaryDirectory(prefix="fakenews-bench-") as tmp:
+        artifacts_dir = Path(args.artifacts or tmp)
+        # Building the multitask artifact imports app.config, which reads
+        # ARTIFACTS_DIR once.
+        os.environ["ARTIFACTS_DIR"] = str(artifacts_dir)
+        built = build_artifacts(artifacts_dir, shape=shape, n_sources=args.sources, seed=args.seed)
+        results = run(
+            artifacts_dir,
+            batch_sizes=args.batch_sizes,
+            text_lengths=args.text_lengths,
+            repeat=args.repeat,
+            warmup=args.warmup,
+            n_sources=args.sources,
+            seed=args.seed,
+        )
+    results["meta"] = _meta(args, built)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, results, args.threshold, args.min_ms)
+        for r in regressions:
+            print(f"[bench] REGRESSION {r}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"[bench] no regressions over {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()